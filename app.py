@@ -3,18 +3,19 @@ import streamlit as st
 import pandas as pd
 import datetime
 import calendar
-import base64
-import io
-from utils.data_models import (
+from utils.data_backend import (
     initialize_session_state, 
     save_attendance, 
     get_class_attendance_summary,
+    get_class_day_sheet,
+    get_school_attendance_summary,
     get_class_color, 
     send_class_notification, 
     get_class_notifications,
     mark_notification_read, 
     get_attendance_report, 
     get_all_classes_report,
+    get_available_reports,
     get_class_students,
     add_student_to_class,
     update_student,
@@ -42,6 +43,11 @@ from utils.data_models import (
     get_live_timetable_status,
     export_to_custom_format
 )
+from utils.excel_reports import build_attendance_grid, write_xlsx, write_attendance_workbook
+from utils.fragments import fragment, rerun_fragment
+from utils.downloads import (
+    csv_download_button, xlsx_download_button, download_button, export_button, CSV_MIME, XLSX_MIME
+)
 
 # Initialize session state FIRST
 initialize_session_state()
@@ -183,22 +189,16 @@ def show_custom_header():
     
     st.markdown("---")
 
-def create_download_link(df, filename, text):
-    """Generate a download link for DataFrame"""
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{text}</a>'
-    return href
+def show_download_button(df, filename, text, key=None, compress=False, export=None):
+    """Download button for a DataFrame as CSV"""
+    return csv_download_button(text, df, filename, compress=compress, key=key, export=export)
 
-def get_custom_download_link(df, filename, text):
-    """Generate download link with BIS NOC custom formatting"""
+def show_custom_download_button(df, filename, text, key=None, compress=False, export=None):
+    """Download button with BIS NOC custom formatting"""
     if 'Date' in df.columns:
         df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%d/%m/%Y')
     
-    csv = df.to_csv(index=False, encoding='utf-8-sig')
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{text}</a>'
-    return href
+    return csv_download_button(text, df, filename, compress=compress, key=key, encoding='utf-8-sig', export=export)
 
 def show_quick_actions(selected_class):
     """Quick actions sidebar for teachers"""
@@ -360,8 +360,9 @@ def show_welcome_screen():
         st.metric("Total Students", len(st.session_state.students_df))
     with col3:
         today = datetime.date.today()
+        school_summary = get_school_attendance_summary(today)
         marked_today = sum(1 for class_name in st.session_state.classes 
-                          if get_class_attendance_summary(class_name, today))
+                          if school_summary.get(class_name))
         st.metric("Marked Today", f"{marked_today}/{len(st.session_state.classes)}")
     with col4:
         st.metric("Current Time", datetime.datetime.now().strftime("%H:%M"))
@@ -379,6 +380,26 @@ def show_welcome_screen():
     else:
         st.info("No duties assigned for today")
 
+def show_section_nav(name, sections):
+    """Horizontal section switcher that renders only the selected section.
+
+    st.tabs runs every tab body on each rerun; this runs one. The choice is kept
+    in session state, so it survives visiting another page and coming back.
+    """
+    if 'nav_sections' not in st.session_state:
+        st.session_state.nav_sections = {}
+    labels = list(sections)
+    key = f"nav_{name}"
+    # Widget state is dropped while the view is not shown; restore it from nav_sections
+    if st.session_state.get(key) not in labels:
+        saved = st.session_state.nav_sections.get(name)
+        st.session_state[key] = saved if saved in labels else labels[0]
+    
+    choice = st.radio(name, labels, horizontal=True, key=key, label_visibility="collapsed")
+    st.session_state.nav_sections[name] = choice
+    st.markdown("---")
+    sections[choice]()
+
 def show_class_view():
     """Show class-specific view with enhanced tabs"""
     selected_class = st.session_state.selected_class
@@ -387,36 +408,20 @@ def show_class_view():
     # TOPBAR NAVIGATION with class color
     st.markdown(f"<h1 style='color: {class_color}'>🎒 {selected_class}</h1>", unsafe_allow_html=True)
     
-    # Create enhanced topbar tabs
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "🎯 Attendance", 
-        "👥 Manage Students",
-        "📅 Timetable", 
-        "📝 Daily Notes",
-        "📥 Export Data", 
-        "🔔 Notifications"
-    ])
-    
-    with tab1:
-        show_class_attendance(selected_class)
-    
-    with tab2:
-        show_enhanced_student_management(selected_class)
-    
-    with tab3:
-        show_timetable_table(selected_class)
-    
-    with tab4:
-        show_daily_notes(selected_class)
-    
-    with tab5:
-        show_enhanced_download_section(selected_class)
-    
-    with tab6:
-        show_class_notifications(selected_class)
-
+    # Topbar navigation: only the selected section runs
+    show_section_nav("class_view", {
+        "🎯 Attendance": lambda: show_class_attendance(selected_class),
+        "👥 Manage Students": lambda: show_enhanced_student_management(selected_class),
+        "📅 Timetable": lambda: show_timetable_table(selected_class),
+        "📝 Daily Notes": lambda: show_daily_notes(selected_class),
+        "📥 Export Data": lambda: show_enhanced_download_section(selected_class),
+        "🔔 Notifications": lambda: show_class_notifications(selected_class)
+    })
+
+@fragment
 def show_class_attendance(selected_class):
-    """Enhanced Attendance tab with absence reasons"""
+    """Enhanced Attendance tab with absence reasons.
+    Runs as a fragment: saving reruns this tab only, not the whole page."""
     st.subheader(f"🎯 Attendance - {selected_class}")
     
     # Date selection
@@ -448,11 +453,8 @@ def show_class_attendance(selected_class):
         if st.button("📝 Mark Attendance", use_container_width=True):
             st.session_state.mark_attendance_expanded = True
     
-    # Check if already marked
-    existing_records = [
-        r for r in st.session_state.attendance_records 
-        if r['class'] == selected_class and r['date'] == selected_date
-    ]
+    # Saved roll call for this class and date: {student_id: (status, notes)}
+    day_sheet = get_class_day_sheet(selected_class, selected_date)
 
     # Monthly summary (read-only for teachers, editable for admin)
     if st.button("📆 Monthly Summary"):
@@ -464,21 +466,26 @@ def show_class_attendance(selected_class):
             st.info("No attendance data for previous month")
         else:
             st.subheader(f"Attendance Summary: {month_start.strftime('%B %Y')}")
-            st.dataframe(df, use_container_width=True)
+            roster = None
+            if not class_students.empty:
+                roster = class_students[['id', 'name']].rename(columns={'id': 'student_id'})
+            grid = build_attendance_grid(df, month_start, month_end, roster=roster)
+            st.dataframe(grid, use_container_width=True, hide_index=True)
+            with st.expander("Attendance records"):
+                st.dataframe(df, use_container_width=True)
             if st.session_state.get('selected_class') == 'Admin':
                 st.warning("Admin can edit records here: select a row and use the edit tools below.")
     
-    if existing_records:
+    if day_sheet:
         st.success(f"✅ Attendance already marked for {selected_date}")
         
         # Show summary of existing records
         status_counts = {}
         absence_with_reasons = []
-        for record in existing_records:
-            status = record['status']
+        for student_id, (status, notes) in day_sheet.items():
             status_counts[status] = status_counts.get(status, 0) + 1
-            if status in ['A', 'AP'] and record.get('notes'):
-                absence_with_reasons.append(record)
+            if status in ['A', 'AP'] and notes:
+                absence_with_reasons.append((student_id, status, notes))
         
         st.write("**Current Status:**")
         cols = st.columns(4)
@@ -497,113 +504,183 @@ def show_class_attendance(selected_class):
         # Show absence reasons if any
         if absence_with_reasons:
             st.subheader("📋 Absence Reasons")
-            for record in absence_with_reasons:
+            student_names = dict(zip(class_students['id'], class_students['name']))
+            for student_id, status, notes in absence_with_reasons:
                 with st.container():
                     st.markdown(f"""
                     <div class="absence-reason">
-                        <strong>{record['name']}</strong> ({record['status']}): {record.get('notes', 'No reason provided')}
+                        <strong>{student_names.get(student_id, student_id)}</strong> ({status}): {notes}
                     </div>
                     """, unsafe_allow_html=True)
     
-    # Enhanced attendance marking form with reason field
+    # Enhanced attendance marking with reason field
     with st.expander("📝 Mark/Edit Attendance", expanded=st.session_state.get('mark_attendance_expanded', False)):
         if 'mark_attendance_expanded' in st.session_state:
             del st.session_state.mark_attendance_expanded
+        
+        mode = st.radio(
+            "Roll call mode",
+            ["📋 Grid", "📝 Form"],
+            horizontal=True,
+            key=f"roll_call_mode_{selected_class}",
+            help="Grid edits the whole class in one table; Form shows a row of buttons per student"
+        )
+        if mode == "📋 Grid":
+            attendance_data, action = show_roll_call_grid(selected_class, selected_date, class_students, day_sheet)
+        else:
+            attendance_data, action = show_roll_call_form(selected_class, selected_date, class_students, day_sheet)
+        
+        if action in ("save", "all_present"):
+            # Validate absence reasons
+            missing_reasons = []
+            for record in attendance_data:
+                if record['status'] in ['A', 'AP'] and not record['notes'].strip():
+                    missing_reasons.append(record['name'])
             
-        with st.form(f"attendance_form_{selected_class}"):
-            attendance_data = []
-            
-            st.write(f"**Marking attendance for {selected_class} - {selected_date}**")
-            st.info("💡 For absent students, please provide a reason in the notes field")
-            
-            for _, student in class_students.iterrows():
-                col1, col2, col3, col4 = st.columns([1, 3, 2, 2])
-                
-                with col1:
-                    st.write(f"**{student['roll_number']}**")
-                
-                with col2:
-                    st.write(f"{student['name']}")
-                
-                with col3:
-                    # Pre-select existing status if available
-                    existing_status = None
-                    existing_notes = ""
-                    for record in existing_records:
-                        if record['student_id'] == student['id']:
-                            existing_status = record['status']
-                            existing_notes = record.get('notes', '')
-                            break
-                    
-                    status = st.radio(
-                        f"Status_{student['id']}",
-                        ["P", "L", "A", "AP"],
-                        index=["P", "L", "A", "AP"].index(existing_status) if existing_status else 0,
-                        horizontal=True,
-                        key=f"status_{student['id']}_{selected_date}",
-                        label_visibility="collapsed"
-                    )
-                
-                with col4:
-                    # Show notes field (especially important for absences)
-                    notes_placeholder = "Optional notes..."
-                    if status in ['A', 'AP']:
-                        notes_placeholder = "Reason for absence required"
-                    
-                    notes = st.text_input(
-                        "Notes",
-                        value=existing_notes,
-                        placeholder=notes_placeholder,
-                        key=f"notes_{student['id']}_{selected_date}",
-                        label_visibility="collapsed"
-                    )
-                
-                attendance_data.append({
-                    "student_id": student["id"],
-                    "name": student["name"],
-                    "class": selected_class,
-                    "date": selected_date,
-                    "status": status,
-                    "notes": notes,
-                    "roll_number": student["roll_number"]
-                })
+            if missing_reasons and action != "all_present":
+                st.error(f"❌ Please provide reasons for absent students: {', '.join(missing_reasons)}")
+            else:
+                if action == "all_present":
+                    # Auto-mark all as present and clear notes
+                    for student_data in attendance_data:
+                        student_data['status'] = 'P'
+                        student_data['notes'] = ''
                 
-                st.markdown("---")
-            
-            # Form actions
-            col1, col2, col3 = st.columns(3)
+                if save_attendance(attendance_data):
+                    st.success(f"✅ Attendance saved for {selected_class}!")
+                    st.session_state.pop(f"roll_call_grid_{selected_class}_{selected_date}", None)
+                    rerun_fragment()
+                else:
+                    st.error(f"❌ Attendance for {selected_class} was not saved.")
+        
+        if action == "reset":
+            st.session_state.pop(f"roll_call_grid_{selected_class}_{selected_date}", None)
+            rerun_fragment()
+
+def show_roll_call_actions():
+    """Save / Mark All Present / Reset buttons of a roll-call form -> action name or None"""
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        submit_button = st.form_submit_button("💾 Save Attendance", use_container_width=True)
+    
+    with col2:
+        mark_all_present = st.form_submit_button("✅ Mark All Present", use_container_width=True)
+    
+    with col3:
+        clear_form = st.form_submit_button("🔄 Reset Form", use_container_width=True, type="secondary")
+    
+    if mark_all_present:
+        return "all_present"
+    if submit_button:
+        return "save"
+    if clear_form:
+        return "reset"
+    return None
+
+def show_roll_call_grid(selected_class, selected_date, class_students, day_sheet):
+    """Whole-class roll call as one data_editor; edits reach the server only on submit"""
+    saved = [day_sheet.get(sid, ('P', '')) for sid in class_students['id']]
+    grid = pd.DataFrame({
+        'Roll': class_students['roll_number'].values,
+        'Name': class_students['name'].values,
+        'Status': [status or 'P' for status, _ in saved],
+        'Notes': [notes for _, notes in saved]
+    })
+    
+    with st.form(f"attendance_grid_{selected_class}"):
+        st.write(f"**Marking attendance for {selected_class} - {selected_date}**")
+        st.info("💡 For absent students (A / AP), please provide a reason in the Notes column")
+        edited = st.data_editor(
+            grid,
+            use_container_width=True,
+            hide_index=True,
+            num_rows="fixed",
+            disabled=['Roll', 'Name'],
+            column_config={
+                'Status': st.column_config.SelectboxColumn(
+                    'Status', options=["P", "L", "A", "AP"], required=True,
+                    help="P = Present, L = Late, A = Absent, AP = Absent with permission"
+                ),
+                'Notes': st.column_config.TextColumn('Notes', help="Reason for absence / optional notes")
+            },
+            key=f"roll_call_grid_{selected_class}_{selected_date}"
+        )
+        action = show_roll_call_actions()
+    
+    attendance_data = []
+    for (_, student), (_, row) in zip(class_students.iterrows(), edited.iterrows()):
+        notes = row['Notes']
+        attendance_data.append({
+            "student_id": student["id"],
+            "name": student["name"],
+            "class": selected_class,
+            "date": selected_date,
+            "status": row['Status'] or 'P',
+            "notes": notes if isinstance(notes, str) else '',
+            "roll_number": student["roll_number"]
+        })
+    return attendance_data, action
+
+def show_roll_call_form(selected_class, selected_date, class_students, day_sheet):
+    """Per-student roll call: a status radio and notes field for each student"""
+    with st.form(f"attendance_form_{selected_class}"):
+        attendance_data = []
+        
+        st.write(f"**Marking attendance for {selected_class} - {selected_date}**")
+        st.info("💡 For absent students, please provide a reason in the notes field")
+        
+        for _, student in class_students.iterrows():
+            col1, col2, col3, col4 = st.columns([1, 3, 2, 2])
             
             with col1:
-                submit_button = st.form_submit_button("💾 Save Attendance", use_container_width=True)
+                st.write(f"**{student['roll_number']}**")
             
             with col2:
-                mark_all_present = st.form_submit_button("✅ Mark All Present", use_container_width=True)
+                st.write(f"{student['name']}")
             
             with col3:
-                clear_form = st.form_submit_button("🔄 Reset Form", use_container_width=True, type="secondary")
+                # Pre-select existing status if available
+                existing_status, existing_notes = day_sheet.get(student['id'], (None, ""))
+                
+                status = st.radio(
+                    f"Status_{student['id']}",
+                    ["P", "L", "A", "AP"],
+                    index=["P", "L", "A", "AP"].index(existing_status) if existing_status else 0,
+                    horizontal=True,
+                    key=f"status_{student['id']}_{selected_date}",
+                    label_visibility="collapsed"
+                )
             
-            if submit_button or mark_all_present:
-                # Validate absence reasons
-                missing_reasons = []
-                for record in attendance_data:
-                    if record['status'] in ['A', 'AP'] and not record['notes'].strip():
-                        missing_reasons.append(record['name'])
+            with col4:
+                # Show notes field (especially important for absences)
+                notes_placeholder = "Optional notes..."
+                if status in ['A', 'AP']:
+                    notes_placeholder = "Reason for absence required"
                 
-                if missing_reasons and not mark_all_present:
-                    st.error(f"❌ Please provide reasons for absent students: {', '.join(missing_reasons)}")
-                else:
-                    if mark_all_present:
-                        # Auto-mark all as present and clear notes
-                        for student_data in attendance_data:
-                            student_data['status'] = 'P'
-                            student_data['notes'] = ''
-                    
-                    save_attendance(attendance_data)
-                    st.success(f"✅ Attendance saved for {selected_class}!")
-                    st.rerun()
+                notes = st.text_input(
+                    "Notes",
+                    value=existing_notes,
+                    placeholder=notes_placeholder,
+                    key=f"notes_{student['id']}_{selected_date}",
+                    label_visibility="collapsed"
+                )
             
-            if clear_form:
-                st.rerun()
+            attendance_data.append({
+                "student_id": student["id"],
+                "name": student["name"],
+                "class": selected_class,
+                "date": selected_date,
+                "status": status,
+                "notes": notes,
+                "roll_number": student["roll_number"]
+            })
+            
+            st.markdown("---")
+        
+        # Form actions
+        action = show_roll_call_actions()
+    return attendance_data, action
 
 def show_enhanced_student_management(selected_class):
     """Enhanced student management with search and analytics"""
@@ -938,34 +1015,33 @@ def show_enhanced_download_section(selected_class):
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📥 Download Attendance", use_container_width=True, type="primary"):
+        if export_button("📥 Download Attendance", "export_attendance",
+                         (selected_class, start_date, end_date, export_format),
+                         use_container_width=True, type="primary"):
             if export_format == "📋 BIS NOC Custom Format":
                 df = export_to_custom_format(selected_class, start_date, end_date)
                 filename = f"BIS_NOC_{selected_class}_Attendance_{start_date}_to_{end_date}.csv"
                 if not df.empty:
-                    download_link = get_custom_download_link(df, filename, "📥 Download BIS NOC Format")
-                    st.markdown(download_link, unsafe_allow_html=True)
+                    show_custom_download_button(df, filename, "📥 Download BIS NOC Format", export="export_attendance")
                 else:
                     st.warning("No data available for the selected period.")
             elif export_format == "📊 Standard Format":
                 df = get_attendance_report(selected_class, start_date, end_date)
                 filename = f"{selected_class}_attendance_{start_date}_to_{end_date}.csv"
                 if not df.empty:
-                    download_link = create_download_link(df, filename, "📥 Download Standard Format")
-                    st.markdown(download_link, unsafe_allow_html=True)
+                    show_download_button(df, filename, "📥 Download Standard Format", export="export_attendance")
                 else:
                     st.warning("No data available for the selected period.")
             else:
                 df = get_class_attendance_trends(selected_class, (end_date - start_date).days)
                 filename = f"{selected_class}_analytics_{start_date}_to_{end_date}.csv"
                 if not df.empty:
-                    download_link = create_download_link(df, filename, "📥 Download Analytics")
-                    st.markdown(download_link, unsafe_allow_html=True)
+                    show_download_button(df, filename, "📥 Download Analytics", export="export_attendance")
                 else:
                     st.warning("No analytics data available.")
     
     with col2:
-        if st.button("🕒 Download Timetable", use_container_width=True):
+        if export_button("🕒 Download Timetable", "export_timetable", use_container_width=True):
             timetable_data = {
                 "Period": [
                     "Morning Activity, Registration", "Lesson 1", "Lesson 2", "Recess - Snack Time",
@@ -977,17 +1053,16 @@ def show_enhanced_download_section(selected_class):
                 ]
             }
             timetable_df = pd.DataFrame(timetable_data)
-            timetable_link = create_download_link(timetable_df, f"BIS_NOC_Timetable.csv", "📥 Download Timetable")
-            st.markdown(timetable_link, unsafe_allow_html=True)
+            show_download_button(timetable_df, f"BIS_NOC_Timetable.csv", "📥 Download Timetable",
+                                 export="export_timetable")
     
     with col3:
-        if st.button("👥 Download Student List", use_container_width=True):
+        if export_button("👥 Download Student List", "export_students", (selected_class,), use_container_width=True):
             students = get_class_students(selected_class)
             if not students.empty:
-                students_link = create_download_link(students[['roll_number', 'name', 'gender']], 
-                                                   f"BIS_NOC_{selected_class}_Students.csv", 
-                                                   "📥 Download Student List")
-                st.markdown(students_link, unsafe_allow_html=True)
+                show_download_button(students[['roll_number', 'name', 'gender']], 
+                                     f"BIS_NOC_{selected_class}_Students.csv", 
+                                     "📥 Download Student List", export="export_students")
             else:
                 st.warning("No students in this class.")
 
@@ -1032,28 +1107,13 @@ def show_admin_dashboard():
     """Admin Dashboard - FIXED VERSION"""
     st.title("👨‍💼 Admin Dashboard - BIS NOC Campus")
     
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
-        "📊 Overview", 
-        "📢 Send Messages", 
-        "🕒 School Timetable", 
-        "📋 Reports",
-        "👩‍🏫 Teachers Portal"
-    ])
-    
-    with tab1:
-        show_admin_overview()
-    
-    with tab2:
-        show_admin_messages()
-    
-    with tab3:
-        show_admin_timetable()
-    
-    with tab4:
-        show_admin_reports()
-
-    with tab5:
-        show_admin_teachers_portal()
+    show_section_nav("admin_dashboard", {
+        "📊 Overview": show_admin_overview,
+        "📢 Send Messages": show_admin_messages,
+        "🕒 School Timetable": show_admin_timetable,
+        "📋 Reports": show_admin_reports,
+        "👩‍🏫 Teachers Portal": show_admin_teachers_portal
+    })
 
 def show_admin_overview():
     """Admin overview tab - FIXED delta_color error"""
@@ -1067,8 +1127,9 @@ def show_admin_overview():
         st.metric("Total Students", len(st.session_state.students_df))
     with col3:
         today = datetime.date.today()
+        school_summary = get_school_attendance_summary(today)
         marked_today = sum(1 for class_name in st.session_state.classes 
-                          if get_class_attendance_summary(class_name, today))
+                          if school_summary.get(class_name))
         st.metric("Marked Today", f"{marked_today}/{len(st.session_state.classes)}")
     with col4:
         total_attendance = len(st.session_state.attendance_records)
@@ -1080,7 +1141,7 @@ def show_admin_overview():
     cols = st.columns(4)
     for i, class_name in enumerate(st.session_state.classes):
         with cols[i % 4]:
-            summary = get_class_attendance_summary(class_name, datetime.date.today())
+            summary = school_summary.get(class_name)
             
             if summary:
                 # FIXED: Use proper delta_color values
@@ -1214,7 +1275,11 @@ def show_admin_reports():
         ["All Classes Summary", "Individual Class Reports", "Attendance Trends"]
     )
     
-    if st.button("📊 Generate Report", type="primary"):
+    compress = st.checkbox("🗜️ Compress downloads (gzip)", help="Smaller files for long date ranges")
+    
+    # The generated report stays (for both downloads) until its inputs change
+    if export_button("📊 Generate Report", "generate_report", (start_date, end_date, report_type, compress),
+                     type="primary"):
         if report_type == "All Classes Summary":
             df = get_all_classes_report(start_date, end_date)
             if not df.empty:
@@ -1223,11 +1288,36 @@ def show_admin_reports():
                 
                 # Download link
                 filename = f"BIS_NOC_All_Classes_Report_{start_date}_to_{end_date}.csv"
-                download_link = get_custom_download_link(df, filename, "📥 Download Full Report")
-                st.markdown(download_link, unsafe_allow_html=True)
+                show_custom_download_button(df, filename, "📥 Download Full Report", compress=compress)
+                
+                # Excel workbook: summary sheet plus one sheet per class
+                xlsx_download_button(
+                    "📥 Download Excel Workbook", write_attendance_workbook,
+                    filename.replace('.csv', '.xlsx'), df, classes=st.session_state.classes
+                )
             else:
                 st.warning("No data available for the selected period.")
 
+    # Month-end / week-end reports built in the background
+    st.markdown("---")
+    st.subheader("📁 Pre-built Reports")
+    reports = get_available_reports()
+    if reports:
+        labels = [f"{'📅' if r['kind'] == 'month' else '🗓️'} {r['display_name']}" for r in reports]
+        choice = st.selectbox("Report:", range(len(reports)), format_func=lambda i: labels[i], key="prebuilt_report")
+        report = reports[choice]
+        st.caption(f"{report.get('rows') or 0} records · generated {report.get('generated_at') or 'earlier'}")
+        col1, col2 = st.columns(2)
+        with col1:
+            download_button("📥 Download CSV", report['csv_path'].read_bytes, report['csv'],
+                            mime=CSV_MIME, key="prebuilt_report_csv")
+        with col2:
+            if report['xlsx_path']:
+                download_button("📥 Download Excel Workbook", report['xlsx_path'].read_bytes, report['xlsx'],
+                                mime=XLSX_MIME, key="prebuilt_report_xlsx")
+    else:
+        st.info("Monthly and weekly reports are being built in the background; check back shortly.")
+
     # Admin attendance summary (editable) quick access
     st.markdown("---")
     st.subheader("🔎 Admin Attendance Summary & Edits")
@@ -1312,14 +1402,20 @@ def show_admin_teachers_portal():
         selected_teacher_names = st.multiselect("Teacher(s)", list(teacher_options.keys()), key="assign_duty_teachers")
         role = st.text_input("Role/Notes", value=time_slot, key="assign_duty_role")
         if st.button("Assign Duty") and selected_teacher_names:
+            failed = []
             for tname in selected_teacher_names:
                 tid = teacher_options.get(tname)
                 try:
-                    assign_duty(duty_date, time_slot, tid, role)
+                    if not assign_duty(duty_date, time_slot, tid, role):
+                        failed.append(tname)
                 except Exception as e:
                     st.error(f"Failed to assign duty to {tname}: {e}")
-            st.success("Duty(ies) assigned")
-            st.rerun()
+                    failed.append(tname)
+            if failed:
+                st.error(f"Duty not assigned to: {', '.join(failed)}")
+            else:
+                st.success("Duty(ies) assigned")
+                st.rerun()
 
         st.markdown("**Assigned Duties**")
         duties = get_duties_for_date(duty_date)
@@ -1481,13 +1577,11 @@ def show_library_service():
     # Download option (CSV)
     st.markdown("---")
     st.subheader("📥 Download")
-    if st.button("Download CSV"):
+    if export_button("Download CSV", "export_library"):
         if st.session_state.library_records:
             df_all = pd.DataFrame(st.session_state.library_records)
-            csv = df_all.to_csv(index=False)
-            b64 = base64.b64encode(csv.encode()).decode()
-            href = f'<a href="data:file/csv;base64,{b64}" download="library_records.csv">📥 Download library_records.csv</a>'
-            st.markdown(href, unsafe_allow_html=True)
+            show_download_button(df_all, "library_records.csv", "📥 Download library_records.csv",
+                                 export="export_library")
         else:
             st.info("No records to download")
 
@@ -1578,35 +1672,27 @@ def show_clinic_service():
     # Download options: CSV and XLSX (try to produce XLSX in-memory)
     st.markdown("---")
     st.subheader("📥 Download Reports")
-    if st.button("Download CSV for Month"):
+    if export_button("Download CSV for Month", "export_clinic_csv", (month_start,)):
         if month_records:
             df = pd.DataFrame(month_records)
-            csv = df.to_csv(index=False)
-            b64 = base64.b64encode(csv.encode()).decode()
-            href = f'<a href="data:file/csv;base64,{b64}" download="clinic_month_records.csv">📥 Download clinic_month_records.csv</a>'
-            st.markdown(href, unsafe_allow_html=True)
+            show_download_button(df, "clinic_month_records.csv", "📥 Download clinic_month_records.csv",
+                                 export="export_clinic_csv")
         else:
             st.info("No records to download for this month")
 
-    if st.button("Download XLSX for Month"):
+    if export_button("Download XLSX for Month", "export_clinic_xlsx", (month_start,)):
         if month_records:
             try:
-                import openpyxl  # noqa: F401
                 df = pd.DataFrame(month_records)
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, sheet_name='ClinicRecords')
-                data = output.getvalue()
-                b64 = base64.b64encode(data).decode()
-                href = f'<a href="data:application/octet-stream;base64,{b64}" download="clinic_month_records.xlsx">📥 Download clinic_month_records.xlsx</a>'
-                st.markdown(href, unsafe_allow_html=True)
+                xlsx_download_button(
+                    "📥 Download clinic_month_records.xlsx", write_xlsx, "clinic_month_records.xlsx",
+                    [('ClinicRecords', df.columns, df)], export="export_clinic_xlsx"
+                )
             except Exception as e:
-                st.error("Failed to create XLSX. Make sure openpyxl is installed. Falling back to CSV.")
+                st.error(f"Failed to create XLSX ({e}). Falling back to CSV.")
                 df = pd.DataFrame(month_records)
-                csv = df.to_csv(index=False)
-                b64 = base64.b64encode(csv.encode()).decode()
-                href = f'<a href="data:file/csv;base64,{b64}" download="clinic_month_records.csv">📥 Download clinic_month_records.csv</a>'
-                st.markdown(href, unsafe_allow_html=True)
+                show_download_button(df, "clinic_month_records.csv", "📥 Download clinic_month_records.csv",
+                                     key="clinic_xlsx_fallback", export="export_clinic_xlsx")
         else:
             st.info("No records to download for this month")
 
@@ -1618,7 +1704,8 @@ def show_admin_attendance_review():
     cls = st.selectbox("Class", st.session_state.classes)
     month = st.selectbox("Month", list(range(1,13)), index=datetime.date.today().month-1)
     year = st.number_input("Year", min_value=2020, max_value=2100, value=datetime.date.today().year)
-    if st.button("Load Summary"):
+    # The summary stays loaded (for the download and the upload below) until class or month change
+    if export_button("Load Summary", "admin_review", (cls, month, year)):
         start = datetime.date(year, month, 1)
         end = start.replace(day=calendar.monthrange(year, month)[1])
         df = get_attendance_report(cls, start, end)
@@ -1627,10 +1714,7 @@ def show_admin_attendance_review():
         else:
             st.dataframe(df, use_container_width=True)
             # Admin can edit: allow CSV download, edit offline and re-upload
-            csv = df.to_csv(index=False)
-            b64 = base64.b64encode(csv.encode()).decode()
-            href = f'<a href="data:file/csv;base64,{b64}" download="{cls}_attendance_{month}_{year}.csv">📥 Download CSV for offline edit</a>'
-            st.markdown(href, unsafe_allow_html=True)
+            show_download_button(df, f"{cls}_attendance_{month}_{year}.csv", "📥 Download CSV for offline edit")
             st.markdown("---")
             st.write("📤 Upload edited CSV to apply corrections:")
             uploaded = st.file_uploader("Upload CSV", type=['csv'])
@@ -1728,9 +1812,11 @@ def show_teacher_portal(teacher_id):
                 # Normalize columns
                 if 'id' in df_to_save.columns and 'student_id' not in df_to_save.columns:
                     df_to_save = df_to_save.rename(columns={'id':'student_id'})
-                save_marksheet(teacher_id, cls, subj, df_to_save)
-                st.success("✅ Marksheet saved")
-                st.rerun()
+                if save_marksheet(teacher_id, cls, subj, df_to_save):
+                    st.success("✅ Marksheet saved")
+                    st.rerun()
+                else:
+                    st.error("❌ Marksheet was not saved.")
 
     # Back button to subject list
     if st.button("⬅️ Back to Subjects"):
@@ -3,11 +3,12 @@ import streamlit as st
 import pandas as pd
 import datetime
 import calendar
-import base64
 from utils.data_models_supabase import (
     initialize_session_state, 
     save_attendance, 
     get_class_attendance_summary,
+    get_class_day_sheet,
+    get_school_attendance_summary,
     get_class_color, 
     send_class_notification, 
     get_class_notifications,
@@ -39,8 +40,13 @@ from utils.data_models_supabase import (
     get_class_attendance_trends,
     search_students,
     get_live_timetable_status,
-    export_to_custom_format
+    export_to_custom_format,
+    load_school_overview,
+    prefetch_class_view
 )
+from utils.fragments import fragment, rerun_fragment
+from utils.downloads import csv_download_button
+from utils.excel_reports import build_attendance_grid
 
 # Initialize session state FIRST
 initialize_session_state()
@@ -182,22 +188,16 @@ def show_custom_header():
     
     st.markdown("---")
 
-def create_download_link(df, filename, text):
-    """Generate a download link for DataFrame"""
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{text}</a>'
-    return href
+def show_download_button(df, filename, text, key=None, compress=False, export=None):
+    """Download button for a DataFrame as CSV"""
+    return csv_download_button(text, df, filename, compress=compress, key=key, export=export)
 
-def get_custom_download_link(df, filename, text):
-    """Generate download link with BIS NOC custom formatting"""
+def show_custom_download_button(df, filename, text, key=None, compress=False, export=None):
+    """Download button with BIS NOC custom formatting"""
     if 'Date' in df.columns:
         df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%d/%m/%Y')
     
-    csv = df.to_csv(index=False, encoding='utf-8-sig')
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{text}</a>'
-    return href
+    return csv_download_button(text, df, filename, compress=compress, key=key, encoding='utf-8-sig', export=export)
 
 def show_quick_actions(selected_class):
     """Quick actions sidebar for teachers"""
@@ -273,6 +273,8 @@ def main():
     
     # Quick actions for class view
     if st.session_state.selected_class and st.session_state.selected_class != "Admin":
+        if st.session_state.selected_class in st.session_state.classes:
+            prefetch_class_view(st.session_state.selected_class, datetime.date.today())
         show_quick_actions(st.session_state.selected_class)
 
     # Sidebar: small navigation only (Teachers are managed in Admin Teachers Portal)
@@ -330,15 +332,18 @@ def show_welcome_screen():
     st.markdown("---")
     st.subheader("📊 School Overview")
     
+    today = datetime.date.today()
+    overview = load_school_overview(today)
+    
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("Total Classes", len(st.session_state.classes))
     with col2:
         st.metric("Total Students", len(st.session_state.students_df))
     with col3:
-        today = datetime.date.today()
+        school_summary = overview['school_summary']
         marked_today = sum(1 for class_name in st.session_state.classes 
-                          if get_class_attendance_summary(class_name, today))
+                          if school_summary.get(class_name))
         st.metric("Marked Today", f"{marked_today}/{len(st.session_state.classes)}")
     with col4:
         st.metric("Current Time", datetime.datetime.now().strftime("%H:%M"))
@@ -346,16 +351,36 @@ def show_welcome_screen():
     # Show today's duties briefly for teachers to notice
     st.markdown("---")
     st.subheader("👩‍🏫 Today's Duties")
-    today = datetime.date.today()
-    duties = get_duties_for_date(today)
+    duties = overview['duties']
+    teachers_by_id = {t.get('id'): t for t in overview['teachers']}
     if duties:
         for d in duties:
-            teacher = get_teacher_by_id(d.get('teacher_id'))
+            teacher = teachers_by_id.get(d.get('teacher_id'))
             teacher_name = teacher['name'] if teacher else f"ID {d.get('teacher_id')}"
             st.markdown(f"- {d.get('time_slot')} — {teacher_name} ({d.get('role')})")
     else:
         st.info("No duties assigned for today")
 
+def show_section_nav(name, sections):
+    """Horizontal section switcher that renders only the selected section.
+
+    st.tabs runs every tab body on each rerun; this runs one. The choice is kept
+    in session state, so it survives visiting another page and coming back.
+    """
+    if 'nav_sections' not in st.session_state:
+        st.session_state.nav_sections = {}
+    labels = list(sections)
+    key = f"nav_{name}"
+    # Widget state is dropped while the view is not shown; restore it from nav_sections
+    if st.session_state.get(key) not in labels:
+        saved = st.session_state.nav_sections.get(name)
+        st.session_state[key] = saved if saved in labels else labels[0]
+    
+    choice = st.radio(name, labels, horizontal=True, key=key, label_visibility="collapsed")
+    st.session_state.nav_sections[name] = choice
+    st.markdown("---")
+    sections[choice]()
+
 def show_class_view():
     """Show class-specific view with enhanced tabs"""
     selected_class = st.session_state.selected_class
@@ -364,36 +389,20 @@ def show_class_view():
     # TOPBAR NAVIGATION with class color
     st.markdown(f"<h1 style='color: {class_color}'>🎒 {selected_class}</h1>", unsafe_allow_html=True)
     
-    # Create enhanced topbar tabs
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "🎯 Attendance", 
-        "👥 Manage Students",
-        "📅 Timetable", 
-        "📝 Daily Notes",
-        "📥 Export Data", 
-        "🔔 Notifications"
-    ])
-    
-    with tab1:
-        show_class_attendance(selected_class)
-    
-    with tab2:
-        show_enhanced_student_management(selected_class)
-    
-    with tab3:
-        show_timetable_table(selected_class)
-    
-    with tab4:
-        show_daily_notes(selected_class)
-    
-    with tab5:
-        show_enhanced_download_section(selected_class)
-    
-    with tab6:
-        show_class_notifications(selected_class)
+    # Topbar navigation: only the selected section runs
+    show_section_nav("class_view", {
+        "🎯 Attendance": lambda: show_class_attendance(selected_class),
+        "👥 Manage Students": lambda: show_enhanced_student_management(selected_class),
+        "📅 Timetable": lambda: show_timetable_table(selected_class),
+        "📝 Daily Notes": lambda: show_daily_notes(selected_class),
+        "📥 Export Data": lambda: show_enhanced_download_section(selected_class),
+        "🔔 Notifications": lambda: show_class_notifications(selected_class)
+    })
 
+@fragment
 def show_class_attendance(selected_class):
-    """Enhanced Attendance tab with absence reasons"""
+    """Enhanced Attendance tab with absence reasons.
+    Runs as a fragment: saving reruns this tab only, not the whole page."""
     st.subheader(f"🎯 Attendance - {selected_class}")
     
     # Date selection
@@ -425,11 +434,8 @@ def show_class_attendance(selected_class):
         if st.button("📝 Mark Attendance", use_container_width=True):
             st.session_state.mark_attendance_expanded = True
     
-    # Check if already marked
-    existing_records = [
-        r for r in st.session_state.attendance_records 
-        if r['class'] == selected_class and r['date'] == selected_date.isoformat()
-    ]
+    # Saved roll call for this class and date: {student_id: (status, notes)}
+    day_sheet = get_class_day_sheet(selected_class, selected_date)
 
     # Monthly summary (read-only for teachers, editable for admin)
     if st.button("📆 Monthly Summary"):
@@ -441,21 +447,26 @@ def show_class_attendance(selected_class):
             st.info("No attendance data for previous month")
         else:
             st.subheader(f"Attendance Summary: {month_start.strftime('%B %Y')}")
-            st.dataframe(df, use_container_width=True)
+            roster = None
+            if not class_students.empty:
+                roster = class_students[['id', 'name']].rename(columns={'id': 'student_id'})
+            grid = build_attendance_grid(df, month_start, month_end, roster=roster)
+            st.dataframe(grid, use_container_width=True, hide_index=True)
+            with st.expander("Attendance records"):
+                st.dataframe(df, use_container_width=True)
             if st.session_state.get('selected_class') == 'Admin':
                 st.warning("Admin can edit records here: select a row and use the edit tools below.")
     
-    if existing_records:
+    if day_sheet:
         st.success(f"✅ Attendance already marked for {selected_date}")
         
         # Show summary of existing records
         status_counts = {}
         absence_with_reasons = []
-        for record in existing_records:
-            status = record['status']
+        for student_id, (status, notes) in day_sheet.items():
             status_counts[status] = status_counts.get(status, 0) + 1
-            if status in ['A', 'AP'] and record.get('notes'):
-                absence_with_reasons.append(record)
+            if status in ['A', 'AP'] and notes:
+                absence_with_reasons.append((student_id, status, notes))
         
         st.write("**Current Status:**")
         cols = st.columns(4)
@@ -474,113 +485,183 @@ def show_class_attendance(selected_class):
         # Show absence reasons if any
         if absence_with_reasons:
             st.subheader("📋 Absence Reasons")
-            for record in absence_with_reasons:
+            student_names = dict(zip(class_students['id'], class_students['name']))
+            for student_id, status, notes in absence_with_reasons:
                 with st.container():
                     st.markdown(f"""
                     <div class="absence-reason">
-                        <strong>{record['name']}</strong> ({record['status']}): {record.get('notes', 'No reason provided')}
+                        <strong>{student_names.get(student_id, student_id)}</strong> ({status}): {notes}
                     </div>
                     """, unsafe_allow_html=True)
     
-    # Enhanced attendance marking form with reason field
+    # Enhanced attendance marking with reason field
     with st.expander("📝 Mark/Edit Attendance", expanded=st.session_state.get('mark_attendance_expanded', False)):
         if 'mark_attendance_expanded' in st.session_state:
             del st.session_state.mark_attendance_expanded
+        
+        mode = st.radio(
+            "Roll call mode",
+            ["📋 Grid", "📝 Form"],
+            horizontal=True,
+            key=f"roll_call_mode_{selected_class}",
+            help="Grid edits the whole class in one table; Form shows a row of buttons per student"
+        )
+        if mode == "📋 Grid":
+            attendance_data, action = show_roll_call_grid(selected_class, selected_date, class_students, day_sheet)
+        else:
+            attendance_data, action = show_roll_call_form(selected_class, selected_date, class_students, day_sheet)
+        
+        if action in ("save", "all_present"):
+            # Validate absence reasons
+            missing_reasons = []
+            for record in attendance_data:
+                if record['status'] in ['A', 'AP'] and not record['notes'].strip():
+                    missing_reasons.append(record['name'])
             
-        with st.form(f"attendance_form_{selected_class}"):
-            attendance_data = []
-            
-            st.write(f"**Marking attendance for {selected_class} - {selected_date}**")
-            st.info("💡 For absent students, please provide a reason in the notes field")
-            
-            for _, student in class_students.iterrows():
-                col1, col2, col3, col4 = st.columns([1, 3, 2, 2])
-                
-                with col1:
-                    st.write(f"**{student['roll_number']}**")
-                
-                with col2:
-                    st.write(f"{student['name']}")
-                
-                with col3:
-                    # Pre-select existing status if available
-                    existing_status = None
-                    existing_notes = ""
-                    for record in existing_records:
-                        if record['student_id'] == student['id']:
-                            existing_status = record['status']
-                            existing_notes = record.get('notes', '')
-                            break
-                    
-                    status = st.radio(
-                        f"Status_{student['id']}",
-                        ["P", "L", "A", "AP"],
-                        index=["P", "L", "A", "AP"].index(existing_status) if existing_status else 0,
-                        horizontal=True,
-                        key=f"status_{student['id']}_{selected_date}",
-                        label_visibility="collapsed"
-                    )
-                
-                with col4:
-                    # Show notes field (especially important for absences)
-                    notes_placeholder = "Optional notes..."
-                    if status in ['A', 'AP']:
-                        notes_placeholder = "Reason for absence required"
-                    
-                    notes = st.text_input(
-                        "Notes",
-                        value=existing_notes,
-                        placeholder=notes_placeholder,
-                        key=f"notes_{student['id']}_{selected_date}",
-                        label_visibility="collapsed"
-                    )
-                
-                attendance_data.append({
-                    "student_id": student["id"],
-                    "name": student["name"],
-                    "class": selected_class,
-                    "date": selected_date,
-                    "status": status,
-                    "notes": notes,
-                    "roll_number": student["roll_number"]
-                })
+            if missing_reasons and action != "all_present":
+                st.error(f"❌ Please provide reasons for absent students: {', '.join(missing_reasons)}")
+            else:
+                if action == "all_present":
+                    # Auto-mark all as present and clear notes
+                    for student_data in attendance_data:
+                        student_data['status'] = 'P'
+                        student_data['notes'] = ''
                 
-                st.markdown("---")
-            
-            # Form actions
-            col1, col2, col3 = st.columns(3)
+                if save_attendance(attendance_data):
+                    st.success(f"✅ Attendance saved for {selected_class}!")
+                    st.session_state.pop(f"roll_call_grid_{selected_class}_{selected_date}", None)
+                    rerun_fragment()
+                else:
+                    st.error(f"❌ Attendance for {selected_class} was not saved.")
+        
+        if action == "reset":
+            st.session_state.pop(f"roll_call_grid_{selected_class}_{selected_date}", None)
+            rerun_fragment()
+
+def show_roll_call_actions():
+    """Save / Mark All Present / Reset buttons of a roll-call form -> action name or None"""
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        submit_button = st.form_submit_button("💾 Save Attendance", use_container_width=True)
+    
+    with col2:
+        mark_all_present = st.form_submit_button("✅ Mark All Present", use_container_width=True)
+    
+    with col3:
+        clear_form = st.form_submit_button("🔄 Reset Form", use_container_width=True, type="secondary")
+    
+    if mark_all_present:
+        return "all_present"
+    if submit_button:
+        return "save"
+    if clear_form:
+        return "reset"
+    return None
+
+def show_roll_call_grid(selected_class, selected_date, class_students, day_sheet):
+    """Whole-class roll call as one data_editor; edits reach the server only on submit"""
+    saved = [day_sheet.get(sid, ('P', '')) for sid in class_students['id']]
+    grid = pd.DataFrame({
+        'Roll': class_students['roll_number'].values,
+        'Name': class_students['name'].values,
+        'Status': [status or 'P' for status, _ in saved],
+        'Notes': [notes for _, notes in saved]
+    })
+    
+    with st.form(f"attendance_grid_{selected_class}"):
+        st.write(f"**Marking attendance for {selected_class} - {selected_date}**")
+        st.info("💡 For absent students (A / AP), please provide a reason in the Notes column")
+        edited = st.data_editor(
+            grid,
+            use_container_width=True,
+            hide_index=True,
+            num_rows="fixed",
+            disabled=['Roll', 'Name'],
+            column_config={
+                'Status': st.column_config.SelectboxColumn(
+                    'Status', options=["P", "L", "A", "AP"], required=True,
+                    help="P = Present, L = Late, A = Absent, AP = Absent with permission"
+                ),
+                'Notes': st.column_config.TextColumn('Notes', help="Reason for absence / optional notes")
+            },
+            key=f"roll_call_grid_{selected_class}_{selected_date}"
+        )
+        action = show_roll_call_actions()
+    
+    attendance_data = []
+    for (_, student), (_, row) in zip(class_students.iterrows(), edited.iterrows()):
+        notes = row['Notes']
+        attendance_data.append({
+            "student_id": student["id"],
+            "name": student["name"],
+            "class": selected_class,
+            "date": selected_date,
+            "status": row['Status'] or 'P',
+            "notes": notes if isinstance(notes, str) else '',
+            "roll_number": student["roll_number"]
+        })
+    return attendance_data, action
+
+def show_roll_call_form(selected_class, selected_date, class_students, day_sheet):
+    """Per-student roll call: a status radio and notes field for each student"""
+    with st.form(f"attendance_form_{selected_class}"):
+        attendance_data = []
+        
+        st.write(f"**Marking attendance for {selected_class} - {selected_date}**")
+        st.info("💡 For absent students, please provide a reason in the notes field")
+        
+        for _, student in class_students.iterrows():
+            col1, col2, col3, col4 = st.columns([1, 3, 2, 2])
             
             with col1:
-                submit_button = st.form_submit_button("💾 Save Attendance", use_container_width=True)
+                st.write(f"**{student['roll_number']}**")
             
             with col2:
-                mark_all_present = st.form_submit_button("✅ Mark All Present", use_container_width=True)
+                st.write(f"{student['name']}")
             
             with col3:
-                clear_form = st.form_submit_button("🔄 Reset Form", use_container_width=True, type="secondary")
+                # Pre-select existing status if available
+                existing_status, existing_notes = day_sheet.get(student['id'], (None, ""))
+                
+                status = st.radio(
+                    f"Status_{student['id']}",
+                    ["P", "L", "A", "AP"],
+                    index=["P", "L", "A", "AP"].index(existing_status) if existing_status else 0,
+                    horizontal=True,
+                    key=f"status_{student['id']}_{selected_date}",
+                    label_visibility="collapsed"
+                )
             
-            if submit_button or mark_all_present:
-                # Validate absence reasons
-                missing_reasons = []
-                for record in attendance_data:
-                    if record['status'] in ['A', 'AP'] and not record['notes'].strip():
-                        missing_reasons.append(record['name'])
+            with col4:
+                # Show notes field (especially important for absences)
+                notes_placeholder = "Optional notes..."
+                if status in ['A', 'AP']:
+                    notes_placeholder = "Reason for absence required"
                 
-                if missing_reasons and not mark_all_present:
-                    st.error(f"❌ Please provide reasons for absent students: {', '.join(missing_reasons)}")
-                else:
-                    if mark_all_present:
-                        # Auto-mark all as present and clear notes
-                        for student_data in attendance_data:
-                            student_data['status'] = 'P'
-                            student_data['notes'] = ''
-                    
-                    save_attendance(attendance_data)
-                    st.success(f"✅ Attendance saved for {selected_class}!")
-                    st.rerun()
+                notes = st.text_input(
+                    "Notes",
+                    value=existing_notes,
+                    placeholder=notes_placeholder,
+                    key=f"notes_{student['id']}_{selected_date}",
+                    label_visibility="collapsed"
+                )
             
-            if clear_form:
-                st.rerun()
+            attendance_data.append({
+                "student_id": student["id"],
+                "name": student["name"],
+                "class": selected_class,
+                "date": selected_date,
+                "status": status,
+                "notes": notes,
+                "roll_number": student["roll_number"]
+            })
+            
+            st.markdown("---")
+        
+        # Form actions
+        action = show_roll_call_actions()
+    return attendance_data, action
 
 # Continue with the rest of the functions...
 # (The remaining functions would be similar to the original app.py but using Supabase data models)
@@ -37,6 +37,7 @@ CREATE TABLE attendance_records (
     notes TEXT,
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     UNIQUE(student_id, date)
 );
 
@@ -100,12 +101,57 @@ CREATE TABLE class_notifications (
 -- Create indexes for better performance
 CREATE INDEX idx_attendance_student_date ON attendance_records(student_id, date);
 CREATE INDEX idx_attendance_class_date ON attendance_records(class, date);
+-- Delta sync (utils/supabase_sync.py) pages through rows changed since a watermark
+CREATE INDEX idx_attendance_updated_at ON attendance_records(updated_at, id);
+CREATE INDEX idx_students_updated_at ON students(updated_at, id);
 CREATE INDEX idx_students_class ON students(class);
 CREATE INDEX idx_teachers_type ON teachers(type);
 CREATE INDEX idx_duties_date ON duties(date);
 CREATE INDEX idx_marksheets_teacher_class ON marksheets(teacher_id, class_name);
 CREATE INDEX idx_notifications_class ON class_notifications(class_name);
 
+-- Attendance aggregation for summaries and trends (called via supabase.rpc):
+-- one row per class/date/status instead of one row per student
+CREATE OR REPLACE FUNCTION attendance_status_counts(
+    p_start_date DATE,
+    p_end_date DATE,
+    p_class VARCHAR DEFAULT NULL
+)
+RETURNS TABLE (
+    class_name VARCHAR,
+    attendance_date DATE,
+    status TEXT,
+    record_count BIGINT
+) AS $$
+    -- status is CHAR(2), so trim the blank padding ('P ' -> 'P')
+    SELECT a.class, a.date, RTRIM(a.status)::TEXT, COUNT(*)
+    FROM attendance_records a
+    WHERE a.date BETWEEN p_start_date AND p_end_date
+      AND (p_class IS NULL OR a.class = p_class)
+    GROUP BY a.class, a.date, RTRIM(a.status)
+    ORDER BY a.date, a.class, 3;
+$$ LANGUAGE sql STABLE;
+
+-- Atomic attendance save (called via supabase.rpc): upserts a whole batch on
+-- UNIQUE(student_id, date) in a single statement and returns the rows written
+CREATE OR REPLACE FUNCTION save_attendance_batch(p_records JSONB)
+RETURNS INTEGER AS $$
+    WITH saved AS (
+        INSERT INTO attendance_records (student_id, class, date, status, notes, timestamp)
+        SELECT r.student_id, r.class, r.date, r.status, r.notes, COALESCE(r.timestamp, NOW())
+        FROM jsonb_to_recordset(p_records) AS r(
+            student_id INTEGER, class VARCHAR, date DATE, status CHAR(2), notes TEXT, timestamp TIMESTAMPTZ
+        )
+        ON CONFLICT (student_id, date) DO UPDATE SET
+            class = EXCLUDED.class,
+            status = EXCLUDED.status,
+            notes = EXCLUDED.notes,
+            timestamp = EXCLUDED.timestamp
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM saved;
+$$ LANGUAGE sql;
+
 -- Create updated_at trigger function
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -122,6 +168,13 @@ CREATE TRIGGER update_students_updated_at BEFORE UPDATE ON students
 CREATE TRIGGER update_teachers_updated_at BEFORE UPDATE ON teachers
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Projects created before attendance_records.updated_at existed can add it with:
+--   ALTER TABLE attendance_records ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+--   CREATE INDEX IF NOT EXISTS idx_attendance_updated_at ON attendance_records(updated_at, id);
+-- plus the trigger below (until then the delta sync falls back to created_at)
+CREATE TRIGGER update_attendance_records_updated_at BEFORE UPDATE ON attendance_records
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 CREATE TRIGGER update_class_timetables_updated_at BEFORE UPDATE ON class_timetables
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
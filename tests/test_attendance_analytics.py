@@ -0,0 +1,48 @@
+# tests/test_attendance_analytics.py
+import datetime
+
+import pandas as pd
+import pytest
+
+from utils.attendance_analytics import class_summary_stats, counts_frame
+from utils.attendance_store import AttendanceStore
+
+DAY1, DAY2 = datetime.date(2025, 10, 6), datetime.date(2025, 10, 7)
+
+
+def _store(day_statuses):
+    store = AttendanceStore()
+    student_id = 0
+    for day, statuses in day_statuses:
+        records = []
+        for status in statuses:
+            student_id += 1
+            records.append({'student_id': student_id, 'class': 'Y3', 'date': day, 'status': status})
+        store.replace_class_day('Y3', day, records)
+    return store
+
+
+def _value_counts_issue(store):
+    """The tie-break of the original implementation: value_counts() over the records"""
+    df = pd.DataFrame(store.class_range('Y3'))
+    counts = df[df['status'] != 'P']['status'].value_counts()
+    return counts.index[0] if not counts.empty else 'none'
+
+
+@pytest.mark.parametrize('day_statuses', [
+    [(DAY1, ['P', 'A']), (DAY2, ['L'])],                  # A first, tied with L
+    [(DAY1, ['P', 'L']), (DAY2, ['A'])],                  # L first, tied with A
+    [(DAY1, ['AP', 'L', 'A']), (DAY2, ['A', 'L', 'AP'])],  # three-way tie on the same day
+    [(DAY1, ['P']), (DAY2, ['A', 'A', 'L'])],             # no tie
+    [(DAY1, ['P', 'P'])],                                 # no issues
+])
+def test_most_common_issue_matches_value_counts(day_statuses):
+    store = _store(day_statuses)
+    stats = class_summary_stats(counts_frame(store.daily_status_counts('Y3')))
+    assert stats['most_common_issue'] == _value_counts_issue(store)
+
+
+def test_counts_frame_keeps_every_status_column():
+    counts = counts_frame([(DAY1, {'A': 1, 'P': 2})])
+    assert list(counts.columns) == ['A', 'P', 'L', 'AP']
+    assert counts.loc[pd.Timestamp(DAY1)].tolist() == [1, 2, 0, 0]
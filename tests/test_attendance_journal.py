@@ -0,0 +1,85 @@
+# tests/test_attendance_journal.py
+import datetime
+
+import pytest
+
+from utils import data_models
+from utils.attendance_journal import append_journal_entry, read_journal_entries, replay_journal, truncate_journal
+from utils.attendance_store import AttendanceStore
+
+DAY = datetime.date(2025, 10, 6)
+
+
+def _record(student_id, status, class_name='Y3', day=DAY):
+    return {'student_id': student_id, 'name': f"S{student_id}", 'class': class_name, 'date': day, 'status': status}
+
+
+def _statuses(store):
+    return sorted((r['class'], r['date'], r['student_id'], r['status']) for r in store)
+
+
+def test_torn_line_is_skipped_and_later_entries_survive(tmp_path):
+    journal = tmp_path / "attendance_journal.jsonl"
+    append_journal_entry(journal, {'op': 'upsert', 'records': [_record(1, 'P')]})
+    with open(journal, 'a', encoding='utf-8') as f:
+        f.write('{"op": "upsert", "reco')  # write cut short by a crash
+    append_journal_entry(journal, {'op': 'upsert', 'records': [_record(2, 'A')]})
+
+    entries = read_journal_entries(journal)
+
+    assert [e['records'][0]['student_id'] for e in entries] == [1, 2]
+    assert entries[0]['records'][0]['date'] == '2025-10-06'
+
+
+def test_replay_applies_replace_and_upsert_in_order(tmp_path):
+    journal = tmp_path / "attendance_journal.jsonl"
+    append_journal_entry(journal, {'op': 'replace', 'class': 'Y3', 'date': DAY,
+                                   'records': [_record(1, 'P'), _record(2, 'P')]})
+    append_journal_entry(journal, {'op': 'upsert', 'records': [_record(2, 'L')]})
+    append_journal_entry(journal, {'op': 'replace', 'class': 'Y3', 'date': DAY, 'records': [_record(1, 'A')]})
+    store = AttendanceStore([_record(3, 'P'), _record(4, 'P', class_name='Y4')])
+
+    replay_journal(store, read_journal_entries(journal))
+
+    assert _statuses(store) == [('Y3', DAY, 1, 'A'), ('Y4', DAY, 4, 'P')]
+
+
+def test_upsert_keeps_fields_it_does_not_set():
+    store = AttendanceStore([_record(1, 'P')])
+
+    replay_journal(store, [{'op': 'upsert', 'records': [{'student_id': 1, 'class': 'Y3',
+                                                          'date': '2025-10-06', 'status': 'AP'}]}])
+
+    assert store.class_day('Y3', DAY) == [dict(_record(1, 'AP'))]
+
+
+def test_truncate_empties_the_journal(tmp_path):
+    journal = tmp_path / "attendance_journal.jsonl"
+    append_journal_entry(journal, {'op': 'upsert', 'records': [_record(1, 'P')]})
+
+    truncate_journal(journal)
+
+    assert read_journal_entries(journal) == []
+    append_journal_entry(journal, {'op': 'upsert', 'records': [_record(2, 'P')]})
+    assert len(read_journal_entries(journal)) == 1
+
+
+@pytest.fixture
+def csv_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_models, 'ATTENDANCE_FILE', tmp_path / "attendance_records.csv")
+    monkeypatch.setattr(data_models, 'ATTENDANCE_JOURNAL_FILE', tmp_path / "attendance_journal.jsonl")
+    monkeypatch.setattr(data_models, 'use_parquet_storage', lambda: False)
+    data_models.save_attendance_to_disk([_record(1, 'P'), _record(2, 'P')])
+    return tmp_path
+
+
+def test_compaction_folds_the_journal_into_the_base_file(csv_history):
+    append_journal_entry(data_models.ATTENDANCE_JOURNAL_FILE, {'op': 'upsert', 'records': [_record(2, 'A')]})
+    before = _statuses(data_models.load_attendance_store_from_disk())
+
+    data_models.compact_attendance_journal()
+
+    assert read_journal_entries(data_models.ATTENDANCE_JOURNAL_FILE) == []
+    assert _statuses(data_models.load_attendance_store_from_disk()) == before == [
+        ('Y3', DAY, 1, 'P'), ('Y3', DAY, 2, 'A')
+    ]
@@ -0,0 +1,36 @@
+# tests/test_data_models.py
+from streamlit.testing.v1 import AppTest
+
+
+def _duties_session():
+    """A session that takes its copy of the shared duties and, when asked, edits it without saving"""
+    import streamlit as st
+    from utils import data_models
+
+    shared = data_models._shared_data().setdefault('duties', (None, {'2025-10-01': ['Gate']}))[1]
+    st.session_state.duties = data_models._session_copy('duties', shared)
+    st.session_state.shared_duties = shared
+    if st.session_state.get('edit'):
+        st.session_state.duties['2025-10-01'].append('Library')
+
+
+def test_unsaved_edits_stay_in_their_session():
+    editor, other = AppTest.from_function(_duties_session), AppTest.from_function(_duties_session)
+    editor.session_state['edit'] = True
+    editor.run()
+    other.run()
+
+    assert not editor.exception and not other.exception
+    assert editor.session_state['duties'] == {'2025-10-01': ['Gate', 'Library']}
+    assert editor.session_state['shared_duties'] == {'2025-10-01': ['Gate']}
+    assert other.session_state['duties'] == {'2025-10-01': ['Gate']}
+
+
+def test_session_copy_survives_reruns():
+    session = AppTest.from_function(_duties_session)
+    session.session_state['edit'] = True
+    session.run()
+    session.session_state['edit'] = False
+    session.run()
+
+    assert session.session_state['duties'] == {'2025-10-01': ['Gate', 'Library']}
@@ -0,0 +1,120 @@
+# tests/test_data_models_sqlite.py
+import datetime
+import threading
+
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from utils import data_models
+from utils import data_models_sqlite as db
+
+DAY = datetime.date(2025, 10, 6)
+
+
+def _seed(conn):
+    conn.executemany(
+        "INSERT INTO students (id, name, class, gender, roll_number) VALUES (?, ?, ?, ?, ?)",
+        [(1, 'Ann', 'Y3', 'F', 'Y3-01'), (2, 'Ben', 'Y3', 'M', 'Y3-02')]
+    )
+    conn.execute("INSERT INTO teachers (id, name, type) VALUES (1, 'Ms Lee', 'Main')")
+    conn.commit()
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """A fresh database holding students 1-2 and teacher 1"""
+    monkeypatch.setattr(db, 'SQLITE_DB_PATH', tmp_path / "bis_noc.db")
+    monkeypatch.setattr(db, '_local', threading.local())
+    monkeypatch.setattr(db, '_schema_ready', False)
+    monkeypatch.setattr(db, '_seed_from_files', _seed)
+    yield db
+    db.get_connection().close()
+
+
+def _roll_call(*statuses):
+    return [
+        {'student_id': student_id, 'name': name, 'roll_number': f"Y3-0{student_id}",
+         'class': 'Y3', 'date': DAY, 'status': status, 'notes': ''}
+        for (student_id, name), status in zip([(1, 'Ann'), (2, 'Ben'), (3, 'Cat')], statuses)
+    ]
+
+
+def test_roll_call_with_unknown_student_is_refused(sqlite_db):
+    assert sqlite_db.save_attendance(_roll_call('P', 'A', 'L')) is False
+    assert sqlite_db.get_class_day_sheet('Y3', DAY) == {}
+
+
+def test_refused_roll_call_keeps_the_saved_one(sqlite_db):
+    assert sqlite_db.save_attendance(_roll_call('P', 'A'))
+    assert sqlite_db.save_attendance(_roll_call('A', 'A', 'A')) is False
+    assert sqlite_db.get_class_day_sheet('Y3', DAY) == {1: ('P', ''), 2: ('A', '')}
+
+
+def test_invalid_status_is_refused(sqlite_db):
+    assert sqlite_db.update_attendance_from_list(_roll_call('X')) is False
+    assert sqlite_db.get_class_day_sheet('Y3', DAY) == {}
+
+
+def test_duty_and_marksheet_for_unknown_ids_are_refused(sqlite_db):
+    assert sqlite_db.assign_duty(DAY, 'Lunch Time', 9, 'Gate') is False
+    assert sqlite_db.assign_duty(DAY, 'Lunch Time', 1, 'Gate')
+    assert sqlite_db.get_duties_for_date(DAY) == [{'time': 'Lunch Time', 'teacher_id': 1, 'role': 'Gate'}]
+
+    marks = pd.DataFrame({'student_id': [1, 7], 'roll_number': ['Y3-01', 'Y3-07'], 'name': ['Ann', 'Gus'], 'Test 1': [9, 8]})
+    assert sqlite_db.save_marksheet(1, 'Y3', 'Maths', marks) is False
+    assert sqlite_db.get_marksheet(1, 'Y3', 'Maths').empty
+    assert sqlite_db.save_marksheet(1, 'Y3', 'Maths', marks.iloc[:1])
+    assert sqlite_db.get_marksheet(1, 'Y3', 'Maths')['Test 1'].tolist() == [9]
+
+
+# Reads compared between the backends; Timestamp differs by design (set at save time)
+PARITY_REPORT_COLUMNS = ['Date', 'Student ID', 'Student Name', 'Roll Number', 'Status', 'Notes', 'Class']
+
+
+def _parity_writes():
+    """A roll call, a re-taken roll call, and an admin edit with a note"""
+    edit = dict(_roll_call('P', 'L')[1], status='AP', notes='Doctor')
+    return [
+        ('save_attendance', _roll_call('A', 'A')),
+        ('save_attendance', _roll_call('P', 'L')),
+        ('update_attendance_from_list', [edit]),
+    ]
+
+
+def _parity_reads(backend):
+    report = backend.get_attendance_report('Y3', DAY, DAY)[PARITY_REPORT_COLUMNS]
+    return {
+        'sheet': backend.get_class_day_sheet('Y3', DAY),
+        'summary': backend.get_class_attendance_summary('Y3', DAY),
+        'school': backend.get_school_attendance_summary(DAY),
+        'report': report.sort_values('Student ID').to_dict(orient='records'),
+    }
+
+
+def _csv_session():
+    """Applies the queued writes to the CSV backend and records its reads"""
+    import streamlit as st
+    from utils import data_models
+    from utils.attendance_store import AttendanceStore
+    from tests.test_data_models_sqlite import _parity_reads
+
+    st.session_state.attendance_records = AttendanceStore()
+    st.session_state.saved = [getattr(data_models, name)(records) for name, records in st.session_state.writes]
+    st.session_state.reads = _parity_reads(data_models)
+
+
+def test_sqlite_backend_matches_csv_backend(sqlite_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_models, 'ATTENDANCE_FILE', tmp_path / "attendance_records.csv")
+    monkeypatch.setattr(data_models, 'ATTENDANCE_JOURNAL_FILE', tmp_path / "attendance_journal.jsonl")
+    monkeypatch.setattr(data_models, 'use_parquet_storage', lambda: False)
+    csv_session = AppTest.from_function(_csv_session)
+    csv_session.session_state['writes'] = _parity_writes()
+    csv_session.run()
+    assert not csv_session.exception
+
+    saved = [getattr(sqlite_db, name)(records) for name, records in _parity_writes()]
+
+    assert saved == csv_session.session_state['saved'] == [True, True, True]
+    assert _parity_reads(sqlite_db) == csv_session.session_state['reads']
+    assert _parity_reads(sqlite_db)['sheet'] == {1: ('P', ''), 2: ('AP', 'Doctor')}
@@ -0,0 +1,37 @@
+# tests/test_downloads.py
+from streamlit.testing.v1 import AppTest
+
+
+def _export_page():
+    import streamlit as st
+    from utils.downloads import export_button, finish_export
+
+    params = (st.selectbox("Class", ["Y3", "Y4"]),)
+    if export_button("Export", "report", params):
+        st.write("ready")
+        st.button("Downloaded", on_click=finish_export, args=("report",))  # as download_button(export=...)
+
+
+def _ready(at):
+    return [m.value for m in at.markdown] == ["ready"]
+
+
+def test_export_stays_requested_across_reruns():
+    at = AppTest.from_function(_export_page).run()
+    assert not _ready(at)
+
+    at.button(key="report").click().run()
+    assert _ready(at)
+    at.run()  # e.g. the rerun caused by clicking the download button
+    assert _ready(at)
+
+
+def test_export_ends_when_used_or_inputs_change():
+    at = AppTest.from_function(_export_page).run()
+    at.button(key="report").click().run()
+    at.selectbox[0].select("Y4").run()
+    assert not _ready(at)
+
+    at.button(key="report").click().run()
+    at.button[1].click().run()
+    assert not _ready(at)
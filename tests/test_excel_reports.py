@@ -0,0 +1,90 @@
+# tests/test_excel_reports.py
+import datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.excel_reports import (
+    GRID_STATUSES, build_attendance_grid, create_excel_format_dataframe, write_attendance_workbook
+)
+
+
+def _report():
+    """Three rows across two classes, in get_all_classes_report's column order"""
+    day = datetime.date(2025, 10, 7)
+    return pd.DataFrame([
+        {'Date': day, 'Class': 'Y3', 'Student ID': 1, 'Student Name': 'Ann', 'Status': 'P'},
+        {'Date': day, 'Class': 'Y4', 'Student ID': 2, 'Student Name': 'Ben', 'Status': 'A'},
+        {'Date': day, 'Class': 'Y3', 'Student ID': 3, 'Student Name': 'Cat', 'Status': 'L'},
+    ])
+
+
+def _rows(sheet):
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+def test_multi_class_workbook_reads_back(tmp_path):
+    path = tmp_path / "report.xlsx"
+    write_attendance_workbook(path, _report(), classes=['Y3', 'Y4'])
+
+    workbook = load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ['Summary', 'Y3', 'Y4']
+
+    y3 = _rows(workbook['Y3'])
+    assert y3[0] == ['Date', 'Student ID', 'Student Name', 'Status']
+    assert [row[1:] for row in y3[1:]] == [[1, 'Ann', 'P'], [3, 'Cat', 'L']]
+    assert [row[1:] for row in _rows(workbook['Y4'])[1:]] == [[2, 'Ben', 'A']]
+
+    summary = _rows(workbook['Summary'])
+    assert [row[:6] for row in summary[1:]] == [['Y3', 2, 1, 1, 0, 0], ['Y4', 1, 0, 0, 1, 0]]
+
+
+def test_classes_without_records_stay_in_summary(tmp_path):
+    path = tmp_path / "report.xlsx"
+    write_attendance_workbook(path, _report(), classes=['Y2', 'Y3', 'Y4'])
+
+    workbook = load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ['Summary', 'Y3', 'Y4']
+    assert _rows(workbook['Summary'])[1][:2] == ['Y2', 0]
+
+
+def test_classes_fix_sheet_order(tmp_path):
+    path = tmp_path / "report.xlsx"
+    write_attendance_workbook(path, _report(), classes=['Y4', 'Y3'])
+
+    workbook = load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ['Summary', 'Y4', 'Y3']
+    assert [row[1:] for row in _rows(workbook['Y3'])[1:]] == [[1, 'Ann', 'P'], [3, 'Cat', 'L']]
+
+
+def test_students_sharing_a_name_keep_separate_rows():
+    monthly_data = [
+        {'name': 'Sam Lee', 'attendance': {'2025-10-01': 'P'}},
+        {'name': 'Sam Lee', 'attendance': {'2025-10-01': 'A'}},
+    ]
+    grid = create_excel_format_dataframe(monthly_data, 'October 2025')
+
+    assert list(grid['Student Name']) == ['Sam Lee', 'Sam Lee']
+    assert list(grid['1\nWe']) == ['P', 'A']
+    assert list(grid['A']) == [0, 1]
+
+
+def test_grid_without_records_lists_the_roster():
+    roster = [{'student_id': 1, 'name': 'Ann'}, {'student_id': 2, 'name': 'Ben'}]
+    grid = build_attendance_grid([], datetime.date(2025, 10, 1), datetime.date(2025, 10, 3), roster=roster)
+
+    assert list(grid['Student Name']) == ['Ann', 'Ben']
+    assert (grid[['1\nWe', '2\nTh', '3\nFr']] == '').all().all()
+    assert grid[GRID_STATUSES].sum().sum() == 0
+
+
+def test_grid_from_class_report_and_roster():
+    # What the Monthly Summary view passes: get_attendance_report's frame and the class roster
+    roster = pd.DataFrame({'student_id': ['1', '3', '5'], 'name': ['Ann', 'Cat', 'Eve']})
+    report = _report()[lambda df: df['Class'] == 'Y3']
+    grid = build_attendance_grid(report, datetime.date(2025, 10, 1), datetime.date(2025, 10, 31), roster=roster)
+
+    assert list(grid['Student Name']) == ['Ann', 'Cat', 'Eve']
+    assert 'Class' not in grid.columns
+    assert list(grid['7\nTu']) == ['P', 'L', '']
+    assert grid[GRID_STATUSES].values.tolist() == [[1, 0, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]]
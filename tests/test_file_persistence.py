@@ -0,0 +1,52 @@
+# tests/test_file_persistence.py
+import pytest
+
+from utils.file_persistence import atomic_write, fingerprints, merge_keyed
+
+
+def test_merge_keeps_their_rows_we_did_not_touch():
+    base = {'a': {'v': 1}, 'b': {'v': 1}}
+    ours = {'a': {'v': 2}, 'b': {'v': 1}}      # we edited a
+    theirs = {'a': {'v': 1}, 'b': {'v': 3}}    # someone else edited b
+
+    assert merge_keyed(fingerprints(base), ours, theirs) == {'a': {'v': 2}, 'b': {'v': 3}}
+
+
+def test_merge_applies_our_additions_and_deletions():
+    base = {'a': {'v': 1}, 'b': {'v': 1}}
+    ours = {'a': {'v': 1}, 'c': {'v': 1}}      # we deleted b and added c
+    theirs = {'a': {'v': 1}, 'b': {'v': 1}, 'd': {'v': 1}}  # someone else added d
+
+    assert merge_keyed(fingerprints(base), ours, theirs) == {'a': {'v': 1}, 'c': {'v': 1}, 'd': {'v': 1}}
+
+
+def test_merge_prefers_our_edit_on_conflict_and_keeps_their_deletes_of_untouched_rows():
+    base = {'a': {'v': 1}, 'b': {'v': 1}}
+    ours = {'a': {'v': 2}, 'b': {'v': 1}}
+    theirs = {'a': {'v': 3}}                   # someone else edited a and deleted b
+
+    assert merge_keyed(fingerprints(base), ours, theirs) == {'a': {'v': 2}}
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = tmp_path / "data" / "notes.json"
+
+    atomic_write(path, lambda f: f.write("new"))
+
+    assert path.read_text(encoding='utf-8') == "new"
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_failed_atomic_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "notes.json"
+    path.write_text("old", encoding='utf-8')
+
+    def write(f):
+        f.write("partial")
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        atomic_write(path, write)
+
+    assert path.read_text(encoding='utf-8') == "old"
+    assert list(tmp_path.iterdir()) == [path]
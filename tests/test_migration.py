@@ -0,0 +1,59 @@
+# tests/test_migration.py
+import datetime
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("supabase")  # utils.migration writes through the Supabase client
+
+from utils import migration
+from utils.attendance_journal import append_journal_entry
+
+DAY1, DAY2 = datetime.date(2025, 10, 6), datetime.date(2025, 10, 7)
+
+
+def _record(student_id, class_name, day, status):
+    return {'student_id': student_id, 'name': f"S{student_id}", 'roll_number': f"R{student_id}",
+            'class': class_name, 'date': day.isoformat(), 'status': status, 'notes': '', 'timestamp': ''}
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    """Base CSV plus a journal that replaces one roll call and edits one record"""
+    csv, journal = tmp_path / "attendance_records.csv", tmp_path / "attendance_journal.jsonl"
+    monkeypatch.setattr(migration, 'ATTENDANCE_FILE', csv)
+    monkeypatch.setattr(migration, 'ATTENDANCE_JOURNAL_FILE', journal)
+    monkeypatch.setattr(migration, 'use_parquet_storage', lambda: False)
+
+    pd.DataFrame([
+        _record(1, 'Y3', DAY1, 'P'), _record(2, 'Y3', DAY1, 'P'),
+        _record(3, 'Y4', DAY1, 'A'), _record(1, 'Y3', DAY2, 'P'),
+    ]).to_csv(csv, index=False)
+    append_journal_entry(journal, {'op': 'replace', 'class': 'Y3', 'date': DAY1,
+                                   'records': [_record(1, 'Y3', DAY1, 'A')]})
+    append_journal_entry(journal, {'op': 'upsert', 'records': [
+        {'student_id': 3, 'class': 'Y4', 'date': DAY1.isoformat(), 'status': 'L'}
+    ]})
+
+
+def _migrated(chunk_rows):
+    records = [r for chunk in migration._attendance_record_chunks(chunk_rows) for r in chunk]
+    return sorted((r['student_id'], r['class'], r['date'], r['status'], r['name']) for r in records)
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 100])
+def test_attendance_stream_matches_journal_replay(history, chunk_rows):
+    assert _migrated(chunk_rows) == [
+        (1, 'Y3', '2025-10-06', 'A', 'S1'),  # roll call replaced; student 2 dropped from it
+        (1, 'Y3', '2025-10-07', 'P', 'S1'),
+        (3, 'Y4', '2025-10-06', 'L', 'S3'),  # admin edit merged into the base row
+    ]
+
+
+def test_migration_does_not_load_the_app_data_layer():
+    import subprocess
+    import sys
+
+    code = "import sys, utils.migration; print('utils.data_models' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().endswith('False')
@@ -0,0 +1,47 @@
+# tests/test_report_scheduler.py
+import datetime
+import json
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.report_scheduler import REPORT_FORMAT, ReportScheduler, month_period
+
+TODAY = datetime.date(2025, 10, 16)
+
+
+def _loader(rows):
+    def load(start, end):
+        return pd.DataFrame([row for row in rows if start <= row['Date'] <= end])
+    return load
+
+
+def _row(day, class_name, student_id, status='P'):
+    return {'Date': day, 'Class': class_name, 'Student ID': student_id, 'Student Name': f"S{student_id}", 'Status': status}
+
+
+def test_workbooks_follow_class_order(tmp_path):
+    rows = [_row(datetime.date(2025, 10, 1), 'Y4', 1), _row(datetime.date(2025, 10, 2), 'Y3', 2)]
+    scheduler = ReportScheduler(tmp_path, _loader(rows), classes=['Y3', 'Y4'])
+
+    entry, written = scheduler.build(month_period(2025, 10))
+    assert written and entry['format'] == REPORT_FORMAT
+    assert load_workbook(tmp_path / entry['xlsx'], read_only=True).sheetnames == ['Summary', 'Y3', 'Y4']
+
+    assert scheduler.build(month_period(2025, 10)) == (entry, False)
+
+
+def test_old_format_entries_are_rebuilt(tmp_path):
+    old_day = datetime.date(2023, 1, 5)  # outside the scheduler's recent months
+    scheduler = ReportScheduler(tmp_path, _loader([_row(old_day, 'Y3', 1)]), classes=['Y3'])
+    entry, _ = scheduler.build(month_period(2023, 1))
+
+    # Simulate a manifest written before REPORT_FORMAT existed
+    manifest = json.loads(scheduler.manifest_path.read_text())
+    del manifest[entry['key']]['format']
+    scheduler.manifest_path.write_text(json.dumps(manifest))
+    assert scheduler.reports()[0]['xlsx_path'] is None
+
+    assert entry['key'] in scheduler.run_once(TODAY)
+    assert scheduler.manifest()[entry['key']]['format'] == REPORT_FORMAT
+    assert scheduler.reports()[0]['xlsx_path'] is not None
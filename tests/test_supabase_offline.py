@@ -0,0 +1,78 @@
+# tests/test_supabase_offline.py
+import pytest
+
+pytest.importorskip("supabase")  # optional dependency of the Supabase backend
+
+from utils import supabase_offline
+from utils.supabase_offline import OUTBOX_MAX_ATTEMPTS, OfflineDatabase, Outbox
+
+
+class FakeServer:
+    """upsert_rows that fails with ``error`` for rows whose id is in ``reject``"""
+
+    def __init__(self, error=None, reject=(), connected=True):
+        self.error = error
+        self.reject = set(reject)
+        self.connected = connected
+        self.upserts = []
+
+    def is_connected(self):
+        return self.connected
+
+    def upsert_rows(self, table, rows, on_conflict=None):
+        if self.error is not None and any(row['id'] in self.reject for row in rows):
+            raise self.error
+        self.upserts.append((table, [row['id'] for row in rows]))
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(OfflineDatabase(tmp_path / "offline.db"))
+
+
+def _attempts(outbox):
+    return [row['attempts'] for row in outbox._db.connection().execute("SELECT attempts FROM outbox ORDER BY id")]
+
+
+def test_rejected_write_is_retried_then_parked(outbox, monkeypatch):
+    server = FakeServer(ValueError("violates foreign key constraint"), reject={1})
+    monkeypatch.setattr(supabase_offline, 'supabase_manager', server)
+    outbox.enqueue('daily_notes', 'upsert', [{'id': 1}], on_conflict='id')
+    outbox.enqueue('daily_notes', 'upsert', [{'id': 2}], on_conflict='id')
+
+    # Both were sent in the first batch; after that the failing write goes on its own
+    for attempt in range(1, OUTBOX_MAX_ATTEMPTS):
+        assert outbox.drain() is False
+        assert _attempts(outbox) == [attempt, 1]
+        assert outbox.failed_writes() == []
+
+    assert outbox.drain() is False
+    assert [w['payload'] for w in outbox.failed_writes()] == ['[{"id": 1}]']
+    assert 'foreign key' in outbox.failed_writes()[0]['last_error']
+
+    # The parked write no longer holds up the ones queued after it
+    assert outbox.drain() is True
+    assert server.upserts == [('daily_notes', [2])]
+    assert outbox.pending_count() == 0
+
+
+def test_connection_error_does_not_count_as_an_attempt(outbox, monkeypatch):
+    monkeypatch.setattr(supabase_offline, 'supabase_manager', FakeServer(ConnectionError("offline"), reject={1}))
+    outbox.enqueue('daily_notes', 'upsert', [{'id': 1}], on_conflict='id')
+
+    for _ in range(OUTBOX_MAX_ATTEMPTS + 1):
+        assert outbox.drain() is False
+
+    assert _attempts(outbox) == [0]
+    assert outbox.failed_writes() == []
+
+
+def test_drained_writes_are_sent_in_one_batch_and_removed(outbox, monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(supabase_offline, 'supabase_manager', server)
+    outbox.enqueue('daily_notes', 'upsert', [{'id': 1}], on_conflict='id')
+    outbox.enqueue('daily_notes', 'upsert', [{'id': 2}, {'id': 1}], on_conflict='id')
+
+    assert outbox.drain() is True
+    assert server.upserts == [('daily_notes', [1, 2])]
+    assert outbox.pending_count() == 0
@@ -0,0 +1,99 @@
+# tests/test_supabase_sync.py
+import pytest
+
+pytest.importorskip("supabase")  # optional dependency of the Supabase backend
+
+from utils import supabase_sync
+from utils.supabase_offline import LocalReplica, OfflineDatabase, Outbox
+from utils.supabase_sync import SyncEngine
+
+
+class FakeServer:
+    """iter_rows_since over an in-memory table, two rows per page"""
+
+    def __init__(self, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+        self.requests = []
+
+    def is_connected(self):
+        return True
+
+    def iter_rows_since(self, table, column, since=None):
+        self.requests.append((table, column, since))
+        rows = sorted((row for row in self.rows if since is None or row[column] >= since), key=lambda row: row[column])
+        for start in range(0, len(rows), 2):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise ConnectionError("connection dropped")
+            yield rows[start:start + 2]
+
+
+def _record(student_id, day, status='P', updated_at=None):
+    return {'student_id': student_id, 'date': day, 'class': 'Y3', 'status': status,
+            'updated_at': updated_at or f"{day}T08:00:00+00:00"}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db = OfflineDatabase(tmp_path / "offline.db")
+    replica = LocalReplica(db)
+    return SyncEngine(db, replica, Outbox(db)), replica
+
+
+def _statuses(replica):
+    return sorted((r['student_id'], r['date'], r['status']) for page in replica.iter_attendance_records() for r in page)
+
+
+def test_full_sync_replaces_the_replica_page_by_page(engine, monkeypatch):
+    sync, replica = engine
+    replica.put_attendance([_record(99, '2025-09-01')])  # deleted on the server
+    server = FakeServer([_record(i, '2025-10-01') for i in range(1, 6)])
+    monkeypatch.setattr(supabase_sync, 'supabase_manager', server)
+
+    sync._full_sync('attendance_records')
+
+    assert _statuses(replica) == [(i, '2025-10-01', 'P') for i in range(1, 6)]
+    assert sync._state('attendance_records')['watermark'] == '2025-10-01T08:00:00+00:00'
+
+
+def test_interrupted_full_sync_keeps_the_previous_copy(engine, monkeypatch):
+    sync, replica = engine
+    replica.put_attendance([_record(99, '2025-09-01')])
+    monkeypatch.setattr(supabase_sync, 'supabase_manager',
+                        FakeServer([_record(i, '2025-10-01') for i in range(1, 6)], fail_after=2))
+
+    sync._full_sync('attendance_records')
+
+    assert _statuses(replica) == [(99, '2025-09-01', 'P')]
+    assert sync._state('attendance_records') is None
+
+
+def test_delta_sync_fetches_rows_from_just_before_the_watermark(engine, monkeypatch):
+    sync, replica = engine
+    server = FakeServer([_record(1, '2025-10-01', updated_at='2025-10-01T08:00:00+00:00')])
+    monkeypatch.setattr(supabase_sync, 'supabase_manager', server)
+    sync._full_sync('attendance_records')
+
+    server.rows += [
+        _record(1, '2025-10-01', 'A', updated_at='2025-10-01T09:00:00+00:00'),  # edited since
+        _record(2, '2025-10-01', updated_at='2025-10-01T07:59:45+00:00'),       # committed late
+        _record(3, '2025-10-01', updated_at='2025-10-01T07:00:00+00:00'),       # older than the overlap
+    ]
+    applied = sync.sync('attendance_records', force=True)
+
+    assert server.requests[-1] == ('attendance_records', 'updated_at', '2025-10-01T07:59:30+00:00')
+    assert applied == 3  # the two new rows plus the old one re-read in the overlap
+    assert _statuses(replica) == [(1, '2025-10-01', 'A'), (2, '2025-10-01', 'P')]
+    assert sync._state('attendance_records')['watermark'] == '2025-10-01T09:00:00+00:00'
+
+
+def test_delta_sync_waits_for_queued_writes(engine, monkeypatch):
+    sync, _ = engine
+    server = FakeServer([_record(1, '2025-10-01')])
+    monkeypatch.setattr(supabase_sync, 'supabase_manager', server)
+    sync._full_sync('attendance_records')
+    sync._outbox.enqueue('attendance_records', 'upsert', [_record(1, '2025-10-01', 'A')])
+    requests = len(server.requests)
+
+    assert sync.sync('attendance_records', force=True) is None
+    assert len(server.requests) == requests
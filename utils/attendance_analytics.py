@@ -0,0 +1,170 @@
+# utils/attendance_analytics.py
+"""Vectorized attendance analytics.
+
+Class-level rates are computed from the store's per-(class, date) status
+rollup, turned into a small date x status count table. Student-level stats use
+one typed DataFrame per date window (class and status as categoricals, date as
+datetime64), cached per store version so repeated reads between saves reuse it.
+"""
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+STATUS_CATEGORIES = ['P', 'L', 'A', 'AP']
+
+# Frames kept per store: {(version, start_date, end_date): DataFrame}
+FRAME_CACHE_SIZE = 8
+
+_frame_cache = weakref.WeakKeyDictionary()
+_frame_lock = threading.Lock()
+
+
+def build_frame(records):
+    """Typed DataFrame (class, student_id, date, status) from attendance record dicts"""
+    df = pd.DataFrame(
+        {
+            'class': [r.get('class') for r in records],
+            'student_id': [r.get('student_id') for r in records],
+            'date': [r.get('date') for r in records],
+            'status': [r.get('status') for r in records],
+        }
+    )
+    statuses = STATUS_CATEGORIES + sorted(set(df['status'].dropna()) - set(STATUS_CATEGORIES))
+    df['status'] = pd.Categorical(df['status'], categories=statuses)
+    df['class'] = df['class'].astype('category')
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def attendance_frame(store, start_date, end_date):
+    """Cached typed frame of every record in [start_date, end_date] for an AttendanceStore"""
+    key = (store.version, start_date, end_date)
+    with _frame_lock:
+        frames = _frame_cache.get(store)
+        if frames is not None and key in frames:
+            frames.move_to_end(key)
+            return frames[key]
+
+    df = build_frame(store.date_range(start_date, end_date))
+
+    with _frame_lock:
+        frames = _frame_cache.setdefault(store, OrderedDict())
+        # Anything cached for an older version is stale
+        for old_key in [k for k in frames if k[0] != store.version]:
+            del frames[old_key]
+        frames[key] = df
+        while len(frames) > FRAME_CACHE_SIZE:
+            frames.popitem(last=False)
+    return df
+
+
+def counts_frame(daily_counts):
+    """Status-count table (index: datetime64 date, one int column per status) from
+    AttendanceStore.daily_status_counts output.
+
+    Statuses are ordered by first appearance (date, then order within the day) and
+    any STATUS_CATEGORIES never seen follow, so ties resolve the way value_counts()
+    over the records does.
+    """
+    if not daily_counts:
+        return pd.DataFrame(columns=STATUS_CATEGORIES, dtype='int64')
+    days = [day for day, _ in daily_counts]
+    counts = pd.DataFrame([c for _, c in daily_counts], index=pd.DatetimeIndex(pd.to_datetime(days), name='date'))
+    seen = list(dict.fromkeys(status for _, c in daily_counts for status, n in c.items() if n))
+    columns = seen + [status for status in STATUS_CATEGORIES + list(counts.columns) if status not in seen]
+    return counts.reindex(columns=list(dict.fromkeys(columns))).fillna(0).astype('int64')
+
+
+def daily_present_rates(counts):
+    """Percentage of 'P' per date, as a Series indexed by datetime64 date"""
+    return counts['P'] / counts.sum(axis=1) * 100
+
+
+def class_trends(counts):
+    """Daily attendance rate frame (index: date, column: attendance_rate)"""
+    if counts.empty:
+        return pd.DataFrame()
+    return daily_present_rates(counts).to_frame('attendance_rate')
+
+
+def class_summary_stats(counts):
+    """Average, best/worst day and most common non-present status for one class"""
+    if counts.empty:
+        return {
+            'total_records': 0,
+            'average_attendance': 0,
+            'best_day': None,
+            'worst_day': None,
+            'most_common_issue': 'none'
+        }
+
+    daily_rates = daily_present_rates(counts)
+    daily_rates.index = daily_rates.index.date
+
+    # idxmax keeps the first of tied statuses, i.e. the first to appear (see counts_frame)
+    issues = counts.drop(columns='P').sum()
+    issues = issues[issues > 0]
+    most_common_issue = issues.idxmax() if not issues.empty else 'none'
+
+    return {
+        'total_records': int(counts.to_numpy().sum()),
+        'average_attendance': round(daily_rates.mean(), 1),
+        'best_day': {
+            'date': daily_rates.idxmax(),
+            'rate': round(daily_rates.max(), 1)
+        } if not daily_rates.empty else None,
+        'worst_day': {
+            'date': daily_rates.idxmin(),
+            'rate': round(daily_rates.min(), 1)
+        } if not daily_rates.empty else None,
+        'most_common_issue': most_common_issue
+    }
+
+
+def student_performance_stats(df):
+    """Present/late/absent rates and first-half vs second-half trend for one student"""
+    total_days = len(df)
+    if total_days == 0:
+        return {
+            'total_days': 0,
+            'present_rate': 0,
+            'late_rate': 0,
+            'absent_rate': 0,
+            'trend': 'no_data'
+        }
+
+    status = df['status'].to_numpy()
+    present = status == 'P'
+    present_days = int(present.sum())
+    late_days = int((status == 'L').sum())
+    absent_days = int(np.isin(status, ['A', 'AP']).sum())
+
+    present_rate = (present_days / total_days) * 100
+    late_rate = (late_days / total_days) * 100
+    absent_rate = (absent_days / total_days) * 100
+
+    # Compare the first half of the period with the second half
+    if total_days >= 10:
+        half = total_days // 2
+        first_present = int(present[:half].sum()) / half * 100
+        second_present = int(present[half:].sum()) / (total_days - half) * 100
+
+        if second_present > first_present + 5:
+            trend = 'improving'
+        elif second_present < first_present - 5:
+            trend = 'declining'
+        else:
+            trend = 'stable'
+    else:
+        trend = 'insufficient_data'
+
+    return {
+        'total_days': total_days,
+        'present_rate': round(present_rate, 1),
+        'late_rate': round(late_rate, 1),
+        'absent_rate': round(absent_rate, 1),
+        'trend': trend
+    }
@@ -0,0 +1,98 @@
+# utils/attendance_journal.py
+"""Append-only journal for attendance writes.
+
+Each save appends one JSON line describing the change ("replace" for a class's
+roll call on one date, "upsert" for admin edits) instead of rewriting the whole
+attendance history. The base CSV is only rewritten by compaction, which folds
+the journal into it and then truncates the journal. All journal operations
+hold the journal's file lock, so several app processes can share one file.
+"""
+import json
+import os
+from datetime import datetime, date
+
+from utils.file_persistence import file_lock
+
+
+def _json_default(value):
+    """JSON encoder fallback for dates and numpy scalars coming from pandas"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _parse_date(value):
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return value
+    return value
+
+
+def append_journal_entry(path, entry):
+    """Durably append one entry (a dict) as a single line to the journal"""
+    line = json.dumps(entry, default=_json_default, ensure_ascii=False) + '\n'
+    with file_lock(path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a+b') as f:
+            # If a previous write was cut short, terminate the torn line first so
+            # it cannot swallow this entry.
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+            f.write(line.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def read_journal_entries(path):
+    """Return all complete entries in the journal, skipping torn or corrupt lines"""
+    if not path.exists():
+        return []
+    entries = []
+    with file_lock(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print(f"Skipping incomplete attendance journal entry in {path.name}")
+    return entries
+
+
+def replay_journal(store, entries):
+    """Apply journal entries, in order, to an AttendanceStore"""
+    for entry in entries:
+        records = []
+        for rec in entry.get('records', []):
+            r = dict(rec)
+            r['date'] = _parse_date(r.get('date'))
+            records.append(r)
+        if entry.get('op') == 'replace':
+            store.replace_class_day(entry.get('class'), _parse_date(entry.get('date')), records)
+        elif entry.get('op') == 'upsert':
+            store.upsert(records)
+    return store
+
+
+def journal_size(path):
+    """Size of the journal in bytes (0 if it does not exist)"""
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def truncate_journal(path):
+    """Empty the journal after its entries have been folded into the base file"""
+    with file_lock(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,117 @@
+# utils/attendance_parquet.py
+"""Month-partitioned Parquet storage for attendance history.
+
+Each calendar month lives in its own file (attendance_YYYY-MM.parquet) with the
+class and status columns dictionary-encoded, so readers only open the
+partitions their date range touches.
+"""
+import os
+import re
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+PARTITION_PATTERN = re.compile(r"^attendance_(\d{4})-(\d{2})\.parquet$")
+
+# Low-cardinality columns stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = ['class', 'status']
+
+
+def parquet_available():
+    """True if a Parquet engine (pyarrow) is installed"""
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def month_of(day):
+    """(year, month) partition key for a date"""
+    return (day.year, day.month)
+
+
+def partition_path(directory, month):
+    year, month_num = month
+    return directory / f"attendance_{year:04d}-{month_num:02d}.parquet"
+
+
+def list_partitions(directory):
+    """Return {(year, month): row_count} for every partition on disk (reads metadata only)"""
+    import pyarrow.parquet as pq
+
+    partitions = {}
+    if not directory.exists():
+        return partitions
+    for path in directory.iterdir():
+        match = PARTITION_PATTERN.match(path.name)
+        if not match:
+            continue
+        try:
+            rows = pq.ParquetFile(path).metadata.num_rows
+        except Exception as e:
+            print(f"Could not read attendance partition {path.name}: {e}")
+            continue
+        partitions[(int(match.group(1)), int(match.group(2)))] = rows
+    return partitions
+
+
+def read_partition(directory, month):
+    """Load one month of attendance as a list of dicts"""
+    path = partition_path(directory, month)
+    if not path.exists():
+        return []
+    try:
+        df = pd.read_parquet(path, engine='pyarrow')
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype(object)
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date']).dt.date
+        return df.to_dict(orient='records')
+    except Exception as e:
+        print(f"Could not load attendance partition {path.name}: {e}")
+        return []
+
+
+def write_partition(directory, month, records):
+    """Atomically (re)write one month's partition; removes it when there are no records"""
+    path = partition_path(directory, month)
+    records = [r for r in records if isinstance(r.get('date'), date)]
+    if not records:
+        if path.exists():
+            os.remove(path)
+        return
+
+    directory.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame(records)
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if 'notes' in df.columns:
+        df['notes'] = df['notes'].fillna('').astype(str)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".attendance_", suffix=".parquet.tmp")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_partitions(directory, records):
+    """Split records by month and write every resulting partition"""
+    by_month = {}
+    for record in records:
+        day = record.get('date')
+        if isinstance(day, date):
+            by_month.setdefault(month_of(day), []).append(record)
+    for month, month_records in by_month.items():
+        write_partition(directory, month, month_records)
+    return sorted(by_month)
@@ -0,0 +1,292 @@
+# utils/attendance_store.py
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, date
+from functools import wraps
+
+
+def _as_date(value):
+    """Coerce datetime/Timestamp values to datetime.date, leave others untouched"""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _date_slice(sorted_dates, start_date=None, end_date=None):
+    """Return the part of a sorted date list that falls inside [start_date, end_date]"""
+    lo = bisect_left(sorted_dates, start_date) if start_date is not None else 0
+    hi = bisect_right(sorted_dates, end_date) if end_date is not None else len(sorted_dates)
+    return sorted_dates[lo:hi]
+
+
+def _locked(method):
+    """Serialize access to a store shared between sessions (Streamlit runs each in its own thread)"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class AttendanceStore:
+    """Attendance records indexed by (class, date), (student_id, date) and date.
+
+    Iterating the store yields the record dicts (ordered by date), so code that
+    used to scan st.session_state.attendance_records as a list keeps working,
+    while the query methods only touch the rows they return. Status counts per
+    (class, date) are kept up to date on every write, so summaries never
+    recount records.
+
+    When built with ``partitions`` ({(year, month): row_count}) and a ``loader``
+    callable, months are loaded on first use, so queries only read the
+    partitions their date range touches.
+    """
+
+    def __init__(self, records=None, partitions=None, loader=None):
+        self._by_class_day = {}    # (class, date) -> {student_id: record}
+        self._class_dates = {}     # class -> sorted list of dates
+        self._by_student_day = {}  # (student_id, date) -> {class: record}
+        self._student_dates = {}   # student_id -> sorted list of dates
+        self._day_classes = {}     # date -> {class: None} (insertion ordered)
+        self._dates = []           # sorted list of all dates
+        self._rollup = {}          # (class, date) -> {status: count}
+        self._undated = []         # records without a usable date (kept for persistence)
+        self._count = 0
+        self._version = 0          # bumped on every write, used to key derived caches
+        self._lock = threading.RLock()
+        self._loader = loader
+        self._unloaded = dict(partitions or {}) if loader else {}
+        for record in records or []:
+            self._insert(dict(record))
+
+    # LAZY PARTITION LOADING
+
+    def _ensure_loaded(self, start_date=None, end_date=None):
+        """Load every not-yet-loaded month overlapping [start_date, end_date]"""
+        if not self._unloaded:
+            return
+        first = (start_date.year, start_date.month) if start_date is not None else None
+        last = (end_date.year, end_date.month) if end_date is not None else None
+        for month in sorted(self._unloaded):
+            if (first is None or month >= first) and (last is None or month <= last):
+                del self._unloaded[month]
+                for record in self._loader(month):
+                    self._insert(dict(record))
+
+    def _ensure_day(self, day):
+        if self._unloaded and isinstance(day, date):
+            self._ensure_loaded(day, day)
+
+    @property
+    def version(self):
+        """Counter that changes whenever records are written"""
+        return self._version
+
+    @_locked
+    def unloaded_months(self):
+        """Months still waiting on disk (empty when everything is in memory)"""
+        return sorted(self._unloaded)
+
+    # INTERNAL INDEX MAINTENANCE
+
+    def _insert(self, record):
+        record['date'] = _as_date(record.get('date'))
+        day = record['date']
+        if not isinstance(day, date):
+            self._undated.append(record)
+            return
+
+        class_name = record.get('class')
+        student_id = record.get('student_id')
+        if (class_name, day) in self._by_class_day and student_id in self._by_class_day[(class_name, day)]:
+            self._remove(class_name, day, student_id)
+
+        class_day = self._by_class_day.setdefault((class_name, day), {})
+        if not class_day:
+            insort(self._class_dates.setdefault(class_name, []), day)
+        class_day[student_id] = record
+
+        status_counts = self._rollup.setdefault((class_name, day), {})
+        status = record.get('status')
+        status_counts[status] = status_counts.get(status, 0) + 1
+
+        student_day = self._by_student_day.setdefault((student_id, day), {})
+        if not student_day:
+            insort(self._student_dates.setdefault(student_id, []), day)
+        student_day[class_name] = record
+
+        day_classes = self._day_classes.setdefault(day, {})
+        if not day_classes:
+            insort(self._dates, day)
+        day_classes[class_name] = None
+
+        self._count += 1
+
+    def _remove(self, class_name, day, student_id):
+        class_day = self._by_class_day.get((class_name, day))
+        if not class_day or student_id not in class_day:
+            return None
+        record = class_day.pop(student_id)
+        status_counts = self._rollup.get((class_name, day), {})
+        status = record.get('status')
+        if status_counts.get(status, 0) > 1:
+            status_counts[status] -= 1
+        else:
+            status_counts.pop(status, None)
+        if not class_day:
+            self._rollup.pop((class_name, day), None)
+            del self._by_class_day[(class_name, day)]
+            self._drop_date(self._class_dates, class_name, day)
+            classes = self._day_classes.get(day, {})
+            classes.pop(class_name, None)
+            if not classes:
+                self._day_classes.pop(day, None)
+                del self._dates[bisect_left(self._dates, day)]
+
+        student_day = self._by_student_day.get((student_id, day), {})
+        student_day.pop(class_name, None)
+        if not student_day:
+            self._by_student_day.pop((student_id, day), None)
+            self._drop_date(self._student_dates, student_id, day)
+
+        self._count -= 1
+        return record
+
+    @staticmethod
+    def _drop_date(index, key, day):
+        dates = index.get(key)
+        if not dates:
+            return
+        pos = bisect_left(dates, day)
+        if pos < len(dates) and dates[pos] == day:
+            del dates[pos]
+        if not dates:
+            del index[key]
+
+    # MUTATIONS
+
+    @_locked
+    def replace_class_day(self, class_name, day, records):
+        """Replace every record of a class on a given date with the supplied records"""
+        day = _as_date(day)
+        self._ensure_day(day)
+        for student_id in list(self._by_class_day.get((class_name, day), {})):
+            self._remove(class_name, day, student_id)
+        for record in records:
+            self._insert(dict(record))
+        self._version += 1
+
+    @_locked
+    def upsert(self, records):
+        """Replace matching records by (class, date, student_id) and add new ones"""
+        for record in records:
+            rec = dict(record)
+            rec['date'] = _as_date(rec.get('date'))
+            self._ensure_day(rec['date'])
+            existing = self._by_class_day.get((rec.get('class'), rec['date']), {}).get(rec.get('student_id'))
+            if existing is not None:
+                merged = dict(existing)
+                merged.update(rec)
+                rec = merged
+            self._insert(rec)
+        self._version += 1
+
+    # QUERIES
+
+    @_locked
+    def class_day(self, class_name, day):
+        """Records for one class on one date"""
+        day = _as_date(day)
+        self._ensure_day(day)
+        return list(self._by_class_day.get((class_name, day), {}).values())
+
+    @_locked
+    def class_range(self, class_name, start_date=None, end_date=None):
+        """Records for a class between two dates (inclusive), ordered by date"""
+        self._ensure_loaded(start_date, end_date)
+        result = []
+        for day in _date_slice(self._class_dates.get(class_name, []), start_date, end_date):
+            result.extend(self._by_class_day[(class_name, day)].values())
+        return result
+
+    @_locked
+    def student_range(self, student_id, start_date=None, end_date=None):
+        """Records for a student between two dates (inclusive), ordered by date"""
+        self._ensure_loaded(start_date, end_date)
+        result = []
+        for day in _date_slice(self._student_dates.get(student_id, []), start_date, end_date):
+            result.extend(self._by_student_day[(student_id, day)].values())
+        return result
+
+    @_locked
+    def date_range(self, start_date=None, end_date=None):
+        """Records for all classes between two dates (inclusive), ordered by date"""
+        self._ensure_loaded(start_date, end_date)
+        result = []
+        for day in _date_slice(self._dates, start_date, end_date):
+            for class_name in self._day_classes[day]:
+                result.extend(self._by_class_day[(class_name, day)].values())
+        return result
+
+    @_locked
+    def status_counts(self, class_name, day):
+        """{status: count} for one class on one date, read from the rollup"""
+        day = _as_date(day)
+        self._ensure_day(day)
+        return dict(self._rollup.get((class_name, day), {}))
+
+    @_locked
+    def day_status_counts(self, day):
+        """{class: {status: count}} for every class marked on one date"""
+        day = _as_date(day)
+        self._ensure_day(day)
+        return {
+            class_name: dict(self._rollup[(class_name, day)])
+            for class_name in self._day_classes.get(day, {})
+        }
+
+    @_locked
+    def daily_status_counts(self, class_name, start_date=None, end_date=None):
+        """[(date, {status: count})] for a class between two dates (inclusive), ordered by date"""
+        self._ensure_loaded(start_date, end_date)
+        return [
+            (day, dict(self._rollup[(class_name, day)]))
+            for day in _date_slice(self._class_dates.get(class_name, []), start_date, end_date)
+        ]
+
+    @_locked
+    def class_dates(self, class_name):
+        """Sorted list of dates on which attendance exists for a class"""
+        self._ensure_loaded()
+        return list(self._class_dates.get(class_name, []))
+
+    @_locked
+    def latest_class_dates(self, class_name, limit=5):
+        """Most recent attendance dates for a class, newest first.
+
+        Unloaded months are pulled in newest-first only until enough dates are found.
+        """
+        pending = sorted(self._unloaded, reverse=True)
+        while True:
+            dates = self._class_dates.get(class_name, [])
+            newest_pending = pending[0] if pending else None
+            enough = len(dates) >= limit and (
+                newest_pending is None or (dates[-limit].year, dates[-limit].month) > newest_pending
+            )
+            if enough or not pending:
+                return dates[::-1][:limit]
+            month = pending.pop(0)
+            self._ensure_loaded(date(month[0], month[1], 1), date(month[0], month[1], 1))
+
+    @_locked
+    def to_list(self):
+        """All records as a plain list of dicts"""
+        return self.date_range() + list(self._undated)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    @_locked
+    def __len__(self):
+        # Unloaded partitions are counted from their metadata row counts
+        return self._count + len(self._undated) + sum(self._unloaded.values())
@@ -0,0 +1,15 @@
+# utils/data_backend.py
+"""Pick the persistence backend app.py runs on.
+
+DATA_BACKEND=csv (default) keeps the CSV/JSON files in data/ (utils.data_models);
+DATA_BACKEND=sqlite uses the embedded WAL-mode database (utils.data_models_sqlite).
+Both modules expose the same functions, so the UI is unchanged.
+"""
+import os
+
+DATA_BACKEND = os.getenv("DATA_BACKEND", "csv").strip().lower()
+
+if DATA_BACKEND == "sqlite":
+    from utils.data_models_sqlite import *  # noqa: F401,F403
+else:
+    from utils.data_models import *  # noqa: F401,F403
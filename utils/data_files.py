@@ -0,0 +1,36 @@
+# utils/data_files.py
+"""Locations of the data/ files and the attendance storage setting.
+
+Kept free of Streamlit so scripts (migrations) can use them without the app.
+"""
+import os
+from pathlib import Path
+
+from utils.attendance_parquet import parquet_available
+
+# Data file path for persistence
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT_DIR / "data"
+ATTENDANCE_FILE = DATA_DIR / "attendance_records.csv"
+ATTENDANCE_JOURNAL_FILE = DATA_DIR / "attendance_journal.jsonl"
+ATTENDANCE_PARQUET_DIR = DATA_DIR / "attendance_parquet"
+STUDENTS_FILE = DATA_DIR / "students.csv"
+NOTES_FILE = DATA_DIR / "daily_notes.csv"
+TIMETABLES_FILE = DATA_DIR / "class_timetables.json"
+TEACHERS_FILE = DATA_DIR / "teachers.csv"
+DUTIES_FILE = DATA_DIR / "duties.csv"
+MARKSHEETS_FILE = DATA_DIR / "marksheets.json"
+REPORTS_DIR = DATA_DIR / "monthly_reports"
+
+# Attendance history storage: "csv" (single file) or "parquet" (one file per month)
+ATTENDANCE_STORAGE = os.getenv("ATTENDANCE_STORAGE", "csv").strip().lower()
+
+
+def use_parquet_storage():
+    """True when attendance history should be kept as month-partitioned Parquet"""
+    if ATTENDANCE_STORAGE != "parquet":
+        return False
+    if not parquet_available():
+        print("ATTENDANCE_STORAGE=parquet needs pyarrow; falling back to CSV storage")
+        return False
+    return True
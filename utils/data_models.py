@@ -5,59 +5,257 @@ from datetime import datetime, date, timedelta
 from pathlib import Path
 import os
 import calendar
+import copy
 import json
+import threading
+from utils.attendance_store import AttendanceStore
+from utils.attendance_analytics import (
+    attendance_frame,
+    counts_frame,
+    class_trends,
+    class_summary_stats,
+    student_performance_stats
+)
+from utils.attendance_journal import (
+    append_journal_entry,
+    read_journal_entries,
+    replay_journal,
+    journal_size,
+    truncate_journal
+)
+from utils.file_persistence import (
+    file_lock,
+    atomic_write,
+    fingerprints,
+    merge_keyed
+)
+from utils.attendance_parquet import (
+    month_of,
+    list_partitions,
+    read_partition,
+    write_partition,
+    write_partitions
+)
+from utils.report_scheduler import ReportScheduler
+from utils.data_files import (
+    ROOT_DIR, DATA_DIR, ATTENDANCE_FILE, ATTENDANCE_JOURNAL_FILE, ATTENDANCE_PARQUET_DIR,
+    STUDENTS_FILE, NOTES_FILE, TIMETABLES_FILE, TEACHERS_FILE, DUTIES_FILE, MARKSHEETS_FILE,
+    REPORTS_DIR, ATTENDANCE_STORAGE, use_parquet_storage
+)
+
+# School classes, in display (and report sheet) order
+CLASSES = [
+    "Year 3 - Blue", "Year 3 - Crimson", "Year 3 - Cyan", "Year 3 - Purple",
+    "Year 3 - Lavender", "Year 3 - Maroon", "Year 3 - Violet", "Year 3 - Green",
+    "Year 3 - Red", "Year 3 - Yellow", "Year 3 - Magenta", "Year 3 - Orange"
+]
+
+# Fold the attendance journal into the base CSV once it grows past this size
+JOURNAL_COMPACT_BYTES = 256 * 1024
+
+# SHARED (PROCESS-WIDE) DATA CACHE
+
+# Files backing each shared dataset; a change in any of them triggers a reload
+SHARED_SOURCES = {
+    'students': (STUDENTS_FILE,),
+    'attendance': (ATTENDANCE_FILE, ATTENDANCE_JOURNAL_FILE, ATTENDANCE_PARQUET_DIR),
+    'class_timetables': (TIMETABLES_FILE,),
+    'daily_notes': (NOTES_FILE,),
+    'teachers': (TEACHERS_FILE,),
+    'duties': (DUTIES_FILE,),
+    'marksheets': (MARKSHEETS_FILE,),
+}
+
+_shared_lock = threading.RLock()
+
+@st.cache_resource(show_spinner=False)
+def _shared_data():
+    """One dict per server process, shared by every browser session: name -> (signature, value)"""
+    return {}
+
+def _file_signature(name):
+    """(mtime, size) of every file behind a dataset, None for missing files"""
+    signature = []
+    for path in SHARED_SOURCES[name]:
+        try:
+            stat = path.stat()
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+# Row fingerprints of each keyed dataset as last read from / written to disk by
+# this process: the common base for three-way merges (see _persist_keyed)
+_disk_fingerprints = {}
+
+def _remember_fingerprints(name, value):
+    if name in KEYED_DATASETS:
+        _disk_fingerprints[name] = fingerprints(KEYED_DATASETS[name][0](value))
+
+def _load_shared(name, loader):
+    """Return the process-wide copy of a dataset, re-parsing only when its files changed"""
+    signature = _file_signature(name)
+    with _shared_lock:
+        cache = _shared_data()
+        entry = cache.get(name)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        value = loader()
+        cache[name] = (signature, value)
+        _remember_fingerprints(name, value)
+        return value
+
+# Session state key holding each session's own copy of a keyed dataset
+SESSION_KEYS = {
+    'students': 'students_df',
+    'teachers': 'teachers',
+    'duties': 'duties',
+    'daily_notes': 'daily_notes',
+    'class_timetables': 'class_timetables',
+    'marksheets': 'marksheets',
+}
+
+def _session_copy(name, shared):
+    """The session's private copy of a shared dataset, re-copied only when the shared value changed.
+
+    Sessions edit their copy in place before saving, so handing them the shared
+    object would leak unsaved (or failed) edits into every other session.
+    """
+    sources = st.session_state.setdefault('_shared_sources', {})
+    current = st.session_state.get(SESSION_KEYS[name])
+    if current is not None and sources.get(name) is shared:
+        return current
+    sources[name] = shared
+    return copy.deepcopy(shared)
+
+def _publish_shared(name, value):
+    """Make a value this session just persisted the shared copy for every session"""
+    with _shared_lock:
+        _shared_data()[name] = (_file_signature(name), value)
+        _remember_fingerprints(name, value)
+
+def _shared_is_current(name):
+    """True if the shared copy still matches the files (no other process wrote them since)"""
+    with _shared_lock:
+        entry = _shared_data().get(name)
+        return entry is not None and entry[0] == _file_signature(name)
+
+def _touch_shared(name):
+    """Re-stamp the shared copy after rewriting its files with identical content"""
+    with _shared_lock:
+        cache = _shared_data()
+        if name in cache:
+            cache[name] = (_file_signature(name), cache[name][1])
+
+def _publish_attendance(store, shared_was_current):
+    """Share the session's store, or drop the shared copy if another process changed the files"""
+    if shared_was_current:
+        _publish_shared('attendance', store)
+    else:
+        with _shared_lock:
+            _shared_data().pop('attendance', None)
 
-# Data file path for persistence
-ROOT_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = ROOT_DIR / "data"
-ATTENDANCE_FILE = DATA_DIR / "attendance_records.csv"
-STUDENTS_FILE = DATA_DIR / "students.csv"
-NOTES_FILE = DATA_DIR / "daily_notes.csv"
-TIMETABLES_FILE = DATA_DIR / "class_timetables.json"
-TEACHERS_FILE = DATA_DIR / "teachers.csv"
-DUTIES_FILE = DATA_DIR / "duties.csv"
+# KEYED ROW CONVERSIONS (used to merge concurrent writes)
+
+def _student_rows(df):
+    if df is None or getattr(df, 'empty', True) or 'id' not in df.columns:
+        return {}
+    return {int(r['id']): r for r in df.to_dict(orient='records')}
+
+def _students_from_rows(rows):
+    return pd.DataFrame(list(rows.values()), columns=STUDENT_COLUMNS if not rows else None)
+
+def _teacher_rows(teachers):
+    return {t.get('id'): t for t in teachers or []}
+
+def _marksheet_rows(marksheets):
+    rows = {}
+    for teacher_id, by_class in (marksheets or {}).items():
+        for class_name, subjects in by_class.items():
+            for subject, df in subjects.items():
+                records = df.to_dict(orient='records') if hasattr(df, 'to_dict') else df
+                rows[(int(teacher_id), class_name, subject)] = records
+    return rows
+
+def _marksheets_from_rows(rows):
+    result = {}
+    for (teacher_id, class_name, subject), records in rows.items():
+        result.setdefault(teacher_id, {}).setdefault(class_name, {})[subject] = pd.DataFrame(records)
+    return result
+
+def _dict_rows(value):
+    return dict(value or {})
+
+STUDENT_COLUMNS = ['id', 'name', 'class', 'gender', 'roll_number']
+
+# name -> (value to {key: row}, {key: row} back to value)
+KEYED_DATASETS = {
+    'students': (_student_rows, _students_from_rows),
+    'teachers': (_teacher_rows, lambda rows: list(rows.values())),
+    'duties': (_dict_rows, dict),
+    'daily_notes': (_dict_rows, dict),
+    'class_timetables': (_dict_rows, dict),
+    'marksheets': (_marksheet_rows, _marksheets_from_rows),
+}
+
+def _persist_keyed(name, value, load_from_disk, write):
+    """Write a keyed dataset under its file lock and return what was written.
+
+    If another process rewrote the file since this process last read it, the
+    on-disk rows are merged in first: rows this session added, changed or
+    deleted win, every other row keeps the other writer's version.
+    """
+    to_rows, from_rows = KEYED_DATASETS[name]
+    with file_lock(SHARED_SOURCES[name][0]):
+        if not _shared_is_current(name) and name in _disk_fingerprints:
+            merged = merge_keyed(_disk_fingerprints[name], to_rows(value), to_rows(load_from_disk()))
+            value = from_rows(merged)
+        write(value)
+        # Other sessions get a snapshot; this session keeps editing its own copy
+        published = copy.deepcopy(value)
+        _publish_shared(name, published)
+        st.session_state.setdefault('_shared_sources', {})[name] = published
+    return value
+
+def _or_default(value, default_factory):
+    return value if value is not None else default_factory()
 
 def initialize_session_state():
-    """Initialize all session state variables"""
-    # Try to load students from disk first
-    persisted_students = load_students_from_disk()
-    if persisted_students is not None:
-        st.session_state.students_df = persisted_students
-    else:
-        st.session_state.students_df = load_sample_students()
-    
-    if 'attendance_records' not in st.session_state:
-        st.session_state.attendance_records = load_attendance_from_disk()
+    """Initialize all session state variables.
+
+    Persisted data is loaded once per process into a shared cache and files are
+    only re-read after they change on disk. Each session works on its own copy
+    of the editable datasets (taken again whenever the shared copy changes); the
+    attendance store is shared, and only changed after its journal entry is written.
+    """
+    st.session_state.students_df = _session_copy('students', _load_shared(
+        'students', lambda: _or_default(load_students_from_disk(), load_sample_students)
+    ))
+    st.session_state.attendance_records = _load_shared('attendance', load_attendance_store_from_disk)
     
     if 'classes' not in st.session_state:
-        st.session_state.classes = [
-            "Year 3 - Blue", "Year 3 - Crimson", "Year 3 - Cyan", "Year 3 - Purple",
-            "Year 3 - Lavender", "Year 3 - Maroon", "Year 3 - Violet", "Year 3 - Green",
-            "Year 3 - Red", "Year 3 - Yellow", "Year 3 - Magenta", "Year 3 - Orange"
-        ]
+        st.session_state.classes = list(CLASSES)
     
     if 'class_notifications' not in st.session_state:
         st.session_state.class_notifications = {}
     
-    if 'class_timetables' not in st.session_state:
-        # Try to load timetables from disk
-        loaded = load_class_timetables_from_disk()
-        st.session_state.class_timetables = loaded if loaded is not None else {}
-
-    if 'daily_notes' not in st.session_state:
-        st.session_state.daily_notes = load_daily_notes_from_disk()
+    st.session_state.class_timetables = _session_copy('class_timetables', _load_shared(
+        'class_timetables', lambda: _or_default(load_class_timetables_from_disk(), dict)
+    ))
+    st.session_state.daily_notes = _session_copy(
+        'daily_notes', _load_shared('daily_notes', load_daily_notes_from_disk)
+    )
 
     # Load teachers and duties
-    if 'teachers' not in st.session_state:
-        st.session_state.teachers = load_teachers_from_disk() or []
-
-    if 'duties' not in st.session_state:
-        st.session_state.duties = load_duties_from_disk() or {}
+    st.session_state.teachers = _session_copy(
+        'teachers', _load_shared('teachers', lambda: load_teachers_from_disk() or [])
+    )
+    st.session_state.duties = _session_copy('duties', _load_shared('duties', lambda: load_duties_from_disk() or {}))
 
     # Load marksheets (per teacher -> class -> subject -> dataframe)
-    if 'marksheets' not in st.session_state:
-        loaded_ms = load_marksheets_from_disk()
-        st.session_state.marksheets = loaded_ms if loaded_ms is not None else {}
+    st.session_state.marksheets = _session_copy('marksheets', _load_shared(
+        'marksheets', lambda: _or_default(load_marksheets_from_disk(), dict)
+    ))
 
     # Ensure data directory exists for persistence
     try:
@@ -65,6 +263,8 @@ def initialize_session_state():
     except Exception:
         pass
 
+    start_report_scheduler()
+
 def load_sample_students():
     """Create sample student data for all classes"""
     students = []
@@ -76,11 +276,7 @@ def load_sample_students():
         "Joseph Thompson", "Elizabeth Martinez", "Kevin Robinson", "Megan Clark"
     ]
     
-    classes = [
-        "Year 3 - Blue", "Year 3 - Crimson", "Year 3 - Cyan", "Year 3 - Purple",
-        "Year 3 - Lavender", "Year 3 - Maroon", "Year 3 - Violet", "Year 3 - Green",
-        "Year 3 - Red", "Year 3 - Yellow", "Year 3 - Magenta", "Year 3 - Orange"
-    ]
+    classes = CLASSES
     
     student_id = 1
     for class_name in classes:
@@ -96,29 +292,17 @@ def load_sample_students():
     
     return pd.DataFrame(students)
 
+def get_attendance_store():
+    """Return the session's indexed attendance store, wrapping a plain list if needed"""
+    records = st.session_state.get('attendance_records')
+    if not isinstance(records, AttendanceStore):
+        records = AttendanceStore(records or [])
+        st.session_state.attendance_records = records
+    return records
+
 def save_attendance(attendance_data):
     """Save attendance records to session state"""
-    if 'attendance_records' not in st.session_state:
-        st.session_state.attendance_records = []
-    
-    # Remove existing records for the same date and class
-    if attendance_data:
-        first_record = attendance_data[0]
-        target_date = first_record['date']
-        target_class = first_record['class']
-        
-        # Convert target_date to date object if it's string
-        if isinstance(target_date, str):
-            try:
-                target_date = datetime.strptime(target_date, "%Y-%m-%d").date()
-            except Exception:
-                target_date = date.today()
-        
-        # Filter out existing records for this date and class
-        st.session_state.attendance_records = [
-            r for r in st.session_state.attendance_records 
-            if not (r['class'] == target_class and r['date'] == target_date)
-        ]
+    store = get_attendance_store()
     
     # Add timestamp and normalize dates
     normalized = []
@@ -142,13 +326,31 @@ def save_attendance(attendance_data):
         rec['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         normalized.append(rec)
 
-    st.session_state.attendance_records.extend(normalized)
+    # Replace existing records for each (class, date) in the batch
+    batches = {}
+    for rec in normalized:
+        batches.setdefault((rec['class'], rec['date']), []).append(rec)
 
-    # Persist to disk
+    # Persist to disk (one journal line per class/date roll call), then apply to
+    # the store every session shares, so a failed save changes nothing
     try:
-        save_attendance_to_disk(st.session_state.attendance_records)
+        with file_lock(ATTENDANCE_JOURNAL_FILE):
+            shared_was_current = _shared_is_current('attendance')
+            for (target_class, target_date), batch in batches.items():
+                append_journal_entry(ATTENDANCE_JOURNAL_FILE, {
+                    'op': 'replace',
+                    'class': target_class,
+                    'date': target_date,
+                    'records': batch
+                })
+            for (target_class, target_date), batch in batches.items():
+                store.replace_class_day(target_class, target_date, batch)
+            _publish_attendance(store, shared_was_current)
+        schedule_attendance_compaction()
+        return True
     except Exception as e:
         print(f"Could not save attendance: {e}")
+        return False
 
 def save_attendance_to_disk(records):
     """Save attendance records to CSV file for simple persistence"""
@@ -156,14 +358,41 @@ def save_attendance_to_disk(records):
         return
     # Ensure data dir
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    df = pd.DataFrame(records)
+    df = pd.DataFrame(list(records))
     # Convert date/datetime to ISO strings for CSV
     if 'date' in df.columns:
         df['date'] = pd.to_datetime(df['date']).dt.date.astype(str)
-    df.to_csv(ATTENDANCE_FILE, index=False)
+    # Write to a temp file and swap it in so a crash never leaves a truncated CSV
+    atomic_write(ATTENDANCE_FILE, lambda f: df.to_csv(f, index=False))
 
 def load_attendance_from_disk():
-    """Load attendance records from CSV if available; return list of dicts"""
+    """Load attendance records (base CSV plus journal) if available; return list of dicts"""
+    return load_attendance_store_from_disk().to_list()
+
+def load_attendance_store_from_disk():
+    """Load the base history and replay the attendance journal into an AttendanceStore.
+
+    With Parquet storage only partition metadata is read here; each month is
+    loaded the first time a query or write touches it.
+    """
+    with file_lock(ATTENDANCE_JOURNAL_FILE):
+        if use_parquet_storage():
+            partitions = list_partitions(ATTENDANCE_PARQUET_DIR)
+            if not partitions and ATTENDANCE_FILE.exists():
+                # First run in Parquet mode: split the existing CSV into monthly partitions
+                write_partitions(ATTENDANCE_PARQUET_DIR, _load_attendance_base())
+                partitions = list_partitions(ATTENDANCE_PARQUET_DIR)
+            store = AttendanceStore(
+                partitions=partitions,
+                loader=lambda month: read_partition(ATTENDANCE_PARQUET_DIR, month)
+            )
+        else:
+            store = AttendanceStore(_load_attendance_base())
+        replay_journal(store, read_journal_entries(ATTENDANCE_JOURNAL_FILE))
+    return store
+
+def _load_attendance_base():
+    """Load the compacted attendance CSV; return list of dicts"""
     if not ATTENDANCE_FILE.exists():
         return []
     try:
@@ -175,31 +404,97 @@ def load_attendance_from_disk():
         print(f"Could not load attendance: {e}")
         return []
 
+def _journal_months(entries):
+    """Partition months touched by a list of journal entries"""
+    months = set()
+    for entry in entries:
+        dates = [entry.get('date')] + [r.get('date') for r in entry.get('records', [])]
+        for d in dates:
+            if isinstance(d, str):
+                try:
+                    months.add(month_of(date.fromisoformat(d[:10])))
+                except ValueError:
+                    pass
+    return months
+
+def compact_attendance_journal():
+    """Fold the attendance journal into the base storage and truncate the journal.
+
+    The base is rebuilt from disk rather than from any session's records, so
+    writes made by other sessions are never lost. Replaying is idempotent, so a
+    crash between the swap and the truncate only means replaying again. In
+    Parquet mode only the months touched by the journal are rewritten.
+    """
+    with file_lock(ATTENDANCE_JOURNAL_FILE):
+        if journal_size(ATTENDANCE_JOURNAL_FILE) == 0:
+            return
+        shared_was_current = _shared_is_current('attendance')
+        store = load_attendance_store_from_disk()
+        if use_parquet_storage():
+            for year, month in sorted(_journal_months(read_journal_entries(ATTENDANCE_JOURNAL_FILE))):
+                first_day = date(year, month, 1)
+                last_day = date(year, month, calendar.monthrange(year, month)[1])
+                write_partition(ATTENDANCE_PARQUET_DIR, (year, month), store.date_range(first_day, last_day))
+        else:
+            if not store:
+                return
+            save_attendance_to_disk(store)
+        truncate_journal(ATTENDANCE_JOURNAL_FILE)
+        if shared_was_current:
+            # Same records, new files: keep the shared store instead of forcing a reload
+            _touch_shared('attendance')
+
+_compaction_thread = None
+
+def schedule_attendance_compaction():
+    """Start a background compaction once the journal has grown large enough"""
+    global _compaction_thread
+    if journal_size(ATTENDANCE_JOURNAL_FILE) < JOURNAL_COMPACT_BYTES:
+        return
+    if _compaction_thread is not None and _compaction_thread.is_alive():
+        return
+
+    def _run():
+        try:
+            compact_attendance_journal()
+        except Exception as e:
+            print(f"Could not compact attendance journal: {e}")
+
+    _compaction_thread = threading.Thread(target=_run, name="attendance-compaction", daemon=True)
+    _compaction_thread.start()
+
 def get_class_attendance_summary(class_name, selected_date):
     """Get attendance summary for a specific class and date"""
     if 'attendance_records' not in st.session_state:
         return {}
     
-    records = st.session_state.attendance_records
-    if not records:
+    # Status counts for the class and date come from the store's rollup
+    return summarize_status_counts(get_attendance_store().status_counts(class_name, selected_date))
+
+def get_class_day_sheet(class_name, selected_date):
+    """Saved roll call for a class on a date: {student_id: (status, notes)}"""
+    if 'attendance_records' not in st.session_state:
         return {}
     
-    # Filter records for the specific class and date
-    class_records = [
-        r for r in records 
-        if r['class'] == class_name and r['date'] == selected_date
-    ]
-    
-    if not class_records:
+    return {
+        record['student_id']: (record['status'], record['notes'] if isinstance(record.get('notes'), str) else '')
+        for record in get_attendance_store().class_day(class_name, selected_date)
+    }
+
+def get_school_attendance_summary(selected_date):
+    """Attendance summaries for every class marked on a date: {class_name: summary}"""
+    if 'attendance_records' not in st.session_state:
         return {}
     
-    # Calculate summary
-    status_counts = {}
-    for record in class_records:
-        status = record['status']
-        status_counts[status] = status_counts.get(status, 0) + 1
+    day_counts = get_attendance_store().day_status_counts(selected_date)
+    return {class_name: summarize_status_counts(counts) for class_name, counts in day_counts.items()}
+
+def summarize_status_counts(status_counts):
+    """Summary dict (totals and attendance rate) from {status: count}; {} if nothing was marked"""
+    if not status_counts:
+        return {}
     
-    total_students = len(class_records)
+    total_students = sum(status_counts.values())
     present_count = status_counts.get('P', 0) + status_counts.get('L', 0)
     attendance_rate = (present_count / total_students) * 100 if total_students > 0 else 0
     
@@ -269,11 +564,7 @@ def get_attendance_report(class_name, start_date, end_date):
     if 'attendance_records' not in st.session_state:
         return pd.DataFrame()
     
-    records = st.session_state.attendance_records
-    class_records = [
-        r for r in records 
-        if r['class'] == class_name and start_date <= r['date'] <= end_date
-    ]
+    class_records = get_attendance_store().class_range(class_name, start_date, end_date)
     
     if not class_records:
         return pd.DataFrame()
@@ -299,18 +590,16 @@ def get_all_classes_report(start_date, end_date):
     if 'attendance_records' not in st.session_state:
         return pd.DataFrame()
     
-    records = st.session_state.attendance_records
-    filtered_records = [
-        r for r in records 
-        if start_date <= r['date'] <= end_date
-    ]
-    
-    if not filtered_records:
+    return _all_classes_frame(get_attendance_store().date_range(start_date, end_date))
+
+def _all_classes_frame(records):
+    """All-classes report DataFrame from attendance records"""
+    if not records:
         return pd.DataFrame()
     
     # Create comprehensive report
     report_data = []
-    for record in filtered_records:
+    for record in records:
         report_data.append({
             'Date': record['date'],
             'Class': record['class'],
@@ -330,8 +619,7 @@ def update_attendance_from_list(records_list):
     This will replace matching records (by class, date, student_id) and append new ones.
     """
     try:
-        if 'attendance_records' not in st.session_state:
-            st.session_state.attendance_records = []
+        store = get_attendance_store()
 
         # Normalize input list
         normalized = []
@@ -347,29 +635,19 @@ def update_attendance_from_list(records_list):
                         r['date'] = datetime.fromisoformat(d).date()
                     except Exception:
                         r['date'] = date.today()
-            normalized.append(r)
-
-        # Build index for quick replacement
-        existing = st.session_state.attendance_records
-        # Create a map key -> record where key = (class, date, student_id)
-        existing_map = {(e['class'], e['date'], e['student_id']): e for e in existing}
-
-        for r in normalized:
-            key = (r.get('class'), r.get('date'), r.get('student_id'))
             # ensure timestamp
             if 'timestamp' not in r or not r['timestamp']:
                 r['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            normalized.append(r)
 
-            if key in existing_map:
-                # replace fields
-                existing_map[key].update(r)
-            else:
-                existing_map[key] = r
-
-        # Write back to session list
-        st.session_state.attendance_records = list(existing_map.values())
-        # Persist to disk
-        save_attendance_to_disk(st.session_state.attendance_records)
+        # Persist to disk as a single journal entry, then replace matching records
+        # by (class, date, student_id) and append new ones
+        with file_lock(ATTENDANCE_JOURNAL_FILE):
+            shared_was_current = _shared_is_current('attendance')
+            append_journal_entry(ATTENDANCE_JOURNAL_FILE, {'op': 'upsert', 'records': normalized})
+            store.upsert(normalized)
+            _publish_attendance(store, shared_was_current)
+        schedule_attendance_compaction()
         return True
     except Exception as e:
         print(f"Error updating attendance records: {e}")
@@ -461,8 +739,10 @@ def remove_student(student_id):
 def save_students_to_disk():
     """Save students data to CSV for persistence"""
     try:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        st.session_state.students_df.to_csv(STUDENTS_FILE, index=False)
+        st.session_state.students_df = _persist_keyed(
+            'students', st.session_state.students_df, load_students_from_disk,
+            lambda df: atomic_write(STUDENTS_FILE, lambda f: df.to_csv(f, index=False))
+        )
     except Exception as e:
         print(f"Could not save students: {e}")
 
@@ -470,9 +750,9 @@ def save_students_to_disk():
 def save_teachers_to_disk():
     """Save teachers list to CSV"""
     try:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        teachers = st.session_state.get('teachers', [])
-        if teachers:
+        def _write(teachers):
+            if not teachers:
+                return
             # Convert list fields to comma-separated strings for CSV
             serializable = []
             for t in teachers:
@@ -483,7 +763,11 @@ def save_teachers_to_disk():
                     tt['classes'] = ','.join(tt.get('classes'))
                 serializable.append(tt)
             df = pd.DataFrame(serializable)
-            df.to_csv(TEACHERS_FILE, index=False)
+            atomic_write(TEACHERS_FILE, lambda f: df.to_csv(f, index=False))
+
+        st.session_state.teachers = _persist_keyed(
+            'teachers', st.session_state.get('teachers', []), load_teachers_from_disk, _write
+        )
     except Exception as e:
         print(f"Could not save teachers: {e}")
 
@@ -491,32 +775,31 @@ def save_teachers_to_disk():
 def save_marksheets_to_disk():
     """Persist marksheets (nested dict) to JSON file"""
     try:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        to_save = st.session_state.get('marksheets', {})
-        # Convert any DataFrame values to records
-        serializable = {}
-        for teacher_id, by_class in to_save.items():
-            serializable[str(teacher_id)] = {}
-            for class_name, subjects in by_class.items():
-                serializable[str(teacher_id)][class_name] = {}
-                for subject, df in subjects.items():
-                    if hasattr(df, 'to_dict'):
-                        serializable[str(teacher_id)][class_name][subject] = df.to_dict(orient='records')
-                    else:
-                        serializable[str(teacher_id)][class_name][subject] = df
-
-        path = DATA_DIR / 'marksheets.json'
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(serializable, f, ensure_ascii=False, indent=2)
+        def _write(to_save):
+            # Convert any DataFrame values to records
+            serializable = {}
+            for teacher_id, by_class in to_save.items():
+                serializable[str(teacher_id)] = {}
+                for class_name, subjects in by_class.items():
+                    serializable[str(teacher_id)][class_name] = {}
+                    for subject, df in subjects.items():
+                        if hasattr(df, 'to_dict'):
+                            serializable[str(teacher_id)][class_name][subject] = df.to_dict(orient='records')
+                        else:
+                            serializable[str(teacher_id)][class_name][subject] = df
+            atomic_write(MARKSHEETS_FILE, lambda f: json.dump(serializable, f, ensure_ascii=False, indent=2))
+
+        st.session_state.marksheets = _persist_keyed(
+            'marksheets', st.session_state.get('marksheets', {}), load_marksheets_from_disk, _write
+        )
     except Exception as e:
         print(f"Could not save marksheets: {e}")
 
 
 def load_marksheets_from_disk():
     try:
-        path = DATA_DIR / 'marksheets.json'
-        if path.exists():
-            with open(path, 'r', encoding='utf-8') as f:
+        if MARKSHEETS_FILE.exists():
+            with open(MARKSHEETS_FILE, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             # Convert back to DataFrames where appropriate
             result = {}
@@ -561,6 +844,7 @@ def save_marksheet(teacher_id, class_name, subject, df):
         save_marksheets_to_disk()
     except Exception as e:
         print(f"Could not persist marksheets: {e}")
+    return True
 
 
 def load_teachers_from_disk():
@@ -712,20 +996,23 @@ def get_teacher_by_id(teacher_id):
 def save_duties_to_disk():
     """Save duties mapping (date -> list of assignments) to CSV"""
     try:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        duties = st.session_state.get('duties', {})
-        rows = []
-        for date_key, assignments in duties.items():
-            for a in assignments:
-                rows.append({
-                    'date': date_key,
-                    'time': a.get('time'),
-                    'teacher_id': a.get('teacher_id'),
-                    'role': a.get('role')
-                })
-        if rows:
-            df = pd.DataFrame(rows)
-            df.to_csv(DUTIES_FILE, index=False)
+        def _write(duties):
+            rows = []
+            for date_key, assignments in duties.items():
+                for a in assignments:
+                    rows.append({
+                        'date': date_key,
+                        'time': a.get('time'),
+                        'teacher_id': a.get('teacher_id'),
+                        'role': a.get('role')
+                    })
+            if rows:
+                df = pd.DataFrame(rows)
+                atomic_write(DUTIES_FILE, lambda f: df.to_csv(f, index=False))
+
+        st.session_state.duties = _persist_keyed(
+            'duties', st.session_state.get('duties', {}), load_duties_from_disk, _write
+        )
     except Exception as e:
         print(f"Could not save duties: {e}")
 
@@ -862,10 +1149,14 @@ def get_note_last_updated(class_name, date):
 def save_daily_notes_to_disk():
     """Save daily notes to CSV for persistence"""
     try:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        if st.session_state.daily_notes:
-            notes_df = pd.DataFrame.from_dict(st.session_state.daily_notes, orient='index')
-            notes_df.to_csv(NOTES_FILE, index=False)
+        def _write(daily_notes):
+            if daily_notes:
+                notes_df = pd.DataFrame.from_dict(daily_notes, orient='index')
+                atomic_write(NOTES_FILE, lambda f: notes_df.to_csv(f, index=False))
+
+        st.session_state.daily_notes = _persist_keyed(
+            'daily_notes', st.session_state.daily_notes, load_daily_notes_from_disk, _write
+        )
     except Exception as e:
         print(f"Could not save daily notes: {e}")
 
@@ -896,10 +1187,7 @@ def get_student_attendance_history(student_id, days=30):
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
     
-    student_records = [
-        r for r in st.session_state.attendance_records 
-        if r['student_id'] == student_id and start_date <= r['date'] <= end_date
-    ]
+    student_records = get_attendance_store().student_range(student_id, start_date, end_date)
     
     return pd.DataFrame(student_records) if student_records else pd.DataFrame()
 
@@ -908,21 +1196,8 @@ def get_class_attendance_trends(class_name, days=30):
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
     
-    class_records = [
-        r for r in st.session_state.attendance_records 
-        if r['class'] == class_name and start_date <= r['date'] <= end_date
-    ]
-    
-    if not class_records:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(class_records)
-    df['date'] = pd.to_datetime(df['date'])
-    daily_summary = df.groupby('date').agg({
-        'status': lambda x: (x == 'P').sum() / len(x) * 100
-    }).rename(columns={'status': 'attendance_rate'})
-    
-    return daily_summary
+    daily_counts = get_attendance_store().daily_status_counts(class_name, start_date, end_date)
+    return class_trends(counts_frame(daily_counts))
 
 def search_students(query, class_name=None):
     """Search students by name or roll number"""
@@ -944,94 +1219,19 @@ def search_students(query, class_name=None):
 
 def get_student_performance_stats(student_id):
     """Get comprehensive performance stats for a student"""
-    attendance_history = get_student_attendance_history(student_id, days=90)
-    
-    if attendance_history.empty:
-        return {
-            'total_days': 0,
-            'present_rate': 0,
-            'late_rate': 0,
-            'absent_rate': 0,
-            'trend': 'no_data'
-        }
-    
-    total_days = len(attendance_history)
-    present_days = len(attendance_history[attendance_history['status'] == 'P'])
-    late_days = len(attendance_history[attendance_history['status'] == 'L'])
-    absent_days = len(attendance_history[attendance_history['status'].isin(['A', 'AP'])])
-    
-    present_rate = (present_days / total_days) * 100
-    late_rate = (late_days / total_days) * 100
-    absent_rate = (absent_days / total_days) * 100
-    
-    # Calculate trend (simple: compare first half vs second half)
-    if total_days >= 10:
-        first_half = attendance_history.iloc[:total_days//2]
-        second_half = attendance_history.iloc[total_days//2:]
-        
-        first_present = len(first_half[first_half['status'] == 'P']) / len(first_half) * 100
-        second_present = len(second_half[second_half['status'] == 'P']) / len(second_half) * 100
-        
-        if second_present > first_present + 5:
-            trend = 'improving'
-        elif second_present < first_present - 5:
-            trend = 'declining'
-        else:
-            trend = 'stable'
-    else:
-        trend = 'insufficient_data'
+    end_date = date.today()
+    start_date = end_date - timedelta(days=90)
     
-    return {
-        'total_days': total_days,
-        'present_rate': round(present_rate, 1),
-        'late_rate': round(late_rate, 1),
-        'absent_rate': round(absent_rate, 1),
-        'trend': trend
-    }
+    df = attendance_frame(get_attendance_store(), start_date, end_date)
+    return student_performance_stats(df[df['student_id'] == student_id])
 
 def get_class_summary_stats(class_name, days=30):
     """Get comprehensive summary stats for a class"""
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
     
-    class_records = [
-        r for r in st.session_state.attendance_records 
-        if r['class'] == class_name and start_date <= r['date'] <= end_date
-    ]
-    
-    if not class_records:
-        return {
-            'total_records': 0,
-            'average_attendance': 0,
-            'best_day': None,
-            'worst_day': None,
-            'most_common_issue': 'none'
-        }
-    
-    df = pd.DataFrame(class_records)
-    
-    # Daily attendance rates
-    daily_rates = df.groupby('date').apply(
-        lambda x: (x['status'] == 'P').sum() / len(x) * 100
-    )
-    
-    # Most common non-present status
-    status_counts = df[df['status'] != 'P']['status'].value_counts()
-    most_common_issue = status_counts.index[0] if not status_counts.empty else 'none'
-    
-    return {
-        'total_records': len(class_records),
-        'average_attendance': round(daily_rates.mean(), 1),
-        'best_day': {
-            'date': daily_rates.idxmax(),
-            'rate': round(daily_rates.max(), 1)
-        } if not daily_rates.empty else None,
-        'worst_day': {
-            'date': daily_rates.idxmin(),
-            'rate': round(daily_rates.min(), 1)
-        } if not daily_rates.empty else None,
-        'most_common_issue': most_common_issue
-    }
+    daily_counts = get_attendance_store().daily_status_counts(class_name, start_date, end_date)
+    return class_summary_stats(counts_frame(daily_counts))
 
 # BIS NOC SPECIFIC FUNCTIONS
 
@@ -1092,8 +1292,10 @@ def get_live_timetable_status(class_name):
 def export_to_custom_format(class_name, start_date, end_date):
     """Export to BIS NOC custom format"""
     # Get the standard attendance data
-    attendance_data = get_attendance_report(class_name, start_date, end_date)
-    
+    return to_custom_format(get_attendance_report(class_name, start_date, end_date))
+
+def to_custom_format(attendance_data):
+    """Convert an attendance report DataFrame to the BIS NOC export layout"""
     if attendance_data.empty:
         return pd.DataFrame()
     
@@ -1116,26 +1318,9 @@ def export_to_custom_format(class_name, start_date, end_date):
 
 # TIMETABLE FUNCTIONS
 
-def get_class_timetable(class_name):
-    """Get timetable for a class, prefer persisted per-class timetables."""
-    # If timetables exist in session state use them
-    if 'class_timetables' in st.session_state:
-        tt = st.session_state.class_timetables.get(class_name)
-        if tt:
-            # If loaded from JSON it may already be a dict-of-lists
-            if isinstance(tt, dict):
-                return tt
-
-    # If not in session, try loading from disk
-    loaded = load_class_timetables_from_disk()
-    if loaded and isinstance(loaded, dict) and class_name in loaded:
-        # put it into session for faster access later
-        st.session_state.class_timetables = st.session_state.get('class_timetables', {})
-        st.session_state.class_timetables[class_name] = loaded[class_name]
-        return loaded[class_name]
-
-    # Fall back to default BIS NOC timetable
-    default = {
+def default_class_timetable():
+    """Default BIS NOC timetable (same periods every weekday)"""
+    return {
         "Monday": [
             "Morning Activity, Registration (08:10-08:30)",
             "Lesson 1 (08:30-09:20)",
@@ -1197,7 +1382,28 @@ def get_class_timetable(class_name):
             "Lesson 6 (14:10-15:00)"
         ]
     }
-    return default
+
+
+def get_class_timetable(class_name):
+    """Get timetable for a class, prefer persisted per-class timetables."""
+    # If timetables exist in session state use them
+    if 'class_timetables' in st.session_state:
+        tt = st.session_state.class_timetables.get(class_name)
+        if tt:
+            # If loaded from JSON it may already be a dict-of-lists
+            if isinstance(tt, dict):
+                return tt
+
+    # If not in session, fall back to the shared copy loaded from disk
+    loaded = _load_shared('class_timetables', lambda: _or_default(load_class_timetables_from_disk(), dict))
+    if loaded and isinstance(loaded, dict) and class_name in loaded:
+        # put it into session for faster access later
+        st.session_state.class_timetables = st.session_state.get('class_timetables', {})
+        st.session_state.class_timetables[class_name] = copy.deepcopy(loaded[class_name])
+        return st.session_state.class_timetables[class_name]
+
+    # Fall back to default BIS NOC timetable
+    return default_class_timetable()
 
 def save_class_timetable(class_name, timetable_data):
     """Save timetable for a class"""
@@ -1219,11 +1425,12 @@ def get_default_timetable(class_name):
 def save_class_timetables_to_disk():
     """Persist all class timetables to a JSON file"""
     try:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        # Convert any non-serializable types (dates etc) to strings if needed
-        to_save = st.session_state.get('class_timetables', {})
-        with open(TIMETABLES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(to_save, f, ensure_ascii=False, indent=2)
+        st.session_state.class_timetables = _persist_keyed(
+            'class_timetables', st.session_state.get('class_timetables', {}), load_class_timetables_from_disk,
+            lambda to_save: atomic_write(
+                TIMETABLES_FILE, lambda f: json.dump(to_save, f, ensure_ascii=False, indent=2)
+            )
+        )
     except Exception as e:
         print(f"Error saving timetables to disk: {e}")
 
@@ -1246,14 +1453,8 @@ def get_recent_attendance_dates(class_name, limit=5):
     if 'attendance_records' not in st.session_state:
         return []
     
-    class_dates = set()
-    for record in st.session_state.attendance_records:
-        if record['class'] == class_name:
-            class_dates.add(record['date'])
-    
-    # Sort dates descending and return limited number
-    sorted_dates = sorted(class_dates, reverse=True)
-    return sorted_dates[:limit]
+    # Only the newest months are read when history is stored per month
+    return get_attendance_store().latest_class_dates(class_name, limit)
 
 def export_class_data(class_name, start_date, end_date):
     """Export comprehensive class data for reporting"""
@@ -1266,48 +1467,30 @@ def export_class_data(class_name, start_date, end_date):
         'summary': get_class_summary_stats(class_name, days=(end_date - start_date).days)
     }
 
+def _scheduled_report(start_date, end_date):
+    """All-classes report from the process-wide attendance store (no session needed)"""
+    store = _load_shared('attendance', load_attendance_store_from_disk)
+    return _all_classes_frame(store.date_range(start_date, end_date))
+
+# Month-end / week-end reports, pre-built in the background (see utils/report_scheduler.py)
+report_scheduler = ReportScheduler(
+    REPORTS_DIR, _scheduled_report, state_token=lambda: _file_signature('attendance'), classes=CLASSES
+)
+
+def start_report_scheduler():
+    """Start pre-building reports in the background (once per process)"""
+    report_scheduler.start()
+
 def generate_monthly_report(month, year):
-    """Generate comprehensive monthly report"""
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year+1, 1, 1) - timedelta(days=1)
-    else:
-        end_date = date(year, month+1, 1) - timedelta(days=1)
-    
-    # Generate report data
-    monthly_data = get_all_classes_report(start_date, end_date)
-    
-    # Create monthly reports directory
-    reports_dir = DATA_DIR / "monthly_reports"
-    reports_dir.mkdir(exist_ok=True)
-    
-    # Save the report
-    report_filename = f"monthly_report_{year}_{month:02d}.csv"
-    report_path = reports_dir / report_filename
-    monthly_data.to_csv(report_path, index=False)
-    
-    return report_path
+    """Generate the monthly CSV and XLSX report now (reused when the month's data is unchanged);
+    returns the CSV path, or None if the month has no attendance"""
+    return report_scheduler.generate_month(month, year)
 
 def get_available_monthly_reports():
-    """Get list of available monthly reports"""
-    reports_dir = DATA_DIR / "monthly_reports"
-    if not reports_dir.exists():
-        return []
-    
-    reports = []
-    for file_path in reports_dir.glob("monthly_report_*.csv"):
-        filename = file_path.name
-        # Extract year and month from filename
-        parts = filename.replace('monthly_report_', '').replace('.csv', '').split('_')
-        if len(parts) == 2:
-            year, month = int(parts[0]), int(parts[1])
-            reports.append({
-                'filename': filename,
-                'year': year,
-                'month': month,
-                'file_path': file_path,
-                'display_name': f"{date(year, month, 1).strftime('%B %Y')}"
-            })
-    
-    return sorted(reports, key=lambda x: (x['year'], x['month']), reverse=True)
+    """Get list of available monthly reports, from the report manifest"""
+    return report_scheduler.monthly_reports()
+
+def get_available_reports(kind=None):
+    """Pre-built reports ('month' / 'week' / all), newest first"""
+    return report_scheduler.reports(kind)
 
@@ -0,0 +1,839 @@
+# utils/data_models_sqlite.py - SQLITE VERSION
+"""Embedded SQLite backend with the same function surface app.py uses from utils.data_models.
+
+The database runs in WAL mode, so readers never block the writer, and follows
+database_schema.sql: the same tables, indexes and UNIQUE(student_id, date)
+upsert semantics for attendance. Select it with DATA_BACKEND=sqlite.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, date, timedelta
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from utils.report_scheduler import ReportScheduler
+from utils.data_models import (
+    DATA_DIR,
+    REPORTS_DIR,
+    CLASSES,
+    # Session-only helpers shared with the CSV backend
+    get_class_color,
+    send_class_notification,
+    get_class_notifications,
+    mark_notification_read,
+    get_live_timetable_status,
+    summarize_status_counts,
+    default_class_timetable,
+    to_custom_format,
+    # Used once to seed a new database from the existing data/ files
+    load_sample_students,
+    load_students_from_disk,
+    load_attendance_from_disk,
+    load_teachers_from_disk,
+    load_duties_from_disk,
+    load_daily_notes_from_disk,
+    load_class_timetables_from_disk,
+    load_marksheets_from_disk
+)
+
+SQLITE_DB_PATH = Path(os.getenv("SQLITE_DB_PATH", str(DATA_DIR / "bis_noc.db")))
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+# Columns that identify a student in a marksheet; every other column is an assessment
+MARKSHEET_ID_COLUMNS = ['student_id', 'roll_number', 'name']
+
+# database_schema.sql translated to SQLite: SERIAL -> INTEGER PRIMARY KEY,
+# TEXT[]/JSONB -> JSON text. attendance_records also keeps the student's name and
+# roll number as recorded, because reports show them even after a student changes.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    class TEXT NOT NULL,
+    gender TEXT CHECK (gender IN ('M', 'F')),
+    roll_number TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(class, roll_number)
+);
+
+CREATE TABLE IF NOT EXISTS teachers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    subjects TEXT,
+    classes TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS attendance_records (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER REFERENCES students(id) ON DELETE CASCADE,
+    class TEXT NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('P', 'L', 'A', 'AP')),
+    notes TEXT,
+    name TEXT,
+    roll_number TEXT,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(student_id, date)
+);
+
+CREATE TABLE IF NOT EXISTS daily_notes (
+    id INTEGER PRIMARY KEY,
+    class TEXT NOT NULL,
+    date TEXT NOT NULL,
+    text TEXT,
+    last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(class, date)
+);
+
+CREATE TABLE IF NOT EXISTS class_timetables (
+    id INTEGER PRIMARY KEY,
+    class_name TEXT NOT NULL,
+    day TEXT NOT NULL CHECK (day IN ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday')),
+    periods TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(class_name, day)
+);
+
+CREATE TABLE IF NOT EXISTS duties (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    time_slot TEXT NOT NULL,
+    teacher_id INTEGER REFERENCES teachers(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS marksheets (
+    id INTEGER PRIMARY KEY,
+    teacher_id INTEGER REFERENCES teachers(id) ON DELETE CASCADE,
+    class_name TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    student_id INTEGER REFERENCES students(id) ON DELETE CASCADE,
+    assessment_type TEXT NOT NULL,
+    score NUMERIC,
+    notes TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(teacher_id, class_name, subject, student_id, assessment_type)
+);
+
+CREATE TABLE IF NOT EXISTS class_notifications (
+    id INTEGER PRIMARY KEY,
+    class_name TEXT NOT NULL,
+    message TEXT NOT NULL,
+    message_type TEXT DEFAULT 'info',
+    is_read INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance_records(student_id, date);
+CREATE INDEX IF NOT EXISTS idx_attendance_class_date ON attendance_records(class, date);
+CREATE INDEX IF NOT EXISTS idx_students_class ON students(class);
+CREATE INDEX IF NOT EXISTS idx_teachers_type ON teachers(type);
+CREATE INDEX IF NOT EXISTS idx_duties_date ON duties(date);
+CREATE INDEX IF NOT EXISTS idx_marksheets_teacher_class ON marksheets(teacher_id, class_name);
+CREATE INDEX IF NOT EXISTS idx_notifications_class ON class_notifications(class_name);
+
+CREATE TRIGGER IF NOT EXISTS update_students_updated_at AFTER UPDATE ON students
+BEGIN UPDATE students SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id; END;
+
+CREATE TRIGGER IF NOT EXISTS update_teachers_updated_at AFTER UPDATE ON teachers
+BEGIN UPDATE teachers SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id; END;
+
+CREATE TRIGGER IF NOT EXISTS update_class_timetables_updated_at AFTER UPDATE ON class_timetables
+BEGIN UPDATE class_timetables SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id; END;
+
+CREATE TRIGGER IF NOT EXISTS update_marksheets_updated_at AFTER UPDATE ON marksheets
+BEGIN UPDATE marksheets SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id; END;
+"""
+
+ATTENDANCE_COLUMNS = "student_id, name, roll_number, class, date, status, notes, timestamp"
+
+UPSERT_ATTENDANCE = f"""
+INSERT INTO attendance_records ({ATTENDANCE_COLUMNS})
+VALUES (:student_id, :name, :roll_number, :class, :date, :status, :notes, :timestamp)
+ON CONFLICT(student_id, date) DO UPDATE SET
+    class = excluded.class,
+    status = excluded.status,
+    notes = excluded.notes,
+    timestamp = excluded.timestamp,
+    name = COALESCE(excluded.name, attendance_records.name),
+    roll_number = COALESCE(excluded.roll_number, attendance_records.roll_number)
+"""
+
+# CONNECTIONS
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def get_connection():
+    """Per-thread connection (Streamlit runs each session in its own thread)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        SQLITE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(SQLITE_DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        _local.conn = conn
+    _ensure_schema(conn)
+    return conn
+
+def _ensure_schema(conn):
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        is_new = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'students'"
+        ).fetchone()[0] == 0
+        conn.executescript(SCHEMA)
+        if is_new:
+            _seed_from_files(conn)
+        _schema_ready = True
+
+def _query(sql, params=()):
+    return [dict(row) for row in get_connection().execute(sql, params).fetchall()]
+
+def _unknown_ids(conn, table, ids):
+    """Sorted ids (of students or teachers) that ``table`` does not hold"""
+    ids = {int(i) for i in ids if i is not None}
+    if not ids:
+        return []
+    return sorted(ids - {row[0] for row in conn.execute(f"SELECT id FROM {table}")})
+
+def _rejected(action, reason):
+    """Show why a write was refused (foreign keys are enforced, so rows for an unknown
+    student or teacher cannot be stored) and return False"""
+    print(f"Could not {action}: {reason}")
+    st.error(f"❌ Could not {action}: {reason}")
+    return False
+
+def _unknown_message(kind, ids):
+    return f"unknown {kind} id(s) {', '.join(map(str, ids))}"
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            pass
+    return date.today()
+
+def _attendance_row(record):
+    """Named parameters for UPSERT_ATTENDANCE from an app attendance record"""
+    notes = record.get('notes')
+    return {
+        'student_id': int(record['student_id']),
+        'name': record.get('name'),
+        'roll_number': record.get('roll_number'),
+        'class': record['class'],
+        'date': _to_date(record.get('date')).isoformat(),
+        'status': record['status'],
+        'notes': None if notes is None or (isinstance(notes, float) and pd.isna(notes)) else str(notes),
+        'timestamp': record.get('timestamp') or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def _record_from_row(row):
+    row['date'] = _to_date(row['date'])
+    if row.get('notes') is None:
+        row['notes'] = ''
+    return row
+
+def _seed_from_files(conn):
+    """Import the CSV/JSON data files into a freshly created database"""
+    try:
+        with conn:
+            students = load_students_from_disk()
+            if students is None or students.empty:
+                students = load_sample_students()
+            conn.executemany(
+                "INSERT OR IGNORE INTO students (id, name, class, gender, roll_number) VALUES (?, ?, ?, ?, ?)",
+                [(int(s['id']), s['name'], s['class'], s.get('gender'), str(s['roll_number']))
+                 for s in students.to_dict(orient='records')]
+            )
+            student_ids = set(row[0] for row in conn.execute("SELECT id FROM students"))
+
+            teachers = load_teachers_from_disk() or []
+            conn.executemany(
+                "INSERT INTO teachers (id, name, type, subjects, classes) VALUES (?, ?, ?, ?, ?)",
+                [(int(t['id']), t.get('name'), t.get('type') or 'Main',
+                  json.dumps(t.get('subjects') or []), json.dumps(t.get('classes') or []))
+                 for t in teachers]
+            )
+            teacher_ids = set(int(t['id']) for t in teachers)
+
+            attendance = [r for r in load_attendance_from_disk() if r.get('student_id') in student_ids]
+            conn.executemany(UPSERT_ATTENDANCE, [_attendance_row(r) for r in attendance])
+
+            for note in (load_daily_notes_from_disk() or {}).values():
+                conn.execute(
+                    "INSERT OR REPLACE INTO daily_notes (class, date, text, last_updated) VALUES (?, ?, ?, ?)",
+                    (note['class'], str(note['date']), note.get('text'), note.get('last_updated'))
+                )
+
+            for class_name, timetable in (load_class_timetables_from_disk() or {}).items():
+                _write_timetable(conn, class_name, timetable)
+
+            for date_key, assignments in (load_duties_from_disk() or {}).items():
+                for a in assignments:
+                    if a.get('teacher_id') in teacher_ids:
+                        conn.execute(
+                            "INSERT INTO duties (date, time_slot, teacher_id, role) VALUES (?, ?, ?, ?)",
+                            (str(date_key), a.get('time'), a.get('teacher_id'), a.get('role'))
+                        )
+
+            for teacher_id, by_class in (load_marksheets_from_disk() or {}).items():
+                if teacher_id not in teacher_ids:
+                    continue
+                for class_name, subjects in by_class.items():
+                    for subject, df in subjects.items():
+                        _write_marksheet(conn, teacher_id, class_name, subject, df, student_ids)
+    except Exception as e:
+        print(f"Could not import existing data into SQLite: {e}")
+
+# ATTENDANCE VIEW
+
+class AttendanceRecordsView:
+    """Stands in for st.session_state.attendance_records: len() and iteration hit the database"""
+
+    def __len__(self):
+        return get_connection().execute("SELECT COUNT(*) FROM attendance_records").fetchone()[0]
+
+    def __iter__(self):
+        rows = _query(f"SELECT {ATTENDANCE_COLUMNS} FROM attendance_records ORDER BY date, id")
+        return iter([_record_from_row(r) for r in rows])
+
+# SESSION STATE
+
+def initialize_session_state():
+    """Initialize all session state variables from the SQLite database"""
+    _refresh_students()
+    st.session_state.attendance_records = AttendanceRecordsView()
+
+    if 'classes' not in st.session_state:
+        st.session_state.classes = list(CLASSES)
+
+    if 'class_notifications' not in st.session_state:
+        st.session_state.class_notifications = {}
+
+    start_report_scheduler()
+
+def _refresh_students():
+    st.session_state.students_df = pd.read_sql_query(
+        "SELECT id, name, class, gender, roll_number FROM students ORDER BY id", get_connection()
+    )
+
+# ATTENDANCE FUNCTIONS
+
+def save_attendance(attendance_data):
+    """Save a roll call: replaces each (class, date) in the batch in one transaction.
+    Returns False (nothing is saved) when the database refuses any of the rows."""
+    try:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [_attendance_row(dict(r, timestamp=timestamp)) for r in attendance_data]
+        conn = get_connection()
+        unknown = _unknown_ids(conn, 'students', [r['student_id'] for r in rows])
+        if unknown:
+            return _rejected("save attendance", _unknown_message('student', unknown))
+        with conn:
+            for class_name, day in {(r['class'], r['date']) for r in rows}:
+                conn.execute("DELETE FROM attendance_records WHERE class = ? AND date = ?", (class_name, day))
+            conn.executemany(UPSERT_ATTENDANCE, rows)
+        return True
+    except sqlite3.IntegrityError as e:
+        return _rejected("save attendance", e)
+    except Exception as e:
+        print(f"Could not save attendance: {e}")
+        return False
+
+def update_attendance_from_list(records_list):
+    """Upsert admin edits by (student_id, date)"""
+    try:
+        rows = [_attendance_row(r) for r in records_list]
+        conn = get_connection()
+        unknown = _unknown_ids(conn, 'students', [r['student_id'] for r in rows])
+        if unknown:
+            return _rejected("update attendance records", _unknown_message('student', unknown))
+        with conn:
+            conn.executemany(UPSERT_ATTENDANCE, rows)
+        return True
+    except sqlite3.IntegrityError as e:
+        return _rejected("update attendance records", e)
+    except Exception as e:
+        print(f"Error updating attendance records: {e}")
+        return False
+
+def get_class_attendance_summary(class_name, selected_date):
+    """Get attendance summary for a specific class and date"""
+    rows = get_connection().execute(
+        "SELECT status, COUNT(*) FROM attendance_records WHERE class = ? AND date = ? GROUP BY status",
+        (class_name, _to_date(selected_date).isoformat())
+    ).fetchall()
+    return summarize_status_counts({status: count for status, count in rows})
+
+def get_class_day_sheet(class_name, selected_date):
+    """Saved roll call for a class on a date: {student_id: (status, notes)}"""
+    rows = get_connection().execute(
+        "SELECT student_id, status, notes FROM attendance_records WHERE class = ? AND date = ?",
+        (class_name, _to_date(selected_date).isoformat())
+    ).fetchall()
+    return {student_id: (status, notes or '') for student_id, status, notes in rows}
+
+def get_school_attendance_summary(selected_date):
+    """Attendance summaries for every class marked on a date, in one query"""
+    rows = get_connection().execute(
+        "SELECT class, status, COUNT(*) FROM attendance_records WHERE date = ? GROUP BY class, status",
+        (_to_date(selected_date).isoformat(),)
+    ).fetchall()
+    by_class = {}
+    for class_name, status, count in rows:
+        by_class.setdefault(class_name, {})[status] = count
+    return {class_name: summarize_status_counts(counts) for class_name, counts in by_class.items()}
+
+def get_attendance_report(class_name, start_date, end_date):
+    """Generate attendance report for a class"""
+    rows = _query(
+        f"SELECT {ATTENDANCE_COLUMNS} FROM attendance_records "
+        "WHERE class = ? AND date BETWEEN ? AND ? ORDER BY date, id",
+        (class_name, _to_date(start_date).isoformat(), _to_date(end_date).isoformat())
+    )
+    if not rows:
+        return pd.DataFrame()
+
+    return pd.DataFrame([{
+        'Date': _to_date(r['date']),
+        'Student ID': r['student_id'],
+        'Student Name': r['name'],
+        'Roll Number': r['roll_number'],
+        'Status': r['status'],
+        'Notes': r['notes'] or '',
+        'Timestamp': r['timestamp'] or '',
+        'Class': r['class']
+    } for r in rows])
+
+def get_all_classes_report(start_date, end_date):
+    """Generate report for all classes"""
+    rows = _query(
+        f"SELECT {ATTENDANCE_COLUMNS} FROM attendance_records WHERE date BETWEEN ? AND ? ORDER BY date, id",
+        (_to_date(start_date).isoformat(), _to_date(end_date).isoformat())
+    )
+    if not rows:
+        return pd.DataFrame()
+
+    return pd.DataFrame([{
+        'Date': _to_date(r['date']),
+        'Class': r['class'],
+        'Student ID': r['student_id'],
+        'Student Name': r['name'],
+        'Roll Number': r['roll_number'],
+        'Status': r['status'],
+        'Notes': r['notes'] or ''
+    } for r in rows])
+
+def get_student_attendance_history(student_id, days=30):
+    """Get attendance history for a specific student"""
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days)
+    rows = _query(
+        f"SELECT {ATTENDANCE_COLUMNS} FROM attendance_records "
+        "WHERE student_id = ? AND date BETWEEN ? AND ? ORDER BY date, id",
+        (int(student_id), start_date.isoformat(), end_date.isoformat())
+    )
+    return pd.DataFrame([_record_from_row(r) for r in rows]) if rows else pd.DataFrame()
+
+def get_class_attendance_trends(class_name, days=30):
+    """Get attendance trends for a class"""
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days)
+    df = pd.read_sql_query(
+        "SELECT date, 100.0 * SUM(status = 'P') / COUNT(*) AS attendance_rate FROM attendance_records "
+        "WHERE class = ? AND date BETWEEN ? AND ? GROUP BY date ORDER BY date",
+        get_connection(), params=(class_name, start_date.isoformat(), end_date.isoformat())
+    )
+    if df.empty:
+        return pd.DataFrame()
+    df['date'] = pd.to_datetime(df['date'])
+    return df.set_index('date')
+
+def get_recent_attendance_dates(class_name, limit=5):
+    """Get recent dates when attendance was taken for a class"""
+    rows = get_connection().execute(
+        "SELECT DISTINCT date FROM attendance_records WHERE class = ? ORDER BY date DESC LIMIT ?",
+        (class_name, limit)
+    ).fetchall()
+    return [_to_date(row[0]) for row in rows]
+
+def export_to_custom_format(class_name, start_date, end_date):
+    """Export to BIS NOC custom format"""
+    return to_custom_format(get_attendance_report(class_name, start_date, end_date))
+
+# STUDENT MANAGEMENT FUNCTIONS
+
+STUDENT_FIELDS = ('name', 'class', 'gender', 'roll_number')
+
+def get_class_students(class_name):
+    """Get students for a specific class"""
+    if 'students_df' not in st.session_state:
+        _refresh_students()
+    students = st.session_state.students_df
+    return students[students['class'] == class_name]
+
+def add_student_to_class(class_name, student_data):
+    """Add a new student to a class"""
+    try:
+        conn = get_connection()
+        with conn:
+            class_size = conn.execute("SELECT COUNT(*) FROM students WHERE class = ?", (class_name,)).fetchone()[0]
+            class_prefix = class_name.replace('Year 3 - ', '').upper()[:3]
+            conn.execute(
+                "INSERT INTO students (name, class, gender, roll_number) VALUES (?, ?, ?, ?)",
+                (student_data['name'], class_name, student_data['gender'], f"{class_prefix}-{class_size + 1:02d}")
+            )
+        _refresh_students()
+        return True
+    except Exception as e:
+        print(f"Error adding student: {e}")
+        return False
+
+def update_student(student_id, updated_data):
+    """Update student information"""
+    try:
+        fields = {k: v for k, v in updated_data.items() if k in STUDENT_FIELDS}
+        if not fields:
+            return False
+        conn = get_connection()
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE students SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                list(fields.values()) + [int(student_id)]
+            )
+        _refresh_students()
+        return cursor.rowcount > 0
+    except Exception as e:
+        print(f"Error updating student: {e}")
+        return False
+
+def remove_student(student_id):
+    """Remove a student from class"""
+    try:
+        conn = get_connection()
+        with conn:
+            conn.execute("DELETE FROM students WHERE id = ?", (int(student_id),))
+        _refresh_students()
+        return True
+    except Exception as e:
+        print(f"Error removing student: {e}")
+        return False
+
+def search_students(query, class_name=None):
+    """Search students by name or roll number"""
+    sql = "SELECT id, name, class, gender, roll_number FROM students WHERE 1 = 1"
+    params = []
+    if class_name:
+        sql += " AND class = ?"
+        params.append(class_name)
+    if query.strip():
+        sql += " AND (name LIKE ? OR roll_number LIKE ?)"
+        params += [f"%{query.strip()}%"] * 2
+    return pd.read_sql_query(sql + " ORDER BY id", get_connection(), params=params)
+
+# TEACHER FUNCTIONS
+
+def _split_list(value):
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(',') if v.strip()]
+    return list(value or [])
+
+def _teacher_from_row(row):
+    row['subjects'] = json.loads(row.get('subjects') or '[]')
+    row['classes'] = json.loads(row.get('classes') or '[]')
+    return row
+
+def get_teachers(teacher_type=None):
+    """Return list of teachers, optionally filtered by type"""
+    sql = "SELECT id, name, type, subjects, classes FROM teachers"
+    if teacher_type:
+        return [_teacher_from_row(r) for r in _query(sql + " WHERE type = ? ORDER BY id", (teacher_type,))]
+    return [_teacher_from_row(r) for r in _query(sql + " ORDER BY id")]
+
+def get_teacher_by_id(teacher_id):
+    rows = _query("SELECT id, name, type, subjects, classes FROM teachers WHERE id = ?", (teacher_id,))
+    return _teacher_from_row(rows[0]) if rows else None
+
+def add_teacher(teacher):
+    """Add a teacher record. teacher is a dict with keys: name, type, subjects(list), classes(list)"""
+    try:
+        conn = get_connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO teachers (name, type, subjects, classes) VALUES (?, ?, ?, ?)",
+                (teacher.get('name'), teacher.get('type') or 'Main',
+                 json.dumps(_split_list(teacher.get('subjects'))), json.dumps(_split_list(teacher.get('classes'))))
+            )
+        teacher['id'] = cursor.lastrowid
+        return teacher['id']
+    except Exception as e:
+        print(f"Error adding teacher: {e}")
+        return None
+
+def update_teacher(teacher_id, updates):
+    """Update teacher fields by id"""
+    try:
+        fields = {k: v for k, v in updates.items() if k in ('name', 'type', 'subjects', 'classes')}
+        for key in ('subjects', 'classes'):
+            if key in fields:
+                fields[key] = json.dumps(_split_list(fields[key]))
+        if not fields:
+            return False
+        conn = get_connection()
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE teachers SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                list(fields.values()) + [teacher_id]
+            )
+        return cursor.rowcount > 0
+    except Exception as e:
+        print(f"Error updating teacher: {e}")
+        return False
+
+def remove_teacher(teacher_id):
+    """Remove teacher by id"""
+    try:
+        conn = get_connection()
+        with conn:
+            conn.execute("DELETE FROM teachers WHERE id = ?", (teacher_id,))
+        return True
+    except Exception as e:
+        print(f"Error removing teacher: {e}")
+        return False
+
+# DUTY FUNCTIONS
+
+def assign_duty(date_key, time_slot, teacher_id, role):
+    """Assign a duty to a teacher for a date and time slot"""
+    try:
+        conn = get_connection()
+        unknown = _unknown_ids(conn, 'teachers', [teacher_id])
+        if unknown:
+            return _rejected("assign duty", _unknown_message('teacher', unknown))
+        with conn:
+            conn.execute(
+                "INSERT INTO duties (date, time_slot, teacher_id, role) VALUES (?, ?, ?, ?)",
+                (str(date_key), time_slot, teacher_id, role)
+            )
+        return True
+    except sqlite3.IntegrityError as e:
+        return _rejected("assign duty", e)
+    except Exception as e:
+        print(f"Error assigning duty: {e}")
+        return False
+
+def remove_duty(date_key, teacher_id, time_slot=None, role=None):
+    """Remove duty assignment"""
+    try:
+        sql = "DELETE FROM duties WHERE date = ? AND teacher_id = ?"
+        params = [str(date_key), teacher_id]
+        if time_slot is not None:
+            sql += " AND time_slot = ?"
+            params.append(time_slot)
+        if role is not None:
+            sql += " AND role = ?"
+            params.append(role)
+        conn = get_connection()
+        with conn:
+            cursor = conn.execute(sql, params)
+        return cursor.rowcount > 0
+    except Exception as e:
+        print(f"Error removing duty: {e}")
+        return False
+
+def get_duties_for_date(date_key):
+    rows = _query(
+        "SELECT time_slot AS time, teacher_id, role FROM duties WHERE date = ? ORDER BY id", (str(date_key),)
+    )
+    return rows
+
+# DAILY NOTES FUNCTIONS
+
+def save_daily_note(class_name, date, note_text):
+    """Save daily note for a class"""
+    try:
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO daily_notes (class, date, text, last_updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(class, date) DO UPDATE SET text = excluded.text, last_updated = excluded.last_updated",
+                (class_name, _to_date(date).isoformat(), note_text, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+    except Exception as e:
+        print(f"Could not save daily note: {e}")
+
+def _daily_note(class_name, date):
+    rows = _query(
+        "SELECT text, last_updated FROM daily_notes WHERE class = ? AND date = ?",
+        (class_name, _to_date(date).isoformat())
+    )
+    return rows[0] if rows else {}
+
+def get_daily_note(class_name, date):
+    """Get daily note for a class and date"""
+    return _daily_note(class_name, date).get('text') or ""
+
+def get_note_last_updated(class_name, date):
+    """Get when the note was last updated"""
+    return _daily_note(class_name, date).get('last_updated') or ""
+
+# TIMETABLE FUNCTIONS
+
+def _write_timetable(conn, class_name, timetable_data):
+    for day, periods in timetable_data.items():
+        if day in WEEKDAYS:
+            conn.execute(
+                "INSERT INTO class_timetables (class_name, day, periods) VALUES (?, ?, ?) "
+                "ON CONFLICT(class_name, day) DO UPDATE SET periods = excluded.periods",
+                (class_name, day, json.dumps(periods, ensure_ascii=False))
+            )
+
+def get_class_timetable(class_name):
+    """Get timetable for a class, falling back to the default BIS NOC timetable"""
+    rows = _query("SELECT day, periods FROM class_timetables WHERE class_name = ?", (class_name,))
+    if not rows:
+        return default_class_timetable()
+    by_day = {r['day']: json.loads(r['periods']) for r in rows}
+    return {day: by_day[day] for day in WEEKDAYS if day in by_day}
+
+def save_class_timetable(class_name, timetable_data):
+    """Save timetable for a class"""
+    try:
+        conn = get_connection()
+        with conn:
+            _write_timetable(conn, class_name, timetable_data)
+    except Exception as e:
+        print(f"Could not persist class timetables: {e}")
+
+# MARKSHEET FUNCTIONS
+
+def _write_marksheet(conn, teacher_id, class_name, subject, df, student_ids=None):
+    """Replace a marksheet: one row per (student, assessment column)"""
+    conn.execute(
+        "DELETE FROM marksheets WHERE teacher_id = ? AND class_name = ? AND subject = ?",
+        (teacher_id, class_name, subject)
+    )
+    if df is None or df.empty or 'student_id' not in df.columns:
+        return
+    assessments = [c for c in df.columns if c not in MARKSHEET_ID_COLUMNS]
+    rows = []
+    for record in df.to_dict(orient='records'):
+        try:
+            student_id = int(record['student_id'])
+        except (TypeError, ValueError):
+            continue  # rows without a student cannot be stored against the schema
+        if student_ids is not None and student_id not in student_ids:
+            continue
+        for assessment in assessments:
+            score = record.get(assessment)
+            if score == '' or (isinstance(score, float) and pd.isna(score)):
+                score = None
+            rows.append((teacher_id, class_name, subject, student_id, str(assessment), score))
+    conn.executemany(
+        "INSERT OR REPLACE INTO marksheets (teacher_id, class_name, subject, student_id, assessment_type, score) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+def get_marksheet(teacher_id, class_name, subject):
+    """Return a DataFrame marksheet for the teacher/class/subject. Empty DataFrame if none."""
+    long_df = pd.read_sql_query(
+        "SELECT m.student_id, s.roll_number, s.name, m.assessment_type, m.score "
+        "FROM marksheets m LEFT JOIN students s ON s.id = m.student_id "
+        "WHERE m.teacher_id = ? AND m.class_name = ? AND m.subject = ? ORDER BY m.id",
+        get_connection(), params=(teacher_id, class_name, subject)
+    )
+    if long_df.empty:
+        return pd.DataFrame()
+    assessments = list(dict.fromkeys(long_df['assessment_type']))
+    wide = long_df.pivot_table(
+        index=MARKSHEET_ID_COLUMNS, columns='assessment_type', values='score', aggfunc='first', dropna=False
+    ).reset_index()
+    wide.columns.name = None
+    for assessment in assessments:
+        if assessment not in wide.columns:
+            wide[assessment] = None
+    return wide[MARKSHEET_ID_COLUMNS + assessments]
+
+def save_marksheet(teacher_id, class_name, subject, df):
+    """Save a marksheet DataFrame to the database; False when it was refused."""
+    try:
+        conn = get_connection()
+        unknown_teachers = _unknown_ids(conn, 'teachers', [teacher_id])
+        if unknown_teachers:
+            return _rejected("save marksheet", _unknown_message('teacher', unknown_teachers))
+        if df is not None and 'student_id' in df.columns:
+            student_ids = pd.to_numeric(df['student_id'], errors='coerce').dropna()
+            unknown = _unknown_ids(conn, 'students', student_ids.tolist())
+            if unknown:
+                return _rejected("save marksheet", _unknown_message('student', unknown))
+        with conn:
+            _write_marksheet(conn, teacher_id, class_name, subject, df)
+        return True
+    except sqlite3.IntegrityError as e:
+        return _rejected("save marksheet", e)
+    except Exception as e:
+        print(f"Could not persist marksheets: {e}")
+        return False
+
+# SCHEDULED REPORTS
+
+def _database_signature():
+    """(mtime, size) of the database and its WAL: changes with every commit"""
+    signature = []
+    for path in (SQLITE_DB_PATH, SQLITE_DB_PATH.with_name(SQLITE_DB_PATH.name + '-wal')):
+        try:
+            stat = path.stat()
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+# Month-end / week-end reports, pre-built in the background (see utils/report_scheduler.py)
+report_scheduler = ReportScheduler(
+    REPORTS_DIR, get_all_classes_report, state_token=_database_signature, classes=CLASSES
+)
+
+def start_report_scheduler():
+    """Start pre-building reports in the background (once per process)"""
+    report_scheduler.start()
+
+def generate_monthly_report(month, year):
+    """Generate the monthly CSV and XLSX report now (reused when the month's data is unchanged);
+    returns the CSV path, or None if the month has no attendance"""
+    return report_scheduler.generate_month(month, year)
+
+def get_available_monthly_reports():
+    """Get list of available monthly reports, from the report manifest"""
+    return report_scheduler.monthly_reports()
+
+def get_available_reports(kind=None):
+    """Pre-built reports ('month' / 'week' / all), newest first"""
+    return report_scheduler.reports(kind)
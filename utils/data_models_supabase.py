@@ -6,24 +6,74 @@ from pathlib import Path
 import os
 import calendar
 import json
-from utils.supabase_client import supabase_manager
+from utils.supabase_client import supabase_manager, run_concurrently
+from utils.supabase_offline import get_offline_store
+from utils.attendance_analytics import counts_frame, class_trends
+
+# Columns of the attendance_records table (see database_schema.sql)
+ATTENDANCE_FIELDS = {'id', 'student_id', 'class', 'date', 'status', 'notes', 'timestamp', 'created_at'}
+
+class AttendanceRecordsView:
+    """Stands in for st.session_state.attendance_records without loading the whole history:
+    len() is a server-side count and iteration streams the records page by page
+    (from the local replica while offline)"""
+
+    def __len__(self):
+        return _aggregate_reader('attendance_records').count_attendance_records()
+
+    def __iter__(self):
+        offline = get_offline_store()
+        reader = offline.reader('attendance_records')
+        for page in reader.iter_attendance_records():
+            if reader is supabase_manager:
+                offline.remember('attendance_records', page)
+            yield from page
+
+def _reader(table):
+    """supabase_manager, or the local replica while offline / while writes are queued"""
+    return get_offline_store().reader(table)
+
+def _aggregate_reader(table):
+    """supabase_manager for counts and summaries, or the local replica while offline / while writes are queued"""
+    return get_offline_store().aggregate_reader(table)
+
+def _remember(table, rows, **scope):
+    """Keep the local replica in step with rows read from Supabase"""
+    try:
+        get_offline_store().remember(table, rows, **scope)
+    except Exception as e:
+        print(f"Error updating local replica of {table}: {e}")
+
+def _attendance_frame(layout, **filters):
+    """Report DataFrame built page by page: layout maps output column -> record field.
+    Only the fields the report needs are fetched; missing fields become ''."""
+    fields = sorted({field for field in layout.values()} & ATTENDANCE_FIELDS)
+    chunks = []
+    for page in _reader('attendance_records').iter_attendance_records(columns=','.join(fields), **filters):
+        chunk = pd.DataFrame(page)
+        chunks.append(pd.DataFrame({
+            column: chunk[field] if field in chunk.columns else ''
+            for column, field in layout.items()
+        }))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
 
 # Initialize session state with Supabase
 def initialize_session_state():
     """Initialize all session state variables with Supabase"""
-    # Check if Supabase is connected - if not, fallback to sensible defaults so the
-    # rest of the app can still run (UI will show warnings). This mirrors the
-    # behaviour in the local data_models module where defaults are always set.
+    # If Supabase is not reachable, reads come from the local replica and writes
+    # queue in the outbox until the connection returns
     if not supabase_manager.is_connected():
-        st.warning("⚠️ Supabase not connected - working in offline/local mode. Some features will be limited.")
-        # Ensure session keys exist so the app doesn't crash
-        st.session_state.students_df = st.session_state.get('students_df', pd.DataFrame())
-        st.session_state.attendance_records = st.session_state.get('attendance_records', [])
-    else:
-        # Load students from Supabase
-        st.session_state.students_df = supabase_manager.get_students()
-        # Load attendance records from Supabase
-        st.session_state.attendance_records = supabase_manager.get_attendance_records()
+        pending = get_offline_store().outbox.pending_count()
+        st.warning(
+            "⚠️ Supabase not connected - working from the local copy. "
+            f"Changes are saved locally and will sync when the connection returns ({pending} waiting)."
+        )
+    
+    st.session_state.students_df = get_class_students(None)
+    # Attendance history is streamed on demand instead of loaded up front
+    st.session_state.attendance_records = AttendanceRecordsView()
     
     # Define classes
     if 'classes' not in st.session_state:
@@ -44,7 +94,7 @@ def initialize_session_state():
         st.session_state.daily_notes = {}
     
     if 'teachers' not in st.session_state:
-        st.session_state.teachers = supabase_manager.get_teachers()
+        st.session_state.teachers = get_teachers()
     
     if 'duties' not in st.session_state:
         st.session_state.duties = {}
@@ -53,9 +103,9 @@ def initialize_session_state():
         st.session_state.marksheets = {}
 
 def save_attendance(attendance_data):
-    """Save attendance records to Supabase"""
+    """Save attendance records (locally at once, synced to Supabase in the background)"""
     if not attendance_data:
-        return
+        return True
     
     # Convert to the format expected by Supabase
     records = []
@@ -80,19 +130,26 @@ def save_attendance(attendance_data):
             'timestamp': datetime.now().isoformat()
         })
     
-    # Save to Supabase
-    success = supabase_manager.save_attendance_records(records)
-    if success:
-        # Update session state
-        if 'attendance_records' not in st.session_state:
-            st.session_state.attendance_records = []
-        st.session_state.attendance_records.extend(records)
-    else:
-        st.error("Failed to save attendance records to Supabase")
+    get_offline_store().write('attendance_records', 'upsert', records, on_conflict='student_id,date')
+    return True
 
 def get_class_attendance_summary(class_name, selected_date):
     """Get attendance summary for a specific class and date"""
-    return supabase_manager.get_attendance_summary(class_name, selected_date)
+    return _aggregate_reader('attendance_records').get_attendance_summary(class_name, selected_date)
+
+def get_class_day_sheet(class_name, selected_date):
+    """Saved roll call for a class on a date: {student_id: (status, notes)}"""
+    sheet = {}
+    for page in _reader('attendance_records').iter_attendance_records(
+        class_name, selected_date, selected_date, columns='student_id,status,notes'
+    ):
+        for row in page:
+            sheet[row['student_id']] = (row['status'], row.get('notes') or '')
+    return sheet
+
+def get_school_attendance_summary(selected_date):
+    """Get attendance summaries for all classes on a date in one request"""
+    return _aggregate_reader('attendance_records').get_school_attendance_summary(selected_date)
 
 def get_class_color(class_name):
     """Return blue and lemon color palette based on class name"""
@@ -118,11 +175,20 @@ def get_class_color(class_name):
 
 def send_class_notification(class_name, message, message_type="info"):
     """Send notification to a specific class"""
-    return supabase_manager.send_class_notification(class_name, message, message_type)
+    get_offline_store().write('class_notifications', 'insert', [{
+        'class_name': class_name,
+        'message': message,
+        'message_type': message_type,
+        'is_read': False
+    }])
+    return True
 
 def get_class_notifications(class_name):
     """Get notifications for a specific class"""
-    raw = supabase_manager.get_class_notifications(class_name)
+    reader = _reader('class_notifications')
+    raw = reader.get_class_notifications(class_name)
+    if reader is supabase_manager:
+        _remember('class_notifications', raw, class_name=class_name)
     # Normalize notification shape so the rest of the app (which expects keys
     # like 'read' and 'timestamp') can consume this uniformly.
     normalized = []
@@ -144,53 +210,36 @@ def mark_notification_read(class_name, index):
     notifications = get_class_notifications(class_name)
     if index < len(notifications):
         notification_id = notifications[index]['id']
-        return supabase_manager.mark_notification_read(notification_id)
+        if notification_id is None:
+            return False  # not on the server yet
+        get_offline_store().write('class_notifications', 'update', {'is_read': True}, match={'id': notification_id})
+        return True
     return False
 
 def get_attendance_report(class_name, start_date, end_date):
     """Generate attendance report for a class"""
-    records = supabase_manager.get_attendance_records(class_name, start_date, end_date)
-    
-    if not records:
-        return pd.DataFrame()
-    
-    # Create report dataframe
-    report_data = []
-    for record in records:
-        report_data.append({
-            'Date': record['date'],
-            'Student ID': record['student_id'],
-            'Student Name': record.get('name', ''),
-            'Roll Number': record.get('roll_number', ''),
-            'Status': record['status'],
-            'Notes': record.get('notes', ''),
-            'Timestamp': record.get('timestamp', ''),
-            'Class': record['class']
-        })
-    
-    return pd.DataFrame(report_data)
+    return _attendance_frame({
+        'Date': 'date',
+        'Student ID': 'student_id',
+        'Student Name': 'name',
+        'Roll Number': 'roll_number',
+        'Status': 'status',
+        'Notes': 'notes',
+        'Timestamp': 'timestamp',
+        'Class': 'class'
+    }, class_name=class_name, start_date=start_date, end_date=end_date)
 
 def get_all_classes_report(start_date, end_date):
     """Generate report for all classes"""
-    records = supabase_manager.get_attendance_records(None, start_date, end_date)
-    
-    if not records:
-        return pd.DataFrame()
-    
-    # Create comprehensive report
-    report_data = []
-    for record in records:
-        report_data.append({
-            'Date': record['date'],
-            'Class': record['class'],
-            'Student ID': record['student_id'],
-            'Student Name': record.get('name', ''),
-            'Roll Number': record.get('roll_number', ''),
-            'Status': record['status'],
-            'Notes': record.get('notes', '')
-        })
-    
-    return pd.DataFrame(report_data)
+    return _attendance_frame({
+        'Date': 'date',
+        'Class': 'class',
+        'Student ID': 'student_id',
+        'Student Name': 'name',
+        'Roll Number': 'roll_number',
+        'Status': 'status',
+        'Notes': 'notes'
+    }, start_date=start_date, end_date=end_date)
 
 def update_attendance_from_list(records_list):
     """Update session attendance records from a list of record dicts (admin edits)"""
@@ -211,12 +260,12 @@ def update_attendance_from_list(records_list):
                         r['date'] = date.today().isoformat()
             normalized.append(r)
 
-        # Save to Supabase
-        success = supabase_manager.save_attendance_records(normalized)
-        if success:
-            # Update session state
-            st.session_state.attendance_records = supabase_manager.get_attendance_records()
-        return success
+        records = [
+            {key: r.get(key) for key in ('student_id', 'class', 'date', 'status', 'notes', 'timestamp') if key in r}
+            for r in normalized
+        ]
+        get_offline_store().write('attendance_records', 'upsert', records, on_conflict='student_id,date')
+        return True
     except Exception as e:
         print(f"Error updating attendance records: {e}")
         return False
@@ -224,8 +273,12 @@ def update_attendance_from_list(records_list):
 # STUDENT MANAGEMENT FUNCTIONS
 
 def get_class_students(class_name):
-    """Get students for a specific class"""
-    return supabase_manager.get_students(class_name)
+    """Get students for a specific class (all students when class_name is None)"""
+    reader = _reader('students')
+    students = reader.get_students(class_name)
+    if reader is supabase_manager and not students.empty:
+        _remember('students', students.to_dict('records'), **({'class': class_name} if class_name else {}))
+    return students
 
 def add_student_to_class(class_name, student_data):
     """Add a new student to a class"""
@@ -246,8 +299,9 @@ def add_student_to_class(class_name, student_data):
         # Add to Supabase
         success = supabase_manager.add_student(new_student)
         if success:
+            get_offline_store().sync.sync('students', force=True)
             # Update session state
-            st.session_state.students_df = supabase_manager.get_students()
+            st.session_state.students_df = get_class_students(None)
         return success
     except Exception as e:
         print(f"Error adding student: {e}")
@@ -257,52 +311,60 @@ def update_student(student_id, updated_data):
     """Update student information"""
     success = supabase_manager.update_student(student_id, updated_data)
     if success:
+        get_offline_store().sync.sync('students', force=True)
         # Update session state
-        st.session_state.students_df = supabase_manager.get_students()
+        st.session_state.students_df = get_class_students(None)
     return success
 
 def remove_student(student_id):
     """Remove a student from class"""
     success = supabase_manager.delete_student(student_id)
     if success:
+        get_offline_store().replica.forget_student(student_id)
         # Update session state
-        st.session_state.students_df = supabase_manager.get_students()
+        st.session_state.students_df = get_class_students(None)
     return success
 
 # TEACHER MANAGEMENT FUNCTIONS
 
 def get_teachers(teacher_type=None):
     """Return list of teachers, optionally filtered by type"""
-    teachers = supabase_manager.get_teachers(teacher_type)
+    reader = _reader('teachers')
+    teachers = reader.get_teachers(teacher_type)
+    if reader is supabase_manager and teachers:
+        _remember('teachers', teachers, **({'type': teacher_type} if teacher_type else {}))
     return teachers
 
 def add_teacher(teacher):
     """Add a teacher record"""
     teacher_id = supabase_manager.add_teacher(teacher)
     if teacher_id:
+        get_offline_store().sync.sync('teachers', force=True)
         # Update session state
-        st.session_state.teachers = supabase_manager.get_teachers()
+        st.session_state.teachers = get_teachers()
     return teacher_id
 
 def update_teacher(teacher_id, updates):
     """Update teacher fields by id"""
     success = supabase_manager.update_teacher(teacher_id, updates)
     if success:
+        get_offline_store().sync.sync('teachers', force=True)
         # Update session state
-        st.session_state.teachers = supabase_manager.get_teachers()
+        st.session_state.teachers = get_teachers()
     return success
 
 def remove_teacher(teacher_id):
     """Remove teacher by id"""
     success = supabase_manager.delete_teacher(teacher_id)
     if success:
+        get_offline_store().replica.forget_teacher(teacher_id)
         # Update session state
-        st.session_state.teachers = supabase_manager.get_teachers()
+        st.session_state.teachers = get_teachers()
     return success
 
 def get_teacher_by_id(teacher_id):
     """Get teacher by ID"""
-    teachers = supabase_manager.get_teachers()
+    teachers = get_teachers()
     for teacher in teachers:
         if teacher.get('id') == teacher_id:
             return teacher
@@ -318,7 +380,8 @@ def assign_duty(date_key, time_slot, teacher_id, role):
         'teacher_id': teacher_id,
         'role': role
     }
-    return supabase_manager.assign_duty(duty_data)
+    get_offline_store().write('duties', 'insert', [duty_data])
+    return True
 
 def remove_duty(date_key, teacher_id, time_slot=None, role=None):
     """Remove duty assignment"""
@@ -338,17 +401,32 @@ def remove_duty(date_key, teacher_id, time_slot=None, role=None):
 
 def get_duties_for_date(date_key):
     """Get duties for a specific date"""
-    return supabase_manager.get_duties_for_date(date_key)
+    reader = _reader('duties')
+    duties = reader.get_duties_for_date(date_key)
+    if reader is supabase_manager:
+        _remember('duties', duties, date=date_key)
+    return duties
 
 # DAILY NOTES FUNCTIONS
 
 def save_daily_note(class_name, date, note_text):
     """Save daily note for a class"""
-    return supabase_manager.save_daily_note(class_name, date, note_text)
+    get_offline_store().write('daily_notes', 'upsert', [{
+        'class': class_name,
+        'date': date.isoformat(),
+        'text': note_text,
+        'last_updated': datetime.now().isoformat()
+    }], on_conflict='class,date')
+    return True
 
 def get_daily_note(class_name, date):
     """Get daily note for a class and date"""
-    return supabase_manager.get_daily_note(class_name, date)
+    reader = _reader('daily_notes')
+    text = reader.get_daily_note(class_name, date)
+    if reader is supabase_manager and text:
+        _remember('daily_notes', [{'class': class_name, 'date': date.isoformat(), 'text': text}],
+                  **{'class': class_name, 'date': date})
+    return text
 
 def get_note_last_updated(class_name, date):
     """Get when the note was last updated"""
@@ -360,15 +438,22 @@ def get_note_last_updated(class_name, date):
 
 def get_class_timetable(class_name):
     """Get timetable for a class"""
-    return supabase_manager.get_class_timetable(class_name)
+    reader = _reader('class_timetables')
+    timetable = reader.get_class_timetable(class_name)
+    if reader is supabase_manager and timetable:
+        _remember('class_timetables', [
+            {'class_name': class_name, 'day': day, 'periods': periods} for day, periods in timetable.items()
+        ], class_name=class_name)
+    return timetable
 
 def save_class_timetable(class_name, timetable_data):
     """Save timetable for a class"""
-    success = supabase_manager.save_class_timetable(class_name, timetable_data)
-    if success:
-        # Update session state
-        st.session_state.class_timetables[class_name] = timetable_data
-    return success
+    get_offline_store().write('class_timetables', 'upsert', [
+        {'class_name': class_name, 'day': day, 'periods': periods} for day, periods in timetable_data.items()
+    ], on_conflict='class_name,day')
+    # Update session state
+    st.session_state.class_timetables[class_name] = timetable_data
+    return True
 
 # ENHANCED ANALYTICS FUNCTIONS
 
@@ -377,32 +462,29 @@ def get_student_attendance_history(student_id, days=30):
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
     
-    records = supabase_manager.get_attendance_records(None, start_date, end_date)
-    student_records = [r for r in records if r['student_id'] == student_id]
-    
-    return pd.DataFrame(student_records) if student_records else pd.DataFrame()
+    chunks = [
+        pd.DataFrame(page)
+        for page in _reader('attendance_records').iter_attendance_records(
+            start_date=start_date, end_date=end_date, student_id=student_id
+        )
+    ]
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
 
 def get_class_attendance_trends(class_name, days=30):
     """Get attendance trends for a class"""
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
     
-    records = supabase_manager.get_attendance_records(class_name, start_date, end_date)
+    # Counts per date/status are aggregated server-side; only a few rows per day come back
+    by_date = {}
+    for row in _aggregate_reader('attendance_records').get_attendance_status_counts(start_date, end_date, class_name):
+        by_date.setdefault(row['attendance_date'], {})[row['status']] = row['record_count']
     
-    if not records:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(records)
-    df['date'] = pd.to_datetime(df['date'])
-    daily_summary = df.groupby('date').agg({
-        'status': lambda x: (x == 'P').sum() / len(x) * 100
-    }).rename(columns={'status': 'attendance_rate'})
-    
-    return daily_summary
+    return class_trends(counts_frame(sorted(by_date.items())))
 
 def search_students(query, class_name=None):
     """Search students by name or roll number"""
-    students = supabase_manager.get_students(class_name)
+    students = get_class_students(class_name)
     
     if not query.strip():
         return students
@@ -412,6 +494,29 @@ def search_students(query, class_name=None):
     
     return students[mask]
 
+# CONCURRENT PAGE LOADS
+
+def load_school_overview(selected_date):
+    """Everything the welcome screen reads, fetched at the same time:
+    {'school_summary', 'duties', 'teachers'}"""
+    return run_concurrently({
+        'school_summary': (get_school_attendance_summary, selected_date),
+        'duties': (get_duties_for_date, selected_date),
+        'teachers': (get_teachers,)
+    })
+
+def prefetch_class_view(class_name, selected_date):
+    """Fetch what the class view and its sidebar read, at the same time.
+    The results land in the query cache / local replica, so the view's own calls
+    return without another round trip; they are also returned as a dict."""
+    return run_concurrently({
+        'students': (get_class_students, class_name),
+        'summary': (get_class_attendance_summary, class_name, selected_date),
+        'timetable': (get_class_timetable, class_name),
+        'daily_note': (get_daily_note, class_name, selected_date),
+        'notifications': (get_class_notifications, class_name)
+    })
+
 # BIS NOC SPECIFIC FUNCTIONS
 
 def get_live_timetable_status(class_name):
@@ -0,0 +1,108 @@
+# utils/downloads.py
+"""File downloads through st.download_button.
+
+The file is served from Streamlit's media endpoint when the button is clicked,
+instead of being base64-encoded into a data: link that is sent with the page
+on every rerun. Data can be bytes, a callable producing them or an iterable of
+byte chunks, optionally gzipped. The payload is built when the button is drawn,
+on every run that draws it, not when it is clicked.
+
+Exports shown after a button press use export_button: clicking a download
+button reruns the script, which resets st.button, so the request is kept in
+st.session_state until its download button is used.
+"""
+import gzip
+import io
+
+import streamlit as st
+
+from utils.excel_reports import xlsx_bytes
+
+# Rows rendered to CSV at a time
+CSV_CHUNK_ROWS = 5000
+
+CSV_MIME = 'text/csv'
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+GZIP_MIME = 'application/gzip'
+
+
+def csv_chunks(df, chunk_rows=CSV_CHUNK_ROWS, encoding='utf-8', **to_csv_kwargs):
+    """Yield a DataFrame as encoded CSV, chunk_rows rows at a time (header in the first chunk)"""
+    to_csv_kwargs.setdefault('index', False)
+    # utf-8-sig only prefixes the BOM once, in the first chunk
+    later_encoding = 'utf-8' if encoding == 'utf-8-sig' else encoding
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].to_csv(header=start == 0, **to_csv_kwargs)
+        yield chunk.encode(encoding if start == 0 else later_encoding)
+
+
+def collect(chunks, compress=False):
+    """Join byte chunks into one payload, gzipping them as they arrive when compress is set"""
+    buffer = io.BytesIO()
+    if compress:
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as gz:
+            for chunk in chunks:
+                gz.write(chunk)
+    else:
+        for chunk in chunks:
+            buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def export_button(label, key, params=(), **kwargs):
+    """st.button that requests an export, kept requested across reruns.
+
+    Returns True from the click until a download button passed ``export=key`` is
+    used, or until ``params`` (the export's inputs) change.
+    """
+    state_key = f"export_{key}"
+    if st.button(label, key=key, **kwargs):
+        st.session_state[state_key] = params
+    return state_key in st.session_state and st.session_state[state_key] == params
+
+
+def finish_export(key):
+    """Forget an export requested with export_button"""
+    st.session_state.pop(f"export_{key}", None)
+
+
+def download_button(label, data, file_name, mime='application/octet-stream', compress=False, key=None,
+                    export=None, **kwargs):
+    """st.download_button for bytes/str, a callable returning them, or an iterable of byte chunks.
+
+    The payload is built now, while the button is drawn. compress gzips it and
+    adds .gz to the file name. export names the export_button request that
+    using this button completes.
+    """
+    if export is not None:
+        kwargs.update(on_click=finish_export, args=(export,))
+    if callable(data):
+        data = data()
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if isinstance(data, (bytes, bytearray)):
+        data = gzip.compress(data) if compress else bytes(data)
+    else:
+        data = collect(data, compress)
+
+    if compress:
+        file_name = f"{file_name}.gz"
+        mime = GZIP_MIME
+    return st.download_button(label, data, file_name=file_name, mime=mime, key=key, **kwargs)
+
+
+def csv_download_button(label, df, file_name, compress=False, key=None, encoding='utf-8', export=None,
+                        **to_csv_kwargs):
+    """Download button for a DataFrame as CSV, rendered in chunks"""
+    return download_button(
+        label, csv_chunks(df, encoding=encoding, **to_csv_kwargs), file_name,
+        mime=CSV_MIME, compress=compress, key=key, export=export
+    )
+
+
+def xlsx_download_button(label, write, file_name, *args, key=None, export=None, **kwargs):
+    """Download button for a workbook produced by an excel_reports writer (write_xlsx /
+    write_attendance_workbook) called with *args and **kwargs"""
+    return download_button(
+        label, lambda: xlsx_bytes(write, *args, **kwargs), file_name, mime=XLSX_MIME, key=key, export=export
+    )
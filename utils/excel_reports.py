@@ -3,12 +3,37 @@ import streamlit as st
 import pandas as pd
 import datetime
 import calendar
+import os
+import re
+import tempfile
+import xlsxwriter
 
-def display_excel_like_table(monthly_data, class_name, month_year):
-    """Display attendance data in Excel-like format"""
+# Totals columns of the grid, in template order
+GRID_STATUSES = ['P', 'A', 'L', 'AP']
+
+# Highlighting of attendance marks in exported workbooks
+XLSX_STATUS_FORMATS = {
+    'A': {'bg_color': '#FFC7CE', 'font_color': '#9C0006'},
+    'L': {'bg_color': '#FFEB9C', 'font_color': '#9C5700'}
+}
+
+# Columns of the per-class summary sheet in attendance workbooks
+SUMMARY_COLUMNS = ['Class', 'Records', 'P', 'L', 'A', 'AP', 'Attendance Rate (%)']
+
+# Report headers (get_attendance_report) -> record fields
+GRID_RECORD_COLUMNS = {
+    'Date': 'date',
+    'Student ID': 'student_id',
+    'Student Name': 'name',
+    'Status': 'status',
+    'Class': 'class'
+}
+
+def display_excel_like_table(monthly_data, class_name, month_year=None, start_date=None, end_date=None):
+    """Display attendance data in Excel-like format (for a "Month YYYY" or a date range)"""
     
     # Create DataFrame matching your template structure
-    excel_df = create_excel_format_dataframe(monthly_data, month_year)
+    excel_df = create_excel_format_dataframe(monthly_data, month_year, start_date, end_date)
     
     if excel_df.empty:
         st.info("No data available to display.")
@@ -42,64 +67,259 @@ def display_excel_like_table(monthly_data, class_name, month_year):
         with col4:
             st.metric("Absent with Permission (AP)", int(ap_total))
 
-def create_excel_format_dataframe(monthly_data, month_year):
-    """Convert monthly data to Excel template format"""
-    if not monthly_data:
+def month_range(month_year):
+    """(first day, last day) of a "Month YYYY" string such as "October 2025" """
+    month = datetime.datetime.strptime(month_year, "%B %Y")
+    num_days = calendar.monthrange(month.year, month.month)[1]
+    return month.date(), datetime.date(month.year, month.month, num_days)
+
+def _normalize_records(records):
+    """DataFrame of records with report headers ('Student Name', ...) mapped to record fields"""
+    df = pd.DataFrame(records)
+    return df.rename(columns={k: v for k, v in GRID_RECORD_COLUMNS.items() if k in df.columns})
+
+def build_attendance_grid(records, start_date, end_date, roster=None):
+    """Student x day attendance matrix plus P/A/L/AP totals for [start_date, end_date].
+    
+    records: attendance records (dicts or a DataFrame) with date, status and
+    student_id or name; report frames with 'Date', 'Student Name'... also work.
+    Students are keyed by student_id when present, otherwise by name.
+    roster: optional students (same key) to list first and in that order, even
+    without records. A 'Class' column is added when records span several classes.
+    """
+    df = _normalize_records(records)
+    if df.empty and roster is None:
         return pd.DataFrame()
+    roster = _normalize_records(roster) if roster is not None else None
+    key_columns = roster.columns if df.empty else df.columns
+    key = 'student_id' if 'student_id' in key_columns else 'name'
+    days = pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq='D')
     
-    # Parse month and year
-    try:
-        month_str, year_str = month_year.split(' ')
-        month_num = datetime.datetime.strptime(month_str, "%B").month
-        year = int(year_str)
-    except ValueError:
-        st.error("Invalid month format")
+    if df.empty:
+        df = pd.DataFrame(columns=list(dict.fromkeys([key, 'name', 'date', 'status'])))
+    else:
+        if roster is not None:
+            # Roster and records may come from different stores (int vs str ids)
+            df[key] = df[key].astype(str)
+            roster[key] = roster[key].astype(str)
+        df['date'] = pd.to_datetime(df['date']).dt.normalize()
+        df['status'] = df['status'].astype(str).str.strip()
+        df = df[df['date'].between(days[0], days[-1])]
+        # One mark per student and day: the latest record wins
+        df = df.drop_duplicates([key, 'date'], keep='last')
+    
+    info_columns = [c for c in ('name', 'class') if c in df.columns and c != key]
+    students = df.drop_duplicates(key)[[key] + info_columns]
+    if roster is not None:
+        students = pd.concat([roster, students]).drop_duplicates(key)
+    elif 'class' in students.columns:
+        students = students.sort_values(['class', 'name'] if 'name' in students.columns else ['class'])
+    if students.empty:
         return pd.DataFrame()
+    order = pd.Index(students[key])
     
-    # Get number of days in month
-    num_days = calendar.monthrange(year, month_num)[1]
+    # Day headers like "7\nTu" (or "07 Oct\nTu" when the range spans months)
+    if (days[0].year, days[0].month) == (days[-1].year, days[-1].month):
+        labels = days.day.astype(str)
+    else:
+        labels = days.strftime('%d %b')
+    headers = labels + '\n' + days.strftime('%a').str[:2]
     
-    # Create columns structure matching your template
-    columns = ['Student Name']
+    if df.empty:
+        matrix = pd.DataFrame('', index=order, columns=days)
+        totals = pd.DataFrame(0, index=order, columns=GRID_STATUSES)
+    else:
+        matrix = df.pivot(index=key, columns='date', values='status').reindex(index=order, columns=days).fillna('')
+        totals = pd.crosstab(df[key], df['status']).reindex(index=order, columns=GRID_STATUSES, fill_value=0)
+    matrix.columns = headers
     
-    # Add day columns (1-31) with day-of-week headers
-    for day in range(1, num_days + 1):
-        date_obj = datetime.date(year, month_num, day)
-        day_name = date_obj.strftime('%a')[:2]  # Mo, Tu, We, etc.
-        columns.append(f"{day}\n{day_name}")
+    students = students.set_index(key).reindex(order)
+    names = students['name'] if 'name' in students.columns else pd.Series(order, index=order)
+    grid = pd.concat([names.rename('Student Name'), matrix, totals.astype(int)], axis=1)
+    if 'class' in students.columns and students['class'].nunique() > 1:
+        grid.insert(0, 'Class', students['class'])
+    return grid.reset_index(drop=True)
+
+def create_excel_format_dataframe(monthly_data, month_year=None, start_date=None, end_date=None):
+    """Convert monthly data ([{'name', 'attendance': {date_str: status}}]) to Excel template format.
+    Pass month_year ("October 2025") or start_date/end_date."""
+    if not monthly_data:
+        return pd.DataFrame()
     
-    # Add totals columns
-    columns.extend(['P', 'A', 'L', 'AP'])
+    if month_year:
+        try:
+            start_date, end_date = month_range(month_year)
+        except ValueError:
+            st.error("Invalid month format")
+            return pd.DataFrame()
     
-    # Create DataFrame with these columns
-    df = pd.DataFrame(columns=columns)
+    # Key students by id when every entry has one, otherwise by position, so
+    # two students with the same name stay on separate rows
+    ids = [student.get('student_id', student.get('id')) for student in monthly_data]
+    if any(student_id is None for student_id in ids):
+        ids = list(range(len(monthly_data)))
+    records = [
+        {'student_id': student_id, 'name': student['name'], 'date': date_str, 'status': status}
+        for student_id, student in zip(ids, monthly_data)
+        for date_str, status in student['attendance'].items()
+    ]
+    roster = pd.DataFrame({'student_id': ids, 'name': [student['name'] for student in monthly_data]})
+    return build_attendance_grid(
+        pd.DataFrame(records, columns=['student_id', 'name', 'date', 'status']), start_date, end_date, roster
+    )
+
+# STREAMING XLSX EXPORT
+
+def _sheet_name(name, used):
+    """Valid, unique worksheet name (max 31 chars, no []:*?/\\)"""
+    base = re.sub(r'[\[\]:*?/\\]', '-', str(name)).strip()[:31] or 'Sheet'
+    candidate, n = base, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate, n = base[:31 - len(suffix)] + suffix, n + 1
+    used.add(candidate.lower())
+    return candidate
+
+class _StreamingSheet:
+    """One worksheet written top to bottom (as constant_memory mode requires)"""
+
+    def __init__(self, workbook, formats, name, columns):
+        self.worksheet = workbook.add_worksheet(name)
+        self.formats = formats
+        self.columns = list(columns)
+        self.row = 1
+        for col, header in enumerate(self.columns):
+            self.worksheet.set_column(col, col, max(len(str(header)) + 2, 10))
+            self.worksheet.write_string(0, col, str(header), formats['header'])
+        self.worksheet.freeze_panes(1, 0)
+
+    def append(self, values):
+        for col, value in enumerate(values):
+            if value is None or (isinstance(value, float) and value != value):
+                continue  # NaN / None -> blank cell
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                self.worksheet.write_datetime(self.row, col, value, self.formats['date'])
+            elif hasattr(value, 'item'):  # numpy scalar
+                self.worksheet.write(self.row, col, value.item())
+            else:
+                self.worksheet.write(self.row, col, value)
+        self.row += 1
+
+    def finish(self):
+        """Highlight A/L marks and add filters once the row count is known"""
+        last_row, last_col = self.row - 1, len(self.columns) - 1
+        if last_row < 1 or last_col < 0:
+            return
+        for status in XLSX_STATUS_FORMATS:
+            self.worksheet.conditional_format(1, 0, last_row, last_col, {
+                'type': 'cell', 'criteria': '==', 'value': f'"{status}"', 'format': self.formats[status]
+            })
+        self.worksheet.autofilter(0, 0, last_row, last_col)
+
+def _open_workbook(path):
+    workbook = xlsxwriter.Workbook(str(path), {'constant_memory': True})
+    formats = {
+        'header': workbook.add_format({'bold': True, 'bg_color': '#1976D2', 'font_color': '#FFFFFF'}),
+        'date': workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    }
+    for status, fmt in XLSX_STATUS_FORMATS.items():
+        formats[status] = workbook.add_format(fmt)
+    return workbook, formats
+
+def _iter_rows(rows):
+    """Rows as value sequences from a DataFrame or any iterable of sequences"""
+    if isinstance(rows, pd.DataFrame):
+        return rows.itertuples(index=False, name=None)
+    return rows
+
+def write_xlsx(path, sheets):
+    """Write sheets, given as (name, columns, rows), to an .xlsx file one row at a time.
     
-    # Fill with student data
-    for student_data in monthly_data:
-        student_row = [student_data['name']]
-        
-        # Initialize counters
-        p_count, a_count, l_count, ap_count = 0, 0, 0, 0
-        
-        # Add daily attendance
-        for day in range(1, num_days + 1):
-            date_str = datetime.date(year, month_num, day).strftime('%Y-%m-%d')
-            status = student_data['attendance'].get(date_str, '')
-            student_row.append(status)
-            
-            # Count statuses
-            if status == 'P':
-                p_count += 1
-            elif status == 'A':
-                a_count += 1
-            elif status == 'L':
-                l_count += 1
-            elif status == 'AP':
-                ap_count += 1
+    xlsxwriter's constant_memory mode flushes every finished row to disk, so
+    memory stays flat however many rows the sheets have; rows may be a
+    DataFrame or any iterable (e.g. a generator) of value sequences.
+    Returns {sheet name: number of data rows}.
+    """
+    workbook, formats = _open_workbook(path)
+    used, counts = set(), {}
+    try:
+        for name, columns, rows in sheets:
+            sheet = _StreamingSheet(workbook, formats, _sheet_name(name, used), columns)
+            for values in _iter_rows(rows):
+                sheet.append(values)
+            sheet.finish()
+            counts[sheet.worksheet.name] = sheet.row - 1
+    finally:
+        workbook.close()
+    return counts
+
+def write_attendance_workbook(path, records, classes=None):
+    """School attendance workbook: a Summary sheet, then one sheet per class.
+    
+    records: report rows (a DataFrame such as get_all_classes_report returns, or
+    an iterable of dicts) with a 'Class' and a 'Status' column, in any order.
+    Rows are routed to their class sheet as they arrive and only per-class
+    counters are kept, so memory does not grow with the number of records.
+    classes fixes the Summary order and, for a DataFrame, the class sheet order
+    (otherwise sheets follow the order of first appearance).
+    """
+    sheet_order = []
+    if isinstance(records, pd.DataFrame):
+        frame_columns = list(records.columns)
+        if classes and 'Class' in records.columns:
+            present = set(records['Class'])
+            sheet_order = [class_name for class_name in classes if class_name in present]
+        records = (dict(zip(frame_columns, values)) for values in records.itertuples(index=False, name=None))
+
+    workbook, formats = _open_workbook(path)
+    used = set()
+    try:
+        summary = _StreamingSheet(workbook, formats, _sheet_name('Summary', used), SUMMARY_COLUMNS)
+        sheets, counts = {}, {}
+        for class_name in classes or []:
+            counts[class_name] = dict.fromkeys(GRID_STATUSES, 0)
+        # Worksheets appear in creation order, so create the known ones up front
+        for class_name in sheet_order:
+            sheet_columns = [c for c in frame_columns if c != 'Class']
+            sheets[class_name] = _StreamingSheet(workbook, formats, _sheet_name(class_name, used), sheet_columns)
         
-        # Add totals
-        student_row.extend([p_count, a_count, l_count, ap_count])
+        for record in records:
+            class_name = record.get('Class', '')
+            sheet = sheets.get(class_name)
+            if sheet is None:
+                sheet_columns = [c for c in record if c != 'Class']
+                sheet = sheets[class_name] = _StreamingSheet(
+                    workbook, formats, _sheet_name(class_name, used), sheet_columns
+                )
+            sheet.append([record.get(c) for c in sheet.columns])
+            status_counts = counts.setdefault(class_name, dict.fromkeys(GRID_STATUSES, 0))
+            status = str(record.get('Status', '')).strip()
+            status_counts[status] = status_counts.get(status, 0) + 1
         
-        df.loc[len(df)] = student_row
-    
-    return df
\ No newline at end of file
+        for class_name, status_counts in counts.items():
+            total = sum(status_counts.values())
+            present = status_counts.get('P', 0) + status_counts.get('L', 0)
+            summary.append([
+                class_name, total,
+                status_counts.get('P', 0), status_counts.get('L', 0),
+                status_counts.get('A', 0), status_counts.get('AP', 0),
+                round(present / total * 100, 1) if total else 0
+            ])
+        summary.finish()
+        for sheet in sheets.values():
+            sheet.finish()
+    finally:
+        workbook.close()
+    return path
+
+def xlsx_bytes(write, *args, **kwargs):
+    """Run a writer (write_xlsx / write_attendance_workbook) into a temporary file and
+    return the finished workbook's bytes"""
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        write(path, *args, **kwargs)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
@@ -0,0 +1,119 @@
+# utils/file_persistence.py
+"""Cross-process safe persistence helpers for the data/ directory.
+
+- file_lock(path): advisory lock shared by threads and worker processes
+- atomic_write(path, write_fn): write to a temp file, fsync, then rename over the target
+- merge_keyed(base, ours, theirs): three-way merge of keyed rows on write conflicts
+"""
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_registry_lock = threading.Lock()
+_path_locks = {}
+
+
+def _lock_handle(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    else:
+        handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue  # LK_LOCK gives up after ~10s; keep waiting
+
+
+def _unlock_handle(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on ``path`` (via a sibling .lock file).
+
+    Re-entrant within a thread, serializes threads of this process and, through
+    flock/msvcrt, other processes using the same data directory.
+    """
+    key = str(path)
+    with _registry_lock:
+        entry = _path_locks.setdefault(key, {'lock': threading.RLock(), 'depth': 0, 'handle': None})
+    with entry['lock']:
+        if entry['depth'] == 0:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            handle = open(path.with_name(path.name + '.lock'), 'a+')
+            _lock_handle(handle)
+            entry['handle'] = handle
+        entry['depth'] += 1
+        try:
+            yield
+        finally:
+            entry['depth'] -= 1
+            if entry['depth'] == 0:
+                handle = entry['handle']
+                entry['handle'] = None
+                try:
+                    _unlock_handle(handle)
+                finally:
+                    handle.close()
+
+
+def atomic_write(path, write_fn, mode='w', encoding='utf-8'):
+    """Call write_fn(file) on a temp file next to ``path`` and rename it into place"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}_", suffix=path.suffix + ".tmp")
+    try:
+        kwargs = {} if 'b' in mode else {'encoding': encoding, 'newline': ''}
+        with os.fdopen(fd, mode, **kwargs) as f:
+            write_fn(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def fingerprint(value):
+    """Stable string form of a row, used to tell whether it changed"""
+    return json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+
+
+def fingerprints(rows):
+    """{key: fingerprint} for a dict of keyed rows"""
+    return {key: fingerprint(value) for key, value in rows.items()}
+
+
+def merge_keyed(base, ours, theirs):
+    """Three-way merge of keyed rows.
+
+    base:   {key: fingerprint} of the rows as this process last read/wrote them
+    ours:   {key: row} this process wants to save
+    theirs: {key: row} currently on disk (written by someone else meanwhile)
+
+    Rows we did not touch keep their on-disk version; rows we added, changed or
+    deleted win over the disk copy.
+    """
+    merged = dict(theirs)
+    for key in list(ours) + [k for k in base if k not in ours]:
+        if key in ours:
+            if fingerprint(ours[key]) != base.get(key):
+                merged[key] = ours[key]
+        elif key in base:
+            merged.pop(key, None)
+    return merged
@@ -0,0 +1,37 @@
+# utils/fragments.py
+"""Partial reruns (st.fragment) where the installed Streamlit supports them.
+
+A function decorated with ``fragment`` reruns on its own when one of its widgets
+changes, without re-running the header, sidebar and the rest of the page.
+On Streamlit versions without fragments it is a plain function and everything
+behaves as a normal full rerun.
+"""
+import inspect
+
+import streamlit as st
+
+# st.fragment (1.37+), st.experimental_fragment (1.33-1.36) or None
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+
+def fragment(func):
+    """Decorator: run ``func`` as a fragment when supported"""
+    return _fragment(func) if _fragment else func
+
+
+def _rerun_has_scope():
+    try:
+        return 'scope' in inspect.signature(st.rerun).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+# st.rerun(scope="fragment") exists from 1.37; before that st.rerun reruns the whole app
+RERUN_FRAGMENT_SUPPORTED = _fragment is not None and _rerun_has_scope()
+
+
+def rerun_fragment():
+    """Rerun only the enclosing fragment (the whole app where fragments are unavailable)"""
+    if RERUN_FRAGMENT_SUPPORTED:
+        st.rerun(scope="fragment")
+    st.rerun()
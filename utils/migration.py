@@ -0,0 +1,349 @@
+# utils/migration.py
+"""Batched, resumable migration of the data/ CSV/JSON files into Supabase.
+
+Each source is read in chunks of MIGRATION_CHUNK_ROWS rows, split into batches
+of MIGRATION_BATCH_SIZE rows and written by up to MIGRATION_CONCURRENCY worker
+threads. After every fully written chunk the row offset is saved to
+MIGRATION_CHECKPOINT_FILE, so an interrupted run picks up at the last complete
+chunk. Tables with a unique key are upserted, so replaying a chunk is harmless.
+
+Attendance is streamed as well: the base history (CSV chunks or Parquet months)
+first, then the effect of the journal. Only the journal, which compaction keeps
+small, and the base rows it edits are held in memory.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.attendance_journal import read_journal_entries, replay_journal
+from utils.attendance_parquet import list_partitions, read_partition
+from utils.attendance_store import AttendanceStore
+from utils.data_files import (
+    ATTENDANCE_FILE, ATTENDANCE_JOURNAL_FILE, ATTENDANCE_PARQUET_DIR, DATA_DIR, use_parquet_storage
+)
+from utils.file_persistence import atomic_write, file_lock
+from utils.supabase_client import ATTENDANCE_WRITE_COLUMNS, supabase_manager
+
+MIGRATION_CHECKPOINT_FILE = DATA_DIR / "migration_checkpoint.json"
+
+# Files holding the attendance history: base CSV, journal of recent saves, Parquet months
+ATTENDANCE_FILES = ("attendance_records.csv", "attendance_journal.jsonl", "attendance_parquet")
+
+# Rows read from a source file at a time
+MIGRATION_CHUNK_ROWS = 5000
+# Rows per insert/upsert request
+MIGRATION_BATCH_SIZE = 500
+# Requests in flight at once
+MIGRATION_CONCURRENCY = 4
+# Attempts per batch before the source is abandoned (resumable from the checkpoint)
+MIGRATION_RETRIES = 3
+
+
+def _records(chunk):
+    """Row dicts with NaN as None and numpy scalars as plain Python values"""
+    chunk = chunk.astype(object)
+    return chunk.where(pd.notna(chunk), None).to_dict('records')
+
+
+def _csv_chunks(path, chunk_rows):
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        yield _records(chunk)
+
+
+def _split_list(value):
+    if value is None:
+        return []
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+def _day(value):
+    return str(value)[:10]
+
+
+def _base_attendance_chunks(chunk_rows):
+    """The compacted history the app loads: Parquet months in Parquet mode, else the base CSV"""
+    partitions = list_partitions(ATTENDANCE_PARQUET_DIR) if use_parquet_storage() else {}
+    if partitions:
+        for month in sorted(partitions):
+            records = read_partition(ATTENDANCE_PARQUET_DIR, month)
+            for start in range(0, len(records), chunk_rows):
+                yield records[start:start + chunk_rows]
+    elif ATTENDANCE_FILE.exists():
+        yield from _csv_chunks(ATTENDANCE_FILE, chunk_rows)
+
+
+def _attendance_record_chunks(chunk_rows):
+    """Attendance history as the app sees it (base CSV or Parquet, plus the journal),
+    chunk_rows records at a time.
+
+    Base rows of a class and date the journal replaced are skipped, and base rows
+    an admin edit touched are held back; the journal is then replayed over those
+    held rows and its result sent last, so journal rows win as they do in the app.
+    """
+    entries = read_journal_entries(ATTENDANCE_JOURNAL_FILE)
+    replaced, edited = set(), set()
+    for entry in entries:
+        if entry.get('op') == 'replace':
+            replaced.add((str(entry.get('class')), _day(entry.get('date'))))
+        elif entry.get('op') == 'upsert':
+            edited.update(
+                (str(r.get('class')), _day(r.get('date')), str(r.get('student_id')))
+                for r in entry.get('records', [])
+            )
+
+    held = []
+    for records in _base_attendance_chunks(chunk_rows):
+        rows = []
+        for record in records:
+            class_day = (str(record.get('class')), _day(record.get('date')))
+            if class_day in replaced:
+                continue
+            if class_day + (str(record.get('student_id')),) in edited:
+                held.append(dict(record, date=pd.Timestamp(record['date']).date()))
+            else:
+                rows.append(record)
+        if rows:
+            yield _attendance_dates(rows)
+
+    if entries:
+        journal_rows = replay_journal(AttendanceStore(held), entries).to_list()
+        for start in range(0, len(journal_rows), chunk_rows):
+            yield _attendance_dates(journal_rows[start:start + chunk_rows])
+
+
+def _attendance_dates(records):
+    """Records with their date as 'YYYY-MM-DD'"""
+    chunk = pd.DataFrame(records)
+    if 'date' in chunk.columns:
+        chunk['date'] = pd.to_datetime(chunk['date']).dt.strftime('%Y-%m-%d')
+    return _records(chunk)
+
+
+def _students_chunks(chunk_rows):
+    """students.csv, or the distinct students found in the attendance history"""
+    students_file = DATA_DIR / "students.csv"
+    if students_file.exists():
+        yield from _csv_chunks(students_file, chunk_rows)
+        return
+
+    seen = set()
+    for records in _attendance_record_chunks(chunk_rows):
+        students = []
+        for record in records:
+            if record['student_id'] in seen:
+                continue
+            seen.add(record['student_id'])
+            students.append({
+                'id': record['student_id'],
+                'name': record['name'],
+                'roll_number': record['roll_number'],
+                'class': record['class']
+            })
+        yield students
+
+
+def _teachers_chunks(chunk_rows):
+    for records in _csv_chunks(DATA_DIR / "teachers.csv", chunk_rows):
+        for teacher in records:
+            teacher['subjects'] = _split_list(teacher.get('subjects'))
+            teacher['classes'] = _split_list(teacher.get('classes'))
+        yield records
+
+
+def _attendance_chunks(chunk_rows):
+    for records in _attendance_record_chunks(chunk_rows):
+        # One upsert may not touch a (student_id, date) twice: the later row wins,
+        # as it does across chunks, which are written in order
+        rows = {}
+        for record in records:
+            row = {column: record.get(column) for column in ATTENDANCE_WRITE_COLUMNS}
+            if not row.get('timestamp'):
+                del row['timestamp']  # let the column default apply
+            rows[(str(row['student_id']), row['date'])] = row
+        yield list(rows.values())
+
+
+def _timetable_chunks(chunk_rows):
+    with open(DATA_DIR / "class_timetables.json", 'r') as f:
+        timetables = json.load(f)
+    rows = [
+        {'class_name': class_name, 'day': day, 'periods': periods}
+        for class_name, timetable in timetables.items()
+        for day, periods in timetable.items()
+    ]
+    for start in range(0, len(rows), chunk_rows):
+        yield rows[start:start + chunk_rows]
+
+
+def _duties_chunks(chunk_rows):
+    for records in _csv_chunks(DATA_DIR / "duties.csv", chunk_rows):
+        yield [
+            {
+                'date': duty['date'],
+                'time_slot': duty.get('time_slot') or duty.get('time'),
+                'teacher_id': duty['teacher_id'],
+                'role': duty['role']
+            }
+            for duty in records
+        ]
+
+
+# name -> (source files, table, on_conflict, chunk reader); run in this order
+# so referenced students/teachers exist before attendance and duties.
+# Source files are alternatives, the first one that exists is used; a tuple
+# entry is a group of files read together.
+MIGRATION_SOURCES = {
+    'students': (("students.csv", ATTENDANCE_FILES), 'students', 'id', _students_chunks),
+    'teachers': (("teachers.csv",), 'teachers', 'id', _teachers_chunks),
+    'attendance_records': ((ATTENDANCE_FILES,), 'attendance_records', 'student_id,date', _attendance_chunks),
+    'class_timetables': (("class_timetables.json",), 'class_timetables', 'class_name,day', _timetable_chunks),
+    # duties have no unique key: a chunk interrupted mid-write is inserted again on resume
+    'duties': (("duties.csv",), 'duties', None, _duties_chunks),
+}
+
+
+def _path_signatures(name):
+    """[name, size, mtime] of a file, or of every file inside a directory"""
+    path = DATA_DIR / name
+    paths = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+    return [[str(p.relative_to(DATA_DIR)), p.stat().st_size, p.stat().st_mtime] for p in paths]
+
+
+def _source_signature(files):
+    """Signatures of the first existing source (file or group of files), or None"""
+    for source in files:
+        names = source if isinstance(source, tuple) else (source,)
+        existing = [name for name in names if (DATA_DIR / name).exists()]
+        if existing:
+            signatures = [signature for name in existing for signature in _path_signatures(name)]
+            # A single file keeps the flat form older checkpoints were saved with
+            return signatures[0] if len(signatures) == 1 else signatures
+    return None
+
+
+def _describe(source):
+    return ' + '.join(source) if isinstance(source, tuple) else source
+
+
+def load_checkpoint():
+    """{source: {'signature': ..., 'rows': rows already migrated}}"""
+    if not MIGRATION_CHECKPOINT_FILE.exists():
+        return {}
+    try:
+        with open(MIGRATION_CHECKPOINT_FILE, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable migration checkpoint: {e}")
+        return {}
+
+
+def _save_checkpoint(checkpoint):
+    with file_lock(MIGRATION_CHECKPOINT_FILE):
+        atomic_write(MIGRATION_CHECKPOINT_FILE, lambda f: json.dump(checkpoint, f, indent=2))
+
+
+def reset_checkpoint():
+    """Forget migration progress so the next run starts from the beginning"""
+    if MIGRATION_CHECKPOINT_FILE.exists():
+        os.remove(MIGRATION_CHECKPOINT_FILE)
+
+
+def _write_batch(table, rows, on_conflict):
+    for attempt in range(1, MIGRATION_RETRIES + 1):
+        try:
+            return supabase_manager.upsert_rows(table, rows, on_conflict=on_conflict)
+        except Exception:
+            if attempt == MIGRATION_RETRIES:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def migrate_source(name, checkpoint, batch_size=MIGRATION_BATCH_SIZE, concurrency=MIGRATION_CONCURRENCY,
+                   chunk_rows=MIGRATION_CHUNK_ROWS, log=print):
+    """Migrate one entry of MIGRATION_SOURCES, resuming from ``checkpoint``.
+
+    Returns the number of rows written in this run, or None if the source failed.
+    """
+    files, table, on_conflict, read_chunks = MIGRATION_SOURCES[name]
+    signature = _source_signature(files)
+    if signature is None:
+        log(f"❌ No source file for {name} ({' / '.join(_describe(source) for source in files)})")
+        return 0
+
+    progress = checkpoint.get(name)
+    if not progress or progress.get('signature') != signature:
+        progress = {'signature': signature, 'rows': 0}
+    done = progress['rows']
+    if done:
+        log(f"↪️ Resuming {name} after {done} rows")
+
+    offset = 0
+    written = 0
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for rows in read_chunks(chunk_rows):
+            chunk_end = offset + len(rows)
+            if chunk_end <= done:
+                offset = chunk_end
+                continue
+            rows = rows[max(done - offset, 0):]
+            offset = chunk_end
+
+            batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+            futures = [executor.submit(_write_batch, table, batch, on_conflict) for batch in batches]
+            try:
+                written += sum(future.result() for future in futures)
+            except Exception as e:
+                for future in futures:
+                    future.cancel()
+                log(f"❌ Failed to migrate {name} after {progress['rows']} rows: {e}")
+                return None
+
+            progress['rows'] = chunk_end
+            checkpoint[name] = progress
+            _save_checkpoint(checkpoint)
+
+            elapsed = time.monotonic() - started
+            log(f"   {name}: {progress['rows']} rows ({written / elapsed if elapsed else 0:.0f} rows/s)")
+
+    progress['complete'] = True
+    checkpoint[name] = progress
+    _save_checkpoint(checkpoint)
+
+    elapsed = time.monotonic() - started
+    log(f"✅ Migrated {written} {name} rows in {elapsed:.1f}s ({written / elapsed if elapsed else 0:.0f} rows/s)")
+    return written
+
+
+def run_migration(sources=None, batch_size=MIGRATION_BATCH_SIZE, concurrency=MIGRATION_CONCURRENCY,
+                  chunk_rows=MIGRATION_CHUNK_ROWS, reset=False, log=print):
+    """Migrate the given sources (all of MIGRATION_SOURCES by default).
+
+    Returns {source: rows written this run, or None on failure}.
+    """
+    if not supabase_manager.is_connected():
+        log("❌ Cannot connect to Supabase. Please check your credentials.")
+        return {}
+
+    if reset:
+        reset_checkpoint()
+    checkpoint = load_checkpoint()
+
+    results = {}
+    started = time.monotonic()
+    for name in sources or MIGRATION_SOURCES:
+        if checkpoint.get(name, {}).get('complete') and \
+                checkpoint[name].get('signature') == _source_signature(MIGRATION_SOURCES[name][0]):
+            log(f"⏭️ {name} already migrated")
+            results[name] = 0
+            continue
+        log(f"🔄 Migrating {name}...")
+        results[name] = migrate_source(name, checkpoint, batch_size, concurrency, chunk_rows, log)
+
+    total = sum(count or 0 for count in results.values())
+    elapsed = time.monotonic() - started
+    log(f"📊 {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s)")
+    return results
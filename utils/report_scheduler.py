@@ -0,0 +1,269 @@
+# utils/report_scheduler.py
+"""Background pre-building of month-end and week-end attendance reports.
+
+A daemon thread wakes every REPORT_SCHEDULE_INTERVAL seconds and builds the
+all-classes report for the last REPORT_MONTHS months and REPORT_WEEKS weeks.
+Each report's content digest is recorded in a manifest next to the files, and
+the CSV and XLSX are only rewritten for periods whose digest changed. A pass is
+skipped altogether while the attendance data is unchanged. Admin pages list the
+manifest instead of globbing the reports directory, and download files that
+already exist.
+"""
+import calendar
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from utils.excel_reports import write_attendance_workbook
+from utils.file_persistence import atomic_write, file_lock
+
+# Seconds between scheduler passes
+REPORT_SCHEDULE_INTERVAL = 5 * 60
+# Months (including the current one) kept up to date by the scheduler
+REPORT_MONTHS = 12
+# ISO weeks (including the current one) kept up to date by the scheduler
+REPORT_WEEKS = 4
+
+REPORT_MANIFEST_NAME = "manifest.json"
+# Bumped when the report files change shape; entries written with another format are rebuilt
+# (2: workbooks from before the write_attendance_workbook column fix were corrupt)
+REPORT_FORMAT = 2
+
+
+def month_period(year, month):
+    """(kind, key, start, end, display name) of a calendar month"""
+    start = date(year, month, 1)
+    end = start.replace(day=calendar.monthrange(year, month)[1])
+    return 'month', f"{year}-{month:02d}", start, end, start.strftime('%B %Y')
+
+
+def week_period(day):
+    """(kind, key, start, end, display name) of the ISO week (Monday-Sunday) containing day"""
+    year, week, _ = day.isocalendar()
+    start = day - timedelta(days=day.weekday())
+    end = start + timedelta(days=6)
+    return 'week', f"{year}-W{week:02d}", start, end, f"Week {week}, {year} ({start:%d %b} - {end:%d %b})"
+
+
+def recent_periods(today, months=REPORT_MONTHS, weeks=REPORT_WEEKS):
+    """The periods a scheduler pass keeps current, newest first"""
+    periods = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        periods.append(month_period(year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    for i in range(weeks):
+        periods.append(week_period(today - timedelta(weeks=i)))
+    return periods
+
+
+def report_digest(df, classes=None):
+    """Content hash of a report DataFrame (columns and values, row order included)
+    and of the class (sheet) order"""
+    digest = hashlib.sha1(','.join(map(str, df.columns)).encode('utf-8'))
+    digest.update('\n'.join(map(str, classes or [])).encode('utf-8'))
+    if not df.empty:
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _file_stem(kind, key):
+    if kind == 'month':
+        return f"monthly_report_{key.replace('-', '_')}"
+    return f"weekly_report_{key.replace('-', '_')}"
+
+
+class ReportScheduler:
+    """Builds, indexes and refreshes the period reports in reports_dir.
+
+    load_report(start_date, end_date) returns the all-classes report DataFrame;
+    it runs on the scheduler thread, so it must not need a Streamlit session.
+    state_token(), when given, returns a value that changes whenever the
+    attendance data may have changed. classes fixes the workbook sheet order.
+    """
+
+    def __init__(self, reports_dir, load_report, state_token=None, classes=None):
+        self.reports_dir = Path(reports_dir)
+        self.manifest_path = self.reports_dir / REPORT_MANIFEST_NAME
+        self._load_report = load_report
+        self._state_token = state_token
+        self._classes = list(classes) if classes else None
+        self._last_token = None
+        self._build_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    # MANIFEST
+
+    def manifest(self):
+        """{key: entry} for every generated report"""
+        if not self.manifest_path.exists():
+            return self._adopt_existing()
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable report manifest: {e}")
+            return self._adopt_existing()
+
+    def _adopt_existing(self):
+        """Entries for monthly CSVs written before the manifest existed (rebuilt on the next pass)"""
+        entries = {}
+        for path in self.reports_dir.glob("monthly_report_*.csv"):
+            parts = path.stem.replace('monthly_report_', '').split('_')
+            if len(parts) != 2 or not all(part.isdigit() for part in parts):
+                continue
+            kind, key, start, end, display_name = month_period(int(parts[0]), int(parts[1]))
+            xlsx = path.with_suffix('.xlsx')
+            entries[key] = {
+                'kind': kind, 'key': key, 'start': start.isoformat(), 'end': end.isoformat(),
+                'display_name': display_name, 'csv': path.name,
+                'xlsx': xlsx.name if xlsx.exists() else None,
+                'rows': None, 'digest': None, 'generated_at': None
+            }
+        return entries
+
+    def _save_manifest(self, manifest):
+        atomic_write(self.manifest_path, lambda f: json.dump(manifest, f, indent=2, sort_keys=True))
+
+    def reports(self, kind=None):
+        """Manifest entries whose files exist, newest period first, with csv_path/xlsx_path added"""
+        reports = []
+        for entry in self.manifest().values():
+            if kind and entry.get('kind') != kind:
+                continue
+            csv_path = self.reports_dir / entry['csv']
+            if not csv_path.exists():
+                continue
+            xlsx_path = self.reports_dir / entry['xlsx'] if entry.get('xlsx') else None
+            if entry.get('format') != REPORT_FORMAT:
+                xlsx_path = None  # workbook from an older format: not offered until rebuilt
+            reports.append(dict(
+                entry,
+                csv_path=csv_path,
+                xlsx_path=xlsx_path if xlsx_path and xlsx_path.exists() else None
+            ))
+        return sorted(reports, key=lambda e: (e['start'], e['kind']), reverse=True)
+
+    # BUILDING
+
+    def build(self, period, force=False):
+        """Write one period's CSV and XLSX unless its data is unchanged.
+
+        Returns (manifest entry or None when the period has no data, whether files were written).
+        """
+        kind, key, start, end, display_name = period
+        df = self._load_report(start, end)
+        digest = report_digest(df, self._classes)
+
+        with self._build_lock, file_lock(self.manifest_path):
+            manifest = self.manifest()
+            entry = manifest.get(key)
+            if entry and not force and entry.get('format') == REPORT_FORMAT and \
+                    entry.get('digest') == digest and (self.reports_dir / entry['csv']).exists():
+                return entry, False
+
+            if df.empty:
+                if entry:
+                    for name in (entry.get('csv'), entry.get('xlsx')):
+                        if name and (self.reports_dir / name).exists():
+                            os.remove(self.reports_dir / name)
+                    del manifest[key]
+                    self._save_manifest(manifest)
+                return None, entry is not None
+
+            stem = _file_stem(kind, key)
+            csv_path = self.reports_dir / f"{stem}.csv"
+            xlsx_path = self.reports_dir / f"{stem}.xlsx"
+            atomic_write(csv_path, lambda f: df.to_csv(f, index=False))
+            tmp_path = self.reports_dir / f".{stem}.tmp.xlsx"
+            try:
+                write_attendance_workbook(tmp_path, df, classes=self._classes)
+                os.replace(tmp_path, xlsx_path)
+            finally:
+                if tmp_path.exists():
+                    os.remove(tmp_path)
+
+            entry = {
+                'kind': kind, 'key': key, 'start': start.isoformat(), 'end': end.isoformat(),
+                'display_name': display_name, 'csv': csv_path.name, 'xlsx': xlsx_path.name,
+                'rows': len(df), 'digest': digest, 'format': REPORT_FORMAT,
+                'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            manifest[key] = entry
+            self._save_manifest(manifest)
+            return entry, True
+
+    def _stale_periods(self, skip_keys=()):
+        """Periods of manifest entries written with an older REPORT_FORMAT"""
+        return [
+            (entry['kind'], entry['key'], date.fromisoformat(entry['start']), date.fromisoformat(entry['end']),
+             entry['display_name'])
+            for entry in self.manifest().values()
+            if entry.get('format') != REPORT_FORMAT and entry['key'] not in skip_keys
+        ]
+
+    def run_once(self, today=None):
+        """One pass over recent_periods() plus any stale older reports;
+        returns the keys of the reports written or removed"""
+        today = today or date.today()
+        token = (today, self._state_token()) if self._state_token else None
+        if token is not None and token == self._last_token:
+            return []
+
+        periods = recent_periods(today)
+        periods += self._stale_periods({period[1] for period in periods})
+        changed = []
+        for period in periods:
+            _, written = self.build(period)
+            if written:
+                changed.append(period[1])
+        self._last_token = token
+        return changed
+
+    def start(self, interval=REPORT_SCHEDULE_INTERVAL):
+        """Start the background thread (once per process)"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            def _run():
+                while True:
+                    try:
+                        changed = self.run_once()
+                        if changed:
+                            print(f"Pre-built reports: {', '.join(changed)}")
+                    except Exception as e:
+                        print(f"Scheduled report generation failed: {e}")
+                    time.sleep(interval)
+
+            self._thread = threading.Thread(target=_run, name="report-scheduler", daemon=True)
+            self._thread.start()
+
+    # COMPATIBILITY WITH THE ON-DEMAND MONTHLY REPORT API
+
+    def generate_month(self, month, year):
+        """Build (or reuse, if its data is unchanged) a month's report; returns the CSV path or None"""
+        entry, _ = self.build(month_period(year, month))
+        return self.reports_dir / entry['csv'] if entry else None
+
+    def monthly_reports(self):
+        """Monthly reports in the shape get_available_monthly_reports() has always returned"""
+        reports = []
+        for entry in self.reports('month'):
+            start = date.fromisoformat(entry['start'])
+            reports.append({
+                'filename': entry['csv'],
+                'year': start.year,
+                'month': start.month,
+                'file_path': entry['csv_path'],
+                'xlsx_path': entry['xlsx_path'],
+                'display_name': entry['display_name']
+            })
+        return reports
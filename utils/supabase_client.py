@@ -1,40 +1,328 @@
 # utils/supabase_client.py
+import asyncio
+import copy
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 import streamlit as st
 from supabase import create_client, Client
 from typing import Optional, Dict, Any, List
 import pandas as pd
 from datetime import datetime, date
 
-class SupabaseManager:
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # older Streamlit
+    add_script_run_ctx = get_script_run_ctx = None
+
+# Seconds between health checks of an idle shared client
+HEALTH_CHECK_INTERVAL = 300
+# Upper bound for the exponential reconnection backoff, in seconds
+RECONNECT_BACKOFF_MAX = 60
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """True for network/transport failures (as opposed to query errors returned by the API)"""
+    try:
+        import httpx
+        if isinstance(error, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _is_missing_function(error: Exception) -> bool:
+    """True when PostgREST reports that an RPC function does not exist (PGRST202 / HTTP 404)"""
+    code = str(getattr(error, 'code', '') or '')
+    if code in ('PGRST202', '404'):
+        return True
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) == 404
+
+
+class SupabaseConnection:
+    """Process-wide Supabase client.
+
+    Created lazily on first use and shared by every session and rerun, so the
+    underlying HTTP sessions (and their keep-alive connections) are reused. A
+    failed connection is retried with exponential backoff, and an idle client
+    is health-checked before it is handed out again.
+    """
+
     def __init__(self):
-        self.client: Optional[Client] = None
-        self._initialize_client()
-    
-    def _initialize_client(self):
-        """Initialize Supabase client with credentials"""
+        self._lock = threading.Lock()
+        self._client: Optional[Client] = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._checked_at = 0.0
+        self.last_error: Optional[str] = None
+
+    def get(self) -> Optional[Client]:
+        """Return the shared client, (re)connecting if allowed by the backoff"""
+        with self._lock:
+            now = time.monotonic()
+            if self._client is not None and now - self._checked_at > HEALTH_CHECK_INTERVAL:
+                self._health_check(self._client)
+            if self._client is None and now >= self._retry_at:
+                self._connect()
+            return self._client
+
+    def report_failure(self, error: Exception):
+        """Drop the client after a transport error; the next get() reconnects after the backoff"""
+        with self._lock:
+            self._fail(error)
+
+    def _connect(self):
+        # Get credentials from environment variables or Streamlit secrets
+        url = os.getenv("SUPABASE_URL") or st.secrets.get("supabase.url")
+        key = os.getenv("SUPABASE_ANON_KEY") or st.secrets.get("supabase.anon_key")
+        if not url or not key:
+            self.last_error = "Supabase credentials not found. Please set SUPABASE_URL and SUPABASE_ANON_KEY in your environment or Streamlit secrets."
+            print(self.last_error)
+            self._retry_at = time.monotonic() + RECONNECT_BACKOFF_MAX
+            return
         try:
-            # Get credentials from environment variables or Streamlit secrets
-            url = os.getenv("SUPABASE_URL") or st.secrets.get("supabase.url")
-            key = os.getenv("SUPABASE_ANON_KEY") or st.secrets.get("supabase.anon_key")
-            
-            if not url or not key:
-                st.error("❌ Supabase credentials not found. Please set SUPABASE_URL and SUPABASE_ANON_KEY in your environment or Streamlit secrets.")
-                return
-            
-            # Create client with simple parameters
-            self.client = create_client(url, key)
-            st.success("✅ Connected to Supabase successfully!")
-            
+            client = create_client(url, key)
         except Exception as e:
-            st.error(f"❌ Failed to connect to Supabase: {e}")
-            self.client = None
+            self._fail(e)
+            return
+        self._health_check(client)
+
+    def _health_check(self, client: Client):
+        try:
+            client.table('students').select('id').limit(1).execute()
+        except Exception as e:
+            self._fail(e)
+            return
+        self._client = client
+        self._failures = 0
+        self._checked_at = time.monotonic()
+        self.last_error = None
+
+    def _fail(self, error: Exception):
+        self._client = None
+        self._failures += 1
+        self._retry_at = time.monotonic() + min(RECONNECT_BACKOFF_MAX, 2 ** (self._failures - 1))
+        self.last_error = str(error)
+        print(f"Supabase connection failed (attempt {self._failures}): {error}")
+
+
+@st.cache_resource
+def get_supabase_connection() -> SupabaseConnection:
+    """The SupabaseConnection shared by all sessions of this server process"""
+    return SupabaseConnection()
+
+
+# Rows per request when paging through attendance (PostgREST caps unpaged selects)
+ATTENDANCE_PAGE_SIZE = 1000
+
+# Rows per upsert request when the save_attendance_batch function is not available
+ATTENDANCE_UPSERT_CHUNK = 500
+# Columns written by write_attendance_batch
+ATTENDANCE_WRITE_COLUMNS = ('student_id', 'class', 'date', 'status', 'notes', 'timestamp')
+
+# Seconds a cached read stays fresh, per table
+CACHE_TTLS = {
+    'students': 300,
+    'teachers': 300,
+    'class_timetables': 600,
+    'duties': 120,
+    'daily_notes': 60,
+    'attendance_records': 30,
+    'class_notifications': 15,
+}
+# Most entries kept before the least recently used ones are evicted
+QUERY_CACHE_SIZE = 512
+
+_read_state = threading.local()
+
+
+def _copy_result(value):
+    """Copy a cached result so callers can modify it without touching the cache"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    return copy.deepcopy(value)
+
+
+class QueryCache:
+    """Thread-safe TTL + LRU cache of query results, grouped by table for invalidation"""
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int):
+        self._ttls = ttls
+        self._max_entries = max_entries
+        self._entries = OrderedDict()  # (table, key) -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, table: str, key) -> Any:
+        """(True, value) for a fresh entry, (False, None) otherwise"""
+        with self._lock:
+            entry = self._entries.get((table, key))
+            if entry is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                del self._entries[(table, key)]
+                return False, None
+            self._entries.move_to_end((table, key))
+            return True, _copy_result(entry[1])
+
+    def set(self, table: str, key, value):
+        with self._lock:
+            self._entries[(table, key)] = (time.monotonic() + self._ttls.get(table, 60), _copy_result(value))
+            self._entries.move_to_end((table, key))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tables: str):
+        """Drop every cached query on the given tables"""
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] in tables]:
+                del self._entries[cache_key]
+
+
+def cached_read(table: str):
+    """Serve a SupabaseManager read from the query cache, keyed by method and arguments.
+
+    Results of failed queries (and of calls made while disconnected) are not cached.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.is_connected():
+                return method(self, *args, **kwargs)
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            hit, value = self._cache.get(table, key)
+            if hit:
+                return value
+            _read_state.failed = False
+            value = method(self, *args, **kwargs)
+            if not _read_state.failed:
+                self._cache.set(table, key, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables: str):
+    """Drop cached reads of the given tables after a SupabaseManager write"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._cache.invalidate(*tables)
+        return wrapper
+    return decorator
+
+
+class SupabaseManager:
+    def __init__(self):
+        self._cache = QueryCache(CACHE_TTLS, QUERY_CACHE_SIZE)
+        self._missing_rpcs = set()
+    
+    @property
+    def client(self) -> Optional[Client]:
+        """Shared Supabase client (connected lazily on first use)"""
+        return get_supabase_connection().get()
     
     def is_connected(self) -> bool:
         """Check if Supabase client is connected"""
         return self.client is not None
     
+    def _execute(self, query):
+        """Run a query builder, dropping the shared client if the connection itself failed"""
+        try:
+            return query.execute()
+        except Exception as e:
+            _read_state.failed = True
+            if _is_connection_error(e):
+                get_supabase_connection().report_failure(e)
+            raise
+    
+    def _rpc(self, function: str, params: Dict[str, Any]):
+        """Call a Postgres function from database_schema.sql.
+        
+        Returns None (and stops trying) if the function has not been created on
+        this project, so callers can fall back to plain table queries. Any other
+        error (constraint violation, bad payload, server error) is raised.
+        """
+        if function in self._missing_rpcs:
+            return None
+        try:
+            return self._execute(self.client.rpc(function, params))
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            print(f"{function} RPC unavailable, using table queries instead: {e}")
+            self._missing_rpcs.add(function)
+            return None
+    
+    def upsert_rows(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> int:
+        """Write one batch of rows (upsert on ``on_conflict``, plain insert without it).
+
+        Used by bulk jobs such as the migration engine; errors are raised rather
+        than shown so the caller can retry the batch.
+        """
+        if not self.is_connected():
+            raise ConnectionError("Supabase is not connected")
+        try:
+            if on_conflict:
+                query = self.client.table(table).upsert(rows, on_conflict=on_conflict)
+            else:
+                query = self.client.table(table).insert(rows)
+            self._execute(query)
+            return len(rows)
+        finally:
+            self._cache.invalidate(table)
+
+    def update_rows(self, table: str, values: Dict[str, Any], match: Dict[str, Any]) -> int:
+        """Set ``values`` on the rows equal to ``match``; raises like upsert_rows"""
+        if not self.is_connected():
+            raise ConnectionError("Supabase is not connected")
+        try:
+            query = self.client.table(table).update(values)
+            for column, value in match.items():
+                query = query.eq(column, value)
+            return len(self._execute(query).data or [])
+        finally:
+            self._cache.invalidate(table)
+
+    def iter_rows_since(self, table: str, column: str, since: Optional[str] = None,
+                        columns: str = '*', page_size: int = ATTENDANCE_PAGE_SIZE):
+        """Yield pages of rows whose ``column`` (a timestamp) is >= since, oldest first.
+
+        Pages follow the (column, id) key rather than an offset, so rows updated while
+        paging move to the end instead of shifting a row past the next page boundary.
+        Errors are raised to the caller (used by the delta sync).
+        """
+        if not self.is_connected():
+            raise ConnectionError("Supabase is not connected")
+        if columns != '*':
+            columns = ','.join(dict.fromkeys(columns.split(',') + [column, 'id']))
+
+        last = None
+        while True:
+            query = self.client.table(table).select(columns)
+            if last is not None:
+                value = f'"{last[column]}"'
+                query = query.or_(f"{column}.gt.{value},and({column}.eq.{value},id.gt.{last['id']})")
+            elif since is not None:
+                query = query.gte(column, since)
+            page = self._execute(query.order(column).order('id').limit(page_size)).data or []
+            if page:
+                yield page
+            last = page[-1] if page else None
+            if len(page) < page_size or last[column] is None:
+                return  # NULLs sort last and cannot be paged past
+
     # STUDENTS OPERATIONS
+    @cached_read('students')
     def get_students(self, class_name: Optional[str] = None) -> pd.DataFrame:
         """Get all students or students from a specific class"""
         if not self.is_connected():
@@ -42,128 +330,249 @@ class SupabaseManager:
         
         try:
             if class_name:
-                response = self.client.table('students').select('*').eq('class', class_name).execute()
+                response = self._execute(self.client.table('students').select('*').eq('class', class_name))
             else:
-                response = self.client.table('students').select('*').execute()
+                response = self._execute(self.client.table('students').select('*'))
             
             return pd.DataFrame(response.data)
         except Exception as e:
             st.error(f"Error fetching students: {e}")
             return pd.DataFrame()
     
+    @invalidates('students')
     def add_student(self, student_data: Dict[str, Any]) -> bool:
         """Add a new student"""
         if not self.is_connected():
             return False
         
         try:
-            response = self.client.table('students').insert(student_data).execute()
+            response = self._execute(self.client.table('students').insert(student_data))
             return len(response.data) > 0
         except Exception as e:
             st.error(f"Error adding student: {e}")
             return False
     
+    @invalidates('students')
     def update_student(self, student_id: int, updates: Dict[str, Any]) -> bool:
         """Update student information"""
         if not self.is_connected():
             return False
         
         try:
-            response = self.client.table('students').update(updates).eq('id', student_id).execute()
+            response = self._execute(self.client.table('students').update(updates).eq('id', student_id))
             return len(response.data) > 0
         except Exception as e:
             st.error(f"Error updating student: {e}")
             return False
     
+    @invalidates('students', 'attendance_records')
     def delete_student(self, student_id: int) -> bool:
         """Delete a student"""
         if not self.is_connected():
             return False
         
         try:
-            response = self.client.table('students').delete().eq('id', student_id).execute()
+            response = self._execute(self.client.table('students').delete().eq('id', student_id))
             return True
         except Exception as e:
             st.error(f"Error deleting student: {e}")
             return False
     
     # ATTENDANCE OPERATIONS
+    @cached_read('attendance_records')
     def get_attendance_records(self, class_name: Optional[str] = None, 
                              start_date: Optional[date] = None, 
-                             end_date: Optional[date] = None) -> List[Dict[str, Any]]:
-        """Get attendance records with optional filters"""
+                             end_date: Optional[date] = None,
+                             columns: str = '*') -> List[Dict[str, Any]]:
+        """Get attendance records with optional filters (all pages)"""
+        records = []
+        for page in self.iter_attendance_records(class_name, start_date, end_date, columns=columns):
+            records.extend(page)
+        return records
+    
+    def iter_attendance_records(self, class_name: Optional[str] = None,
+                                start_date: Optional[date] = None,
+                                end_date: Optional[date] = None,
+                                columns: str = '*',
+                                student_id: Optional[int] = None,
+                                page_size: int = ATTENDANCE_PAGE_SIZE):
+        """Yield attendance records page by page (lists of at most page_size rows).
+        
+        Pages are requested with .range() in (date, id) order, so large histories are
+        neither truncated by the server row cap nor loaded into memory at once.
+        Pass columns (e.g. 'date,class,status') to fetch only what the caller needs.
+        """
         if not self.is_connected():
-            return []
+            return
         
-        try:
-            query = self.client.table('attendance_records').select('*')
-            
-            if class_name:
-                query = query.eq('class', class_name)
-            if start_date:
-                query = query.gte('date', start_date.isoformat())
-            if end_date:
-                query = query.lte('date', end_date.isoformat())
+        offset = 0
+        while True:
+            try:
+                query = self.client.table('attendance_records').select(columns)
+                if class_name:
+                    query = query.eq('class', class_name)
+                if student_id is not None:
+                    query = query.eq('student_id', student_id)
+                if start_date:
+                    query = query.gte('date', start_date.isoformat())
+                if end_date:
+                    query = query.lte('date', end_date.isoformat())
+                query = query.order('date').order('id').range(offset, offset + page_size - 1)
+                page = self._execute(query).data or []
+            except Exception as e:
+                st.error(f"Error fetching attendance records: {e}")
+                return
             
-            response = query.execute()
-            return response.data
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            offset += page_size
+    
+    @cached_read('attendance_records')
+    def count_attendance_records(self) -> int:
+        """Total number of attendance records (counted server-side)"""
+        if not self.is_connected():
+            return 0
+        
+        try:
+            response = self._execute(self.client.table('attendance_records').select('id', count='exact').limit(1))
+            return response.count or 0
         except Exception as e:
-            st.error(f"Error fetching attendance records: {e}")
-            return []
+            st.error(f"Error counting attendance records: {e}")
+            return 0
+    
+    @invalidates('attendance_records')
+    def write_attendance_batch(self, records: List[Dict[str, Any]]) -> int:
+        """Upsert attendance records on student_id + date; returns the rows written.
+        
+        Sent as one atomic save_attendance_batch call when that function exists,
+        otherwise as upserts of ATTENDANCE_UPSERT_CHUNK rows. Errors are raised
+        like upsert_rows, so the offline outbox can retry the batch.
+        """
+        if not self.is_connected():
+            raise ConnectionError("Supabase is not connected")
+        
+        # Keep only table columns; the last record wins for a repeated student/date
+        rows = {}
+        for record in records:
+            row = {column: record[column] for column in ATTENDANCE_WRITE_COLUMNS if column in record}
+            rows[(row.get('student_id'), row.get('date'))] = row
+        rows = list(rows.values())
+        if not rows:
+            return 0
+        
+        response = self._rpc('save_attendance_batch', {'p_records': rows})
+        if response is not None:
+            return response.data or 0
+        
+        for start in range(0, len(rows), ATTENDANCE_UPSERT_CHUNK):
+            chunk = rows[start:start + ATTENDANCE_UPSERT_CHUNK]
+            self._execute(self.client.table('attendance_records').upsert(chunk, on_conflict='student_id,date'))
+        return len(rows)
     
     def save_attendance_records(self, records: List[Dict[str, Any]]) -> bool:
-        """Save attendance records (upsert)"""
+        """Save attendance records (upsert on student_id + date) straight to Supabase"""
         if not self.is_connected():
             return False
         
         try:
-            # First, delete existing records for the same date and class
-            if records:
-                first_record = records[0]
-                target_date = first_record.get('date')
-                target_class = first_record.get('class')
-                
-                if target_date and target_class:
-                    self.client.table('attendance_records').delete().eq('class', target_class).eq('date', target_date).execute()
-            
-            # Insert new records
-            response = self.client.table('attendance_records').insert(records).execute()
-            return len(response.data) > 0
+            return self.write_attendance_batch(records) > 0
         except Exception as e:
             st.error(f"Error saving attendance records: {e}")
             return False
     
+    @cached_read('attendance_records')
     def get_attendance_summary(self, class_name: str, selected_date: date) -> Dict[str, Any]:
         """Get attendance summary for a class and date"""
         if not self.is_connected():
             return {}
         
         try:
-            response = self.client.table('attendance_records').select('status').eq('class', class_name).eq('date', selected_date.isoformat()).execute()
-            
-            if not response.data:
-                return {}
-            
             status_counts = {}
-            for record in response.data:
-                status = record['status']
-                status_counts[status] = status_counts.get(status, 0) + 1
+            for row in self._status_counts(selected_date, selected_date, class_name):
+                status_counts[row['status']] = row['record_count']
             
-            total_students = len(response.data)
-            present_count = status_counts.get('P', 0) + status_counts.get('L', 0)
-            attendance_rate = (present_count / total_students) * 100 if total_students > 0 else 0
-            
-            return {
-                'total_students': total_students,
-                'present_count': present_count,
-                'attendance_rate': round(attendance_rate, 1),
-                'status_counts': status_counts
-            }
+            return self._summarize_status_counts(status_counts)
         except Exception as e:
             st.error(f"Error getting attendance summary: {e}")
             return {}
     
+    @cached_read('attendance_records')
+    def get_school_attendance_summary(self, selected_date: date) -> Dict[str, Dict[str, Any]]:
+        """Get attendance summaries for every class on a date with a single query"""
+        if not self.is_connected():
+            return {}
+        
+        try:
+            by_class = {}
+            for row in self._status_counts(selected_date, selected_date):
+                by_class.setdefault(row['class_name'], {})[row['status']] = row['record_count']
+            
+            return {class_name: self._summarize_status_counts(counts) for class_name, counts in by_class.items()}
+        except Exception as e:
+            st.error(f"Error getting school attendance summary: {e}")
+            return {}
+    
+    @cached_read('attendance_records')
+    def get_attendance_status_counts(self, start_date: date, end_date: date,
+                                     class_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Attendance counts per class/date/status between two dates (inclusive).
+        
+        Rows look like {'class_name', 'attendance_date', 'status', 'record_count'}.
+        """
+        if not self.is_connected():
+            return []
+        
+        try:
+            return self._status_counts(start_date, end_date, class_name)
+        except Exception as e:
+            st.error(f"Error getting attendance counts: {e}")
+            return []
+    
+    def _status_counts(self, start_date: date, end_date: date, class_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Aggregate in Postgres via the attendance_status_counts function; if it has not
+        been created yet (see database_schema.sql), count the status rows client-side"""
+        response = self._rpc('attendance_status_counts', {
+            'p_start_date': start_date.isoformat(),
+            'p_end_date': end_date.isoformat(),
+            'p_class': class_name
+        })
+        if response is not None:
+            return response.data or []
+        
+        query = self.client.table('attendance_records').select('class,date,status') \
+            .gte('date', start_date.isoformat()).lte('date', end_date.isoformat())
+        if class_name:
+            query = query.eq('class', class_name)
+        counts = {}
+        for record in self._execute(query).data or []:
+            key = (record['class'], record['date'], record['status'])
+            counts[key] = counts.get(key, 0) + 1
+        return [
+            {'class_name': c, 'attendance_date': d, 'status': s, 'record_count': n}
+            for (c, d, s), n in sorted(counts.items(), key=lambda item: (item[0][1], item[0][0], item[0][2]))
+        ]
+    
+    @staticmethod
+    def _summarize_status_counts(status_counts: Dict[str, int]) -> Dict[str, Any]:
+        """Summary dict (totals and attendance rate) from {status: count}"""
+        if not status_counts:
+            return {}
+        
+        total_students = sum(status_counts.values())
+        present_count = status_counts.get('P', 0) + status_counts.get('L', 0)
+        attendance_rate = (present_count / total_students) * 100 if total_students > 0 else 0
+        
+        return {
+            'total_students': total_students,
+            'present_count': present_count,
+            'attendance_rate': round(attendance_rate, 1),
+            'status_counts': status_counts
+        }
+    
     # TEACHERS OPERATIONS
+    @cached_read('teachers')
     def get_teachers(self, teacher_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get all teachers or teachers of a specific type"""
         if not self.is_connected():
@@ -174,49 +583,53 @@ class SupabaseManager:
             if teacher_type:
                 query = query.eq('type', teacher_type)
             
-            response = query.execute()
+            response = self._execute(query)
             return response.data
         except Exception as e:
             st.error(f"Error fetching teachers: {e}")
             return []
     
+    @invalidates('teachers')
     def add_teacher(self, teacher_data: Dict[str, Any]) -> Optional[int]:
         """Add a new teacher"""
         if not self.is_connected():
             return None
         
         try:
-            response = self.client.table('teachers').insert(teacher_data).execute()
+            response = self._execute(self.client.table('teachers').insert(teacher_data))
             return response.data[0]['id'] if response.data else None
         except Exception as e:
             st.error(f"Error adding teacher: {e}")
             return None
     
+    @invalidates('teachers')
     def update_teacher(self, teacher_id: int, updates: Dict[str, Any]) -> bool:
         """Update teacher information"""
         if not self.is_connected():
             return False
         
         try:
-            response = self.client.table('teachers').update(updates).eq('id', teacher_id).execute()
+            response = self._execute(self.client.table('teachers').update(updates).eq('id', teacher_id))
             return len(response.data) > 0
         except Exception as e:
             st.error(f"Error updating teacher: {e}")
             return False
     
+    @invalidates('teachers', 'duties')
     def delete_teacher(self, teacher_id: int) -> bool:
         """Delete a teacher"""
         if not self.is_connected():
             return False
         
         try:
-            response = self.client.table('teachers').delete().eq('id', teacher_id).execute()
+            response = self._execute(self.client.table('teachers').delete().eq('id', teacher_id))
             return True
         except Exception as e:
             st.error(f"Error deleting teacher: {e}")
             return False
     
     # DAILY NOTES OPERATIONS
+    @invalidates('daily_notes')
     def save_daily_note(self, class_name: str, note_date: date, text: str) -> bool:
         """Save daily note for a class"""
         if not self.is_connected():
@@ -230,32 +643,34 @@ class SupabaseManager:
                 'last_updated': datetime.now().isoformat()
             }
             
-            response = self.client.table('daily_notes').upsert(note_data, on_conflict='class,date').execute()
+            response = self._execute(self.client.table('daily_notes').upsert(note_data, on_conflict='class,date'))
             return len(response.data) > 0
         except Exception as e:
             st.error(f"Error saving daily note: {e}")
             return False
     
+    @cached_read('daily_notes')
     def get_daily_note(self, class_name: str, note_date: date) -> str:
         """Get daily note for a class and date"""
         if not self.is_connected():
             return ""
         
         try:
-            response = self.client.table('daily_notes').select('text').eq('class', class_name).eq('date', note_date.isoformat()).execute()
+            response = self._execute(self.client.table('daily_notes').select('text').eq('class', class_name).eq('date', note_date.isoformat()))
             return response.data[0]['text'] if response.data else ""
         except Exception as e:
             st.error(f"Error getting daily note: {e}")
             return ""
     
     # TIMETABLE OPERATIONS
+    @cached_read('class_timetables')
     def get_class_timetable(self, class_name: str) -> Dict[str, List[str]]:
         """Get timetable for a class"""
         if not self.is_connected():
             return {}
         
         try:
-            response = self.client.table('class_timetables').select('day,periods').eq('class_name', class_name).execute()
+            response = self._execute(self.client.table('class_timetables').select('day,periods').eq('class_name', class_name))
             
             timetable = {}
             for record in response.data:
@@ -266,6 +681,7 @@ class SupabaseManager:
             st.error(f"Error getting timetable: {e}")
             return {}
     
+    @invalidates('class_timetables')
     def save_class_timetable(self, class_name: str, timetable_data: Dict[str, List[str]]) -> bool:
         """Save timetable for a class"""
         if not self.is_connected():
@@ -273,7 +689,7 @@ class SupabaseManager:
         
         try:
             # Delete existing timetable for this class
-            self.client.table('class_timetables').delete().eq('class_name', class_name).execute()
+            self._execute(self.client.table('class_timetables').delete().eq('class_name', class_name))
             
             # Insert new timetable
             records = []
@@ -284,38 +700,41 @@ class SupabaseManager:
                     'periods': periods
                 })
             
-            response = self.client.table('class_timetables').insert(records).execute()
+            response = self._execute(self.client.table('class_timetables').insert(records))
             return len(response.data) > 0
         except Exception as e:
             st.error(f"Error saving timetable: {e}")
             return False
     
     # DUTIES OPERATIONS
+    @cached_read('duties')
     def get_duties_for_date(self, duty_date: date) -> List[Dict[str, Any]]:
         """Get duties for a specific date"""
         if not self.is_connected():
             return []
         
         try:
-            response = self.client.table('duties').select('*').eq('date', duty_date.isoformat()).execute()
+            response = self._execute(self.client.table('duties').select('*').eq('date', duty_date.isoformat()))
             return response.data
         except Exception as e:
             st.error(f"Error getting duties: {e}")
             return []
     
+    @invalidates('duties')
     def assign_duty(self, duty_data: Dict[str, Any]) -> bool:
         """Assign a duty"""
         if not self.is_connected():
             return False
         
         try:
-            response = self.client.table('duties').insert(duty_data).execute()
+            response = self._execute(self.client.table('duties').insert(duty_data))
             return len(response.data) > 0
         except Exception as e:
             st.error(f"Error assigning duty: {e}")
             return False
     
     # NOTIFICATIONS OPERATIONS
+    @invalidates('class_notifications')
     def send_class_notification(self, class_name: str, message: str, message_type: str = "info") -> bool:
         """Send notification to a class"""
         if not self.is_connected():
@@ -329,31 +748,33 @@ class SupabaseManager:
                 'is_read': False
             }
             
-            response = self.client.table('class_notifications').insert(notification_data).execute()
+            response = self._execute(self.client.table('class_notifications').insert(notification_data))
             return len(response.data) > 0
         except Exception as e:
             st.error(f"Error sending notification: {e}")
             return False
     
+    @cached_read('class_notifications')
     def get_class_notifications(self, class_name: str) -> List[Dict[str, Any]]:
         """Get notifications for a class"""
         if not self.is_connected():
             return []
         
         try:
-            response = self.client.table('class_notifications').select('*').eq('class_name', class_name).order('created_at', desc=True).execute()
+            response = self._execute(self.client.table('class_notifications').select('*').eq('class_name', class_name).order('created_at', desc=True))
             return response.data
         except Exception as e:
             st.error(f"Error getting notifications: {e}")
             return []
     
+    @invalidates('class_notifications')
     def mark_notification_read(self, notification_id: int) -> bool:
         """Mark a notification as read"""
         if not self.is_connected():
             return False
         
         try:
-            response = self.client.table('class_notifications').update({'is_read': True}).eq('id', notification_id).execute()
+            response = self._execute(self.client.table('class_notifications').update({'is_read': True}).eq('id', notification_id))
             return len(response.data) > 0
         except Exception as e:
             st.error(f"Error marking notification as read: {e}")
@@ -361,3 +782,71 @@ class SupabaseManager:
 
 # Global instance
 supabase_manager = SupabaseManager()
+
+
+# Threads available for running independent queries at the same time
+FANOUT_WORKERS = 8
+
+
+@st.cache_resource
+def get_fanout_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by all sessions for concurrent (fan-out) reads"""
+    return ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="supabase-fanout")
+
+
+def _in_script_context(function):
+    """Let a worker thread use st.* (e.g. st.error) on behalf of the calling session"""
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    if ctx is None:
+        return function
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return function()
+    return run
+
+
+class AsyncSupabaseManager:
+    """asyncio variant of SupabaseManager.
+
+    Every SupabaseManager method is available as a coroutine that runs the
+    blocking PostgREST call on the shared fan-out pool, so independent queries
+    can be awaited together with asyncio.gather: a page then waits for its
+    slowest query instead of the sum of all of them. Caching and connection
+    handling are those of the wrapped manager.
+    """
+
+    def __init__(self, manager: SupabaseManager):
+        self._manager = manager
+
+    def __getattr__(self, name):
+        method = getattr(self._manager, name)
+        if not callable(method):
+            return method
+
+        @wraps(method)
+        async def coroutine(*args, **kwargs):
+            return await _run_in_pool(partial(method, *args, **kwargs))
+        return coroutine
+
+
+async def _run_in_pool(function):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_fanout_executor(), _in_script_context(function))
+
+
+def run_concurrently(calls: Dict[str, tuple]) -> Dict[str, Any]:
+    """Run independent reads at the same time: {key: (function, *args)} -> {key: result}.
+
+    Works for SupabaseManager methods and for the data_models_supabase functions
+    built on them.
+    """
+    async def gather():
+        results = await asyncio.gather(*(
+            _run_in_pool(partial(function, *args)) for function, *args in calls.values()
+        ))
+        return dict(zip(calls, results))
+    return asyncio.run(gather())
+
+
+async_supabase_manager = AsyncSupabaseManager(supabase_manager)
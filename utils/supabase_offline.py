@@ -0,0 +1,488 @@
+# utils/supabase_offline.py
+"""Offline-first layer for the Supabase backend.
+
+- LocalReplica: SQLite copy of the rows this process has read from or written to
+  Supabase. It offers the read methods data_models_supabase uses on
+  supabase_manager, so pages keep working while Supabase is unreachable.
+- Outbox: durable queue of writes in the same database. A write is committed
+  locally and returns at once; a background thread drains the queue in order,
+  retrying with exponential backoff, so nothing is lost during an outage.
+- SyncEngine (utils/supabase_sync.py): keeps the replica's copy of the larger
+  tables current with delta syncs, after which reads of them are served locally.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from utils.supabase_client import (
+    ATTENDANCE_PAGE_SIZE, ATTENDANCE_UPSERT_CHUNK, SupabaseManager, _is_connection_error, supabase_manager
+)
+from utils.supabase_sync import SYNC_TABLES, SyncEngine
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+OFFLINE_DB_PATH = Path(os.getenv("SUPABASE_OFFLINE_DB", str(DATA_DIR / "supabase_offline.db")))
+
+# Seconds between outbox polls while everything is synced
+OUTBOX_POLL_INTERVAL = 5
+# Upper bound for the retry backoff after a failed drain, in seconds
+OUTBOX_BACKOFF_MAX = 300
+# Attempts before a write the server keeps rejecting is parked as failed
+OUTBOX_MAX_ATTEMPTS = 8
+# Upserts for the same table are sent together, up to this many rows
+OUTBOX_BATCH_ROWS = ATTENDANCE_UPSERT_CHUNK
+
+# Columns identifying a row of each replicated table (see database_schema.sql)
+REPLICA_KEYS = {
+    'students': ('id',),
+    'teachers': ('id',),
+    'daily_notes': ('class', 'date'),
+    'class_timetables': ('class_name', 'day'),
+    'duties': ('id',),
+    'class_notifications': ('id',),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance_records (
+    student_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    class TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (student_id, date)
+);
+CREATE INDEX IF NOT EXISTS idx_replica_attendance_class_date ON attendance_records(class, date);
+CREATE INDEX IF NOT EXISTS idx_replica_attendance_date ON attendance_records(date);
+
+CREATE TABLE IF NOT EXISTS replica_rows (
+    table_name TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (table_name, row_key)
+);
+
+-- Pages of a full sync are written here and swapped in once the download completes
+CREATE TABLE IF NOT EXISTS attendance_records_staging (
+    student_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    class TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (student_id, date)
+);
+
+CREATE TABLE IF NOT EXISTS replica_rows_staging (
+    table_name TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (table_name, row_key)
+);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    operation TEXT NOT NULL CHECK (operation IN ('upsert', 'insert', 'update')),
+    payload TEXT NOT NULL,
+    on_conflict TEXT,
+    match TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(failed, id);
+"""
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+class OfflineDatabase:
+    """Per-thread WAL connections to OFFLINE_DB_PATH"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class LocalReplica:
+    """Local copy of Supabase rows with the read API of SupabaseManager"""
+
+    def __init__(self, db):
+        self._db = db
+
+    # WRITES
+    def put_attendance(self, rows, conn=None, target='attendance_records'):
+        """Insert or replace attendance rows (keyed by student_id + date)"""
+        values = []
+        for row in rows:
+            # status is CHAR(2) on the server, so 'P' comes back as 'P '
+            row = dict(row, date=_iso(row['date']), status=str(row['status']).strip())
+            values.append((row['student_id'], row['date'], row['class'], row['status'], json.dumps(row, default=str)))
+        with conn or self._db.connection() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {target} (student_id, date, class, status, data) VALUES (?, ?, ?, ?, ?)",
+                values
+            )
+
+    def put_rows(self, table, rows, conn=None, target='replica_rows'):
+        """Insert or replace rows of a REPLICA_KEYS table; rows without a key get a local one"""
+        keys = REPLICA_KEYS[table]
+        with conn or self._db.connection() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {target} (table_name, row_key, data) VALUES (?, ?, ?)",
+                [
+                    (table, self._row_key(row, keys), json.dumps(row, default=str))
+                    for row in rows
+                ]
+            )
+
+    def replace_rows(self, table, rows, **scope):
+        """Make the replica's rows of ``table`` matching ``scope`` exactly ``rows``"""
+        stale = [
+            row_key for row_key, row in self._rows(table)
+            if all(str(row.get(column)) == str(_iso(value)) for column, value in scope.items())
+        ]
+        with self._db.connection() as conn:
+            conn.executemany(
+                "DELETE FROM replica_rows WHERE table_name = ? AND row_key = ?",
+                [(table, row_key) for row_key in stale]
+            )
+        self.put_rows(table, rows)
+
+    # FULL SYNC: pages are staged one at a time (so only one page is in memory)
+    # and replace the table's rows in a single transaction at the end
+    def clear_staged(self, table):
+        with self._db.connection() as conn:
+            if table == 'attendance_records':
+                conn.execute("DELETE FROM attendance_records_staging")
+            else:
+                conn.execute("DELETE FROM replica_rows_staging WHERE table_name = ?", (table,))
+
+    def stage_rows(self, table, rows):
+        """Add one downloaded page to ``table``'s staging area"""
+        if table == 'attendance_records':
+            self.put_attendance(rows, target='attendance_records_staging')
+        else:
+            self.put_rows(table, rows, target='replica_rows_staging')
+
+    def swap_staged(self, table):
+        """Replace everything held for ``table`` with its staged rows in one transaction;
+        returns the number of rows"""
+        with self._db.connection() as conn:
+            if table == 'attendance_records':
+                conn.execute("DELETE FROM attendance_records")
+                conn.execute("INSERT INTO attendance_records SELECT * FROM attendance_records_staging")
+                conn.execute("DELETE FROM attendance_records_staging")
+                return conn.execute("SELECT COUNT(*) FROM attendance_records").fetchone()[0]
+            conn.execute("DELETE FROM replica_rows WHERE table_name = ?", (table,))
+            conn.execute("INSERT INTO replica_rows SELECT * FROM replica_rows_staging WHERE table_name = ?", (table,))
+            conn.execute("DELETE FROM replica_rows_staging WHERE table_name = ?", (table,))
+            return conn.execute("SELECT COUNT(*) FROM replica_rows WHERE table_name = ?", (table,)).fetchone()[0]
+
+    def forget_student(self, student_id):
+        """Drop a deleted student and (like ON DELETE CASCADE) their attendance"""
+        with self._db.connection() as conn:
+            conn.execute("DELETE FROM attendance_records WHERE student_id = ?", (student_id,))
+            conn.execute(
+                "DELETE FROM replica_rows WHERE table_name = 'students' AND row_key = ?",
+                (self._row_key({'id': student_id}, REPLICA_KEYS['students']),)
+            )
+
+    def forget_teacher(self, teacher_id):
+        """Drop a deleted teacher and (like ON DELETE CASCADE) their duties"""
+        stale = [('teachers', self._row_key({'id': teacher_id}, REPLICA_KEYS['teachers']))]
+        stale += [('duties', row_key) for row_key, row in self._rows('duties') if str(row.get('teacher_id')) == str(teacher_id)]
+        with self._db.connection() as conn:
+            conn.executemany("DELETE FROM replica_rows WHERE table_name = ? AND row_key = ?", stale)
+
+    def drop_local_rows(self, table):
+        """Drop rows written here before the server assigned their id (once they are sent,
+        the delta sync brings back the server's copy)"""
+        with self._db.connection() as conn:
+            conn.execute("DELETE FROM replica_rows WHERE table_name = ? AND row_key LIKE 'local:%'", (table,))
+
+    @staticmethod
+    def _row_key(row, keys):
+        if all(row.get(column) is not None for column in keys):
+            return json.dumps([str(_iso(row[column])) for column in keys])
+        return f"local:{uuid.uuid4().hex}"
+
+    def _rows(self, table):
+        cursor = self._db.connection().execute(
+            "SELECT row_key, data FROM replica_rows WHERE table_name = ?", (table,)
+        )
+        return [(row_key, json.loads(data)) for row_key, data in cursor.fetchall()]
+
+    def _select(self, table, **match):
+        return [
+            row for _, row in self._rows(table)
+            if all(str(row.get(column)) == str(_iso(value)) for column, value in match.items())
+        ]
+
+    # READS (same signatures and shapes as SupabaseManager)
+    def get_students(self, class_name=None):
+        students = self._select('students', **({'class': class_name} if class_name else {}))
+        return pd.DataFrame(sorted(students, key=lambda s: s.get('id') or 0))
+
+    def get_teachers(self, teacher_type=None):
+        return self._select('teachers', **({'type': teacher_type} if teacher_type else {}))
+
+    def iter_attendance_records(self, class_name=None, start_date=None, end_date=None,
+                                columns='*', student_id=None, page_size=ATTENDANCE_PAGE_SIZE):
+        sql, params = self._attendance_filter(class_name, start_date, end_date, student_id)
+        fields = None if columns == '*' else columns.split(',')
+        cursor = self._db.connection().execute(f"SELECT data FROM attendance_records{sql} ORDER BY date, student_id", params)
+        while True:
+            rows = cursor.fetchmany(page_size)
+            if not rows:
+                return
+            page = [json.loads(data) for (data,) in rows]
+            if fields:
+                page = [{field: record.get(field) for field in fields} for record in page]
+            yield page
+
+    def count_attendance_records(self):
+        return self._db.connection().execute("SELECT COUNT(*) FROM attendance_records").fetchone()[0]
+
+    def get_attendance_status_counts(self, start_date, end_date, class_name=None):
+        sql, params = self._attendance_filter(class_name, start_date, end_date)
+        cursor = self._db.connection().execute(
+            f"SELECT class, date, status, COUNT(*) FROM attendance_records{sql} "
+            "GROUP BY date, class, status ORDER BY date, class, status",
+            params
+        )
+        return [
+            {'class_name': c, 'attendance_date': d, 'status': s, 'record_count': n}
+            for c, d, s, n in cursor.fetchall()
+        ]
+
+    def get_attendance_summary(self, class_name, selected_date):
+        status_counts = {
+            row['status']: row['record_count']
+            for row in self.get_attendance_status_counts(selected_date, selected_date, class_name)
+        }
+        return SupabaseManager._summarize_status_counts(status_counts)
+
+    def get_school_attendance_summary(self, selected_date):
+        by_class = {}
+        for row in self.get_attendance_status_counts(selected_date, selected_date):
+            by_class.setdefault(row['class_name'], {})[row['status']] = row['record_count']
+        return {c: SupabaseManager._summarize_status_counts(counts) for c, counts in by_class.items()}
+
+    def get_daily_note(self, class_name, note_date):
+        notes = self._select('daily_notes', **{'class': class_name, 'date': note_date})
+        return notes[0].get('text') or "" if notes else ""
+
+    def get_class_timetable(self, class_name):
+        return {row['day']: row['periods'] for row in self._select('class_timetables', class_name=class_name)}
+
+    def get_duties_for_date(self, duty_date):
+        return self._select('duties', date=duty_date)
+
+    def get_class_notifications(self, class_name):
+        notifications = self._select('class_notifications', class_name=class_name)
+        return sorted(notifications, key=lambda n: str(n.get('created_at') or ''), reverse=True)
+
+    @staticmethod
+    def _attendance_filter(class_name=None, start_date=None, end_date=None, student_id=None):
+        clauses, params = [], []
+        for clause, value in (("class = ?", class_name), ("date >= ?", _iso(start_date)),
+                              ("date <= ?", _iso(end_date)), ("student_id = ?", student_id)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class Outbox:
+    """Durable, ordered queue of Supabase writes"""
+
+    def __init__(self, db):
+        self._db = db
+        self._wake = threading.Event()
+        self._drain_lock = threading.Lock()
+
+    def enqueue(self, table, operation, payload, on_conflict=None, match=None):
+        """Queue a write: rows for 'upsert'/'insert', column values plus ``match`` for 'update'"""
+        with self._db.connection() as conn:
+            conn.execute(
+                "INSERT INTO outbox (table_name, operation, payload, on_conflict, match) VALUES (?, ?, ?, ?, ?)",
+                (table, operation, json.dumps(payload, default=str), on_conflict,
+                 json.dumps(match, default=str) if match else None)
+            )
+        self._wake.set()
+
+    def pending_count(self, table=None):
+        sql = "SELECT COUNT(*) FROM outbox WHERE failed = 0"
+        params = ()
+        if table:
+            sql += " AND table_name = ?"
+            params = (table,)
+        return self._db.connection().execute(sql, params).fetchone()[0]
+
+    def failed_writes(self):
+        """Writes the server rejected OUTBOX_MAX_ATTEMPTS times (kept for inspection)"""
+        cursor = self._db.connection().execute(
+            "SELECT id, table_name, operation, payload, last_error, created_at FROM outbox WHERE failed = 1 ORDER BY id"
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    def _next_batch(self):
+        """The oldest pending write, plus following upserts it can be sent together with.
+        A write that already failed once is sent on its own."""
+        cursor = self._db.connection().execute(
+            "SELECT * FROM outbox WHERE failed = 0 ORDER BY id LIMIT ?", (OUTBOX_BATCH_ROWS,)
+        )
+        ops = [dict(row) for row in cursor.fetchall()]
+        if not ops:
+            return []
+        first = ops[0]
+        if first['operation'] != 'upsert' or first['attempts']:
+            return [first]
+
+        batch, rows = [], 0
+        for op in ops:
+            if op['operation'] != 'upsert' or op['attempts'] or \
+                    (op['table_name'], op['on_conflict']) != (first['table_name'], first['on_conflict']):
+                break
+            size = len(json.loads(op['payload']))
+            if batch and rows + size > OUTBOX_BATCH_ROWS:
+                break
+            batch.append(op)
+            rows += size
+        return batch
+
+    @staticmethod
+    def _apply(ops):
+        first = ops[0]
+        table, operation = first['table_name'], first['operation']
+        if operation == 'update':
+            supabase_manager.update_rows(table, json.loads(first['payload']), json.loads(first['match']))
+            return
+
+        rows = [row for op in ops for row in json.loads(op['payload'])]
+        if table == 'attendance_records' and operation == 'upsert':
+            # Atomic save_attendance_batch RPC (chunked upserts where it is not installed)
+            supabase_manager.write_attendance_batch(rows)
+            return
+        if first['on_conflict']:
+            # One upsert statement may not touch the same key twice; the latest write wins
+            keys = first['on_conflict'].split(',')
+            rows = list({tuple(str(row.get(k)) for k in keys): row for row in rows}.values())
+        supabase_manager.upsert_rows(table, rows, on_conflict=first['on_conflict'] if operation == 'upsert' else None)
+
+    def drain(self):
+        """Send pending writes in order. True once the queue is empty, False on a failure."""
+        with self._drain_lock:
+            while True:
+                ops = self._next_batch()
+                if not ops:
+                    return True
+                ids = [(op['id'],) for op in ops]
+                try:
+                    self._apply(ops)
+                except Exception as e:
+                    if _is_connection_error(e) or not supabase_manager.is_connected():
+                        return False
+                    with self._db.connection() as conn:
+                        conn.executemany(
+                            "UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                            f"failed = CASE WHEN attempts + 1 >= {OUTBOX_MAX_ATTEMPTS} THEN 1 ELSE 0 END WHERE id = ?",
+                            [(str(e), op_id) for (op_id,) in ids]
+                        )
+                    print(f"Outbox write to {ops[0]['table_name']} rejected: {e}")
+                    return False
+                with self._db.connection() as conn:
+                    conn.executemany("DELETE FROM outbox WHERE id = ?", ids)
+
+    def run_forever(self):
+        """Background loop: drain, then wait for new writes or retry after a backoff"""
+        failures = 0
+        while True:
+            self._wake.clear()
+            try:
+                drained = self.drain()
+            except Exception as e:
+                print(f"Outbox sync error: {e}")
+                drained = False
+            if drained:
+                failures = 0
+                self._wake.wait(OUTBOX_POLL_INTERVAL)
+            else:
+                failures += 1
+                time.sleep(min(2 ** failures, OUTBOX_BACKOFF_MAX))
+
+
+class OfflineStore:
+    """Replica, outbox and delta sync sharing one SQLite file, with the outbox thread running"""
+
+    def __init__(self, path=OFFLINE_DB_PATH):
+        db = OfflineDatabase(path)
+        self.replica = LocalReplica(db)
+        self.outbox = Outbox(db)
+        self.sync = SyncEngine(db, self.replica, self.outbox)
+        threading.Thread(target=self.outbox.run_forever, name="supabase-outbox", daemon=True).start()
+
+    def reader(self, table):
+        """Where row reads of ``table`` come from: the replica for tables kept by the delta
+        sync once downloaded; otherwise Supabase when reachable and nothing is waiting
+        to be sent for that table; otherwise (offline) the replica"""
+        if table in SYNC_TABLES and self.sync.ensure(table):
+            return self.replica
+        return self.aggregate_reader(table)
+
+    def aggregate_reader(self, table):
+        """Where counts and summaries of ``table`` come from: Supabase (its aggregation
+        RPC and query cache) when reachable and nothing is waiting to be sent for that
+        table; otherwise the replica. Unlike reader() it never starts a download."""
+        if supabase_manager.is_connected() and self.outbox.pending_count(table) == 0:
+            return supabase_manager
+        return self.replica
+
+    def remember(self, table, rows, **scope):
+        """Refresh the replica from rows just read from Supabase"""
+        if self.outbox.pending_count(table):
+            return  # local writes not yet on the server are newer
+        if table == 'attendance_records':
+            self.replica.put_attendance(rows)
+        else:
+            self.replica.replace_rows(table, rows, **scope)
+
+    def write(self, table, operation, rows, on_conflict=None, match=None):
+        """Apply a write to the replica and queue it for Supabase"""
+        if operation == 'update':
+            for row in self.replica._select(table, **match):
+                row.update(rows)
+                self.replica.put_rows(table, [row])
+        elif table == 'attendance_records':
+            self.replica.put_attendance(rows)
+        else:
+            self.replica.put_rows(table, rows)
+        self.outbox.enqueue(table, operation, rows, on_conflict=on_conflict, match=match)
+
+
+@st.cache_resource
+def get_offline_store() -> OfflineStore:
+    """Process-wide offline store (one sync thread for all sessions)"""
+    return OfflineStore()
@@ -0,0 +1,175 @@
+# utils/supabase_sync.py
+"""Incremental (delta) sync of Supabase tables into the local replica.
+
+Each table in SYNC_TABLES is downloaded in full once, in a background thread,
+one page at a time into a staging table that replaces the replica's copy at the end.
+After that, a sync only asks for rows whose watermark column (updated_at,
+created_at or last_updated) is at or after the newest value seen so far, so a
+rerun costs one small request plus local reads, however large the database.
+Deleted rows cannot show up in a delta; they are dropped by a periodic full
+refresh (and immediately for deletes made by this app).
+
+Row reads of a synced table are then served from the replica. Counts and
+summaries (OfflineStore.aggregate_reader) still go to Supabase while it is
+reachable, through its aggregation RPC and query cache.
+"""
+import threading
+import time
+
+import pandas as pd
+
+from utils.supabase_client import _is_connection_error, supabase_manager
+
+# table -> watermark columns to try, in order (attendance_records.updated_at is
+# missing on projects created before it was added to database_schema.sql).
+# class_notifications is not synced: marking one read does not touch a timestamp.
+SYNC_TABLES = {
+    'students': ('updated_at',),
+    'teachers': ('updated_at',),
+    'attendance_records': ('updated_at', 'created_at'),
+    'class_timetables': ('updated_at',),
+    'daily_notes': ('last_updated',),
+    'duties': ('created_at',),
+}
+
+# Minimum seconds between delta syncs of a table (shared by all sessions)
+SYNC_MIN_INTERVAL = 15
+# Seconds between full refreshes, which also pick up rows deleted elsewhere
+SYNC_FULL_REFRESH_INTERVAL = 6 * 60 * 60
+# Re-read this much before the watermark, for rows committed late with an older timestamp
+SYNC_WATERMARK_OVERLAP = pd.Timedelta(seconds=30)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    watermark_column TEXT NOT NULL,
+    watermark TEXT,
+    full_synced_at REAL
+);
+"""
+
+
+class SyncEngine:
+    """Keeps LocalReplica tables in step with Supabase using per-table high-water marks"""
+
+    def __init__(self, db, replica, outbox):
+        self._db = db
+        self._replica = replica
+        self._outbox = outbox
+        self._locks = {table: threading.Lock() for table in SYNC_TABLES}
+        self._synced_at = {}  # table -> time.monotonic() of the last delta sync
+        self._full_sync_running = set()
+        self._state_lock = threading.Lock()
+        self._db.connection().executescript(SCHEMA)
+
+    def _state(self, table):
+        row = self._db.connection().execute(
+            "SELECT watermark_column, watermark, full_synced_at FROM sync_state WHERE table_name = ?", (table,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def _save_state(self, table, column, watermark, full_synced_at):
+        with self._db.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (table_name, watermark_column, watermark, full_synced_at) "
+                "VALUES (?, ?, ?, ?)",
+                (table, column, watermark, full_synced_at)
+            )
+
+    def ensure(self, table):
+        """True when the replica holds ``table`` (after a throttled delta sync).
+        Otherwise starts the initial download in the background and returns False."""
+        state = self._state(table)
+        if state is None or state['full_synced_at'] is None:
+            self._start_full_sync(table)
+            return False
+        if time.time() - state['full_synced_at'] > SYNC_FULL_REFRESH_INTERVAL:
+            self._start_full_sync(table)
+        self.sync(table)
+        return True
+
+    def sync(self, table, force=False):
+        """Fetch rows changed since the table's watermark. Returns the number of rows
+        applied, or None when skipped (throttled, busy, offline or not yet downloaded)."""
+        if not force and time.monotonic() - self._synced_at.get(table, 0) < SYNC_MIN_INTERVAL:
+            return None
+        state = self._state(table)
+        if state is None or state['full_synced_at'] is None:
+            return None
+        if not self._locks[table].acquire(blocking=False):
+            return None
+        try:
+            if self._outbox.pending_count(table) or not supabase_manager.is_connected():
+                return None  # queued local writes are newer than the server copy
+            column = state['watermark_column']
+            since = state['watermark']
+            if since is not None:
+                since = (pd.Timestamp(since) - SYNC_WATERMARK_OVERLAP).isoformat()
+
+            applied = 0
+            watermark = state['watermark']
+            for page in supabase_manager.iter_rows_since(table, column, since):
+                self._apply(table, page)
+                applied += len(page)
+                watermark = self._newest(page, column, watermark)
+            if table != 'attendance_records':
+                self._replica.drop_local_rows(table)
+            self._save_state(table, column, watermark, state['full_synced_at'])
+            self._synced_at[table] = time.monotonic()
+            return applied
+        except Exception as e:
+            if not _is_connection_error(e):
+                print(f"Delta sync of {table} failed: {e}")
+            return None
+        finally:
+            self._locks[table].release()
+
+    def _start_full_sync(self, table):
+        with self._state_lock:
+            if table in self._full_sync_running:
+                return
+            self._full_sync_running.add(table)
+        threading.Thread(target=self._full_sync, args=(table,), name=f"supabase-sync-{table}", daemon=True).start()
+
+    def _full_sync(self, table):
+        """Download every row, drop replica rows that no longer exist and reset the watermark"""
+        try:
+            with self._locks[table]:
+                if not supabase_manager.is_connected():
+                    return
+                for column in SYNC_TABLES[table]:
+                    try:
+                        self._replica.clear_staged(table)
+                        watermark = None
+                        for page in supabase_manager.iter_rows_since(table, column):
+                            self._replica.stage_rows(table, page)
+                            watermark = self._newest(page, column, watermark)
+                        break
+                    except Exception as e:
+                        if _is_connection_error(e) or column == SYNC_TABLES[table][-1]:
+                            print(f"Full sync of {table} failed: {e}")
+                            return
+                        print(f"Cannot sync {table} on {column} ({e}); trying the next column")
+
+                if self._outbox.pending_count(table):
+                    return  # try again later rather than overwrite queued writes
+                synced = self._replica.swap_staged(table)
+                self._save_state(table, column, watermark, time.time())
+                self._synced_at[table] = time.monotonic()
+                print(f"Synced {synced} {table} rows from Supabase")
+        finally:
+            with self._state_lock:
+                self._full_sync_running.discard(table)
+
+    def _apply(self, table, rows):
+        if table == 'attendance_records':
+            self._replica.put_attendance(rows)
+        else:
+            self._replica.put_rows(table, rows)
+
+    @staticmethod
+    def _newest(rows, column, watermark):
+        values = [row[column] for row in rows if row.get(column)]
+        if watermark:
+            values.append(watermark)
+        return max(values, key=pd.Timestamp) if values else None